@@ -1,34 +1,165 @@
 #!/usr/bin/env python3
 """CLI tool to parse bash and dump the AST."""
 
+import fnmatch
+import os
 import sys
 
-from parable import ParseError, parse
+from parable import ParseError, parse, write_sexp
+from parable_extras import dump_files, write_json
 
+FORMATS = ("sexp", "json", "ndjson")
 
-def main():
-    if len(sys.argv) < 2:
-        print("Usage: parable-dump.py 'bash command'", file=sys.stderr)
-        print("       parable-dump.py -f <file>", file=sys.stderr)
-        sys.exit(1)
 
-    if sys.argv[1] == "-f":
-        if len(sys.argv) < 3:
-            print("Error: -f requires a filename", file=sys.stderr)
-            sys.exit(1)
-        with open(sys.argv[2]) as f:
-            source = f.read()
-    else:
-        source = sys.argv[1]
+USAGE = """\
+Usage: parable-dump.py [--format FORMAT] 'bash command'
+       parable-dump.py [--format FORMAT] -f <file>
+       parable-dump.py [batch options] -f <file|dir>...
+       parable-dump.py [batch options] --files-from <list|->
+Options:
+  --format FORMAT     sexp (default), json, or ndjson (a node per line)
+  --max-depth N       Fail on constructs nested deeper than N (default 0, unbounded)
+Batch mode, for several files, a directory, --files-from or -j:
+  -j, --jobs N        Worker processes (default 1, 0 for one per CPU)
+  --files-from FILE   Read paths from FILE, one per line ('-' for stdin)
+  --glob PATTERN      Files to take from directories (default *.sh; repeatable)
+  --ast               Include each file's JSON AST in its record
+Batch mode always writes one JSON line per file (path, bytes, seconds, nodes,
+error) and does not take --format."""
+
+
+def usage():
+    print(USAGE, file=sys.stderr)
+    sys.exit(1)
+
+
+def fail(message):
+    print("Error: " + message, file=sys.stderr)
+    sys.exit(1)
+
 
+def expand_paths(paths, files_from, globs):
+    """Yield file paths: files as given, directories walked recursively for globs."""
+    for path in paths:
+        if not os.path.isdir(path):
+            yield path
+            continue
+        for root, dirs, files in os.walk(path):
+            dirs.sort()
+            for name in sorted(files):
+                if any(fnmatch.fnmatch(name, pattern) for pattern in globs):
+                    yield os.path.join(root, name)
+    if files_from is not None:
+        stream = sys.stdin if files_from == "-" else open(files_from)
+        with stream:
+            for line in stream:
+                line = line.rstrip("\n")
+                if line:
+                    yield from expand_paths([line], None, globs)
+
+
+def dump_one(source, output_format, max_depth):
     try:
-        nodes = parse(source)
-        for node in nodes:
-            print(node.to_sexp())
+        nodes = parse(source, max_depth=max_depth)
+        if output_format == "sexp":
+            for node in nodes:
+                write_sexp(node, sys.stdout)
+                sys.stdout.write("\n")
+        elif output_format == "json":
+            write_json(nodes, sys.stdout)
+            sys.stdout.write("\n")
+        else:
+            write_json(nodes, sys.stdout, ndjson=True)
     except ParseError as e:
         print(f"Error: {e}", file=sys.stderr)
         sys.exit(1)
 
 
+def main():
+    output_format = None
+    max_depth = 0
+    paths = []
+    files_from = None
+    globs = []
+    jobs = None
+    ast = False
+    source = None
+    args = sys.argv[1:]
+    if not args:
+        usage()
+    i = 0
+    while i < len(args):
+        arg = args[i]
+        if arg == "-h" or arg == "--help":
+            usage()
+        elif arg == "--format":
+            i = i + 1
+            if i >= len(args) or args[i] not in FORMATS:
+                fail("--format must be one of " + ", ".join(FORMATS))
+            output_format = args[i]
+        elif arg == "--max-depth":
+            i = i + 1
+            if i >= len(args) or not args[i].isdigit():
+                fail("--max-depth requires a number")
+            max_depth = int(args[i])
+        elif arg == "-f":
+            # Takes every path up to the next option
+            start = i + 1
+            while i + 1 < len(args) and not args[i + 1].startswith("-"):
+                i = i + 1
+                paths.append(args[i])
+            if i + 1 == start:
+                fail("-f requires a filename")
+        elif arg == "-j" or arg == "--jobs":
+            i = i + 1
+            if i >= len(args) or not args[i].isdigit():
+                fail("-j requires a number of workers")
+            jobs = int(args[i])
+        elif arg == "--files-from":
+            i = i + 1
+            if i >= len(args):
+                fail("--files-from requires a filename or -")
+            files_from = args[i]
+        elif arg == "--glob":
+            i = i + 1
+            if i >= len(args):
+                fail("--glob requires a pattern")
+            globs.append(args[i])
+        elif arg == "--ast":
+            ast = True
+        elif source is None and not paths:
+            source = arg
+        else:
+            fail("unexpected argument " + repr(arg))
+        i = i + 1
+
+    batch = (
+        len(paths) > 1
+        or any(os.path.isdir(path) for path in paths)
+        or files_from is not None
+        or jobs is not None
+    )
+    if not batch:
+        if paths:
+            with open(paths[0]) as f:
+                source = f.read()
+        if source is None:
+            usage()
+        dump_one(source, output_format or "sexp", max_depth)
+        return
+    if source is not None:
+        fail("batch mode takes paths with -f, not a bash command")
+    if output_format is not None:
+        fail("batch mode always writes JSON records; --format is for a single input")
+    workers = 1 if jobs is None else jobs
+    if workers == 0:
+        workers = None
+    paths = expand_paths(paths, files_from, globs or ["*.sh"])
+    records = dump_files(paths, workers, ast=ast, max_depth=max_depth)
+    for record in records:
+        sys.stdout.write(record)
+        sys.stdout.write("\n")
+
+
 if __name__ == "__main__":
     main()
@@ -49,6 +49,11 @@ def _is_octal_digit(c: str) -> bool:
     return c >= "0" and c <= "7"
 
 
+# Characters that Word.to_sexp rewrites or escapes; words without any of them
+# are emitted verbatim. Expansion passes start at $ or `, array normalization
+# and process substitutions need (, the rest are escaped or doubled.
+WORD_SEXP_TRIGGER_CHARS = '$`(\\"\n\t\x01\x7f'
+
 # ANSI-C escape sequence byte values
 ANSI_C_ESCAPES = {
     "a": 0x07,  # bell
@@ -211,6 +216,8 @@ class Token:
     the fully parsed Word object.
     """
 
+    __slots__ = ("type", "value", "pos", "parts", "word")
+
     def __init__(
         self,
         type_: int,
@@ -300,12 +307,14 @@ class SavedParserState:
         pending_heredocs: list[HereDoc],
         ctx_stack: list[ParseContext],
         eof_token: str | None = None,
+        depth: int = 0,
     ):
         self.parser_state = parser_state
         self.dolbrace_state = dolbrace_state
         self.pending_heredocs = pending_heredocs
         self.ctx_stack = ctx_stack
         self.eof_token = eof_token
+        self.depth = depth
 
 
 class QuoteState:
@@ -315,6 +324,8 @@ class QuoteState:
     like command substitutions inside parameter expansions.
     """
 
+    __slots__ = ("single", "double", "_stack")
+
     def __init__(self):
         self.single = False
         self.double = False
@@ -358,6 +369,17 @@ class ParseContext:
     arithmetic expressions, and case patterns.
     """
 
+    __slots__ = (
+        "kind",
+        "paren_depth",
+        "brace_depth",
+        "bracket_depth",
+        "case_depth",
+        "arith_depth",
+        "arith_paren_depth",
+        "quote",
+    )
+
     # Context kind constants
     NORMAL = 0
     COMMAND_SUB = 1
@@ -455,13 +477,9 @@ class Lexer:
         self._at_command_start = False
         self._in_array_literal = False
         self._in_assign_builtin = False
-        # Position after reading a token (may differ from token.pos due to heredocs)
-        self._post_read_pos: int = 0
-        # Context used when token was cached (for cache invalidation)
-        self._cached_word_context: int = WORD_CTX_NORMAL
-        self._cached_at_command_start: bool = False
-        self._cached_in_array_literal: bool = False
-        self._cached_in_assign_builtin: bool = False
+        # Set when a word read could have come out differently with other values
+        # of the three flags above (Parser._lex_peek_token clears it per token)
+        self._used_word_flags = False
 
     def peek(self) -> str:
         """Return current character without consuming."""
@@ -481,6 +499,13 @@ class Lexer:
         """Return True if at end of input."""
         return self.pos >= self.length
 
+    def _span(self, node: Node, start: int) -> None:
+        """Record node as covering source[start:pos], in input offsets."""
+        offset = self._parser._offset if self._parser is not None else 0
+        if offset >= 0:
+            node.start = start + offset
+            node.end = self.pos + offset
+
     def lookahead(self, n: int) -> str:
         """Return next n characters without consuming."""
         return _substring(self.source, self.pos, self.pos + n)
@@ -619,16 +644,15 @@ class Lexer:
         Returns (content_with_quotes, saw_newline).
         Raises ParseError if unterminated.
         """
-        chars = ["'"]
+        content_start = self.pos
         saw_newline = False
         while self.pos < self.length:
             c = self.source[self.pos]
-            if c == "\n":
-                saw_newline = True
-            chars.append(c)
             self.pos += 1
             if c == "'":
-                return "".join(chars), saw_newline
+                return "'" + _substring(self.source, content_start, self.pos), saw_newline
+            if c == "\n":
+                saw_newline = True
         raise ParseError("Unterminated single quote", start)
 
     def _is_word_terminator(
@@ -1114,6 +1138,8 @@ class Lexer:
                     bracket_depth += 1
                     chars.append(self.advance())
                     continue
+                if not seen_equals:
+                    self._used_word_flags = True
                 if (
                     chars
                     and at_command_start
@@ -1121,6 +1147,7 @@ class Lexer:
                     and _is_array_assignment_prefix(chars)
                 ):
                     prev_char = chars[len(chars) - 1]
+                    prev_char = prev_char[len(prev_char) - 1]
                     if prev_char.isalnum() or prev_char == "_":
                         bracket_start_pos = self.pos
                         bracket_depth += 1
@@ -1204,6 +1231,8 @@ class Lexer:
                                 chars.append(self.advance())
                                 chars.append(self.advance())
                         elif c == "$":
+                            if self._read_simple_param(chars, parts):
+                                continue
                             # Callback to Parser for dollar expansion (inside dquote)
                             self._sync_to_parser()
                             assert self._parser is not None
@@ -1227,7 +1256,12 @@ class Lexer:
                             else:
                                 chars.append(self.advance())
                         else:
-                            chars.append(self.advance())
+                            # Copy the run up to the next special character in one slice
+                            run_end = self.pos + 1
+                            while run_end < self.length and self.source[run_end] not in '"\\$`':
+                                run_end += 1
+                            chars.append(_substring(self.source, self.pos, run_end))
+                            self.pos = run_end
                     if self.at_end():
                         raise ParseError("Unterminated double quote", start)
                     chars.append(self.advance())
@@ -1280,15 +1314,17 @@ class Lexer:
                 else:
                     chars.append(self.advance())
                 continue
-            # Dollar expansions - callback to Parser
+            # Dollar expansions - callback to Parser, except $name and $special
             if ch == "$":
-                self._sync_to_parser()
-                assert self._parser is not None
-                if not self._parser._parse_dollar_expansion(chars, parts):
+                expanded = self._read_simple_param(chars, parts)
+                if not expanded:
+                    self._sync_to_parser()
+                    assert self._parser is not None
+                    expanded = self._parser._parse_dollar_expansion(chars, parts)
                     self._sync_from_parser()
+                if not expanded:
                     chars.append(self.advance())
                 else:
-                    self._sync_from_parser()
                     # Special params $? $* $@ can be followed by () as extglob pattern
                     if (
                         self._extglob
@@ -1355,6 +1391,8 @@ class Lexer:
                 elif chars[len(chars) - 1] == "=" and len(chars) >= 2:
                     # Check chars before = form valid name
                     is_array_assign = _is_array_assignment_prefix(chars[:-1])
+                if is_array_assign:
+                    self._used_word_flags = True
                 if is_array_assign and (at_command_start or in_assign_builtin):
                     self._sync_to_parser()
                     assert self._parser is not None
@@ -1396,16 +1434,27 @@ class Lexer:
             # NORMAL: Metacharacter terminates word (unless inside brackets)
             if ctx == WORD_CTX_NORMAL and _is_metachar(ch) and bracket_depth == 0:
                 break
-            # Regular character
-            chars.append(self.advance())
+            # Regular character, copied along with the run of characters after it
+            # that no branch above treats specially in any context. Such a run
+            # never holds = + [ ] or an extglob prefix, so the checks above
+            # that look at the last element of chars see those as single chars.
+            run_end = self.pos + 1
+            while (
+                run_end < self.length
+                and self.source[run_end] not in " \t\n|&;()<>'\"\\$`[]={}@?*+!"
+            ):
+                run_end += 1
+            chars.append(_substring(self.source, self.pos, run_end))
+            self.pos = run_end
         # Check for unclosed bracket at EOF
         if bracket_depth > 0 and bracket_start_pos != -1 and self.at_end():
             raise MatchedPairError("unexpected EOF looking for `]'", bracket_start_pos)
         if not chars:
             return None
-        if parts:
-            return Word("".join(chars), parts)
-        return Word("".join(chars))
+        subs = self._parser.subs if self._parser is not None else None
+        word = Word("".join(chars), parts, subs)
+        self._span(word, start)
+        return word
 
     def _read_word(self) -> Token | None:
         """Read a word token using _read_word_internal with current context."""
@@ -1530,6 +1579,7 @@ class Lexer:
         text = _substring(self.source, start, self.pos)
         content = "".join(content_chars)
         node = AnsiCQuote(content)
+        self._span(node, start)
         return node, text
 
     def _sync_to_parser(self) -> None:
@@ -1645,7 +1695,9 @@ class Lexer:
         content = "".join(content_chars)
         # Reconstruct text from parsed content (handles line continuation removal)
         text = '$"' + content + '"'
-        return LocaleString(content), text, inner_parts
+        node = LocaleString(content)
+        self._span(node, start)
+        return node, text, inner_parts
 
     def _update_dolbrace_for_op(self, op: str | None, has_param: bool) -> None:
         """Update dolbrace state based on operator seen."""
@@ -1855,6 +1907,42 @@ class Lexer:
         self.pos = start
         return None, ""
 
+    def _read_simple_param(self, chars: list[str], parts: list[Node]) -> bool:
+        """Read a $name, $digit or $special expansion at pos into chars and parts.
+
+        These are most expansions, and reading them here skips the round trip
+        through the Parser (and its state sync) that _parse_dollar_expansion
+        makes. Returns False, reading nothing, for other expansions, and when the
+        Parser has to count the level (a depth limit about to be hit, or stats).
+        """
+        parser = self._parser
+        if parser is None or parser.stats is not None:
+            return False
+        nesting = parser._nesting
+        if nesting.limit > 0 and nesting.depth >= nesting.limit:
+            return False
+        start = self.pos
+        end = start + 1
+        if end >= self.length:
+            return False
+        ch = self.source[end]
+        if _is_special_param_unbraced(ch) or _is_digit(ch):
+            end += 1
+            name = ch
+        elif ch.isalpha() or ch == "_":
+            end += 1
+            while end < self.length and (self.source[end].isalnum() or self.source[end] == "_"):
+                end += 1
+            name = _substring(self.source, start + 1, end)
+        else:
+            return False
+        self.pos = end
+        node = ParamExpansion(name)
+        self._span(node, start)
+        parts.append(node)
+        chars.append(_substring(self.source, start, end))
+        return True
+
     def _read_braced_param(self, start: int, in_dquote: bool = False) -> tuple[Node | None, str]:
         """Read contents of ${...} after the opening brace.
 
@@ -2003,6 +2091,7 @@ class Lexer:
         self._update_dolbrace_for_op(op, len(param) > 0)
         # Parse argument (everything until closing brace)
         # Pass was_dollar=True if param ends with $ (for $$ handling in nested expansions)
+        arg_start = self.pos
         try:
             flags = MatchedPairFlags.DQUOTE if in_dquote else MatchedPairFlags.NONE
             param_ends_with_dollar = param is not None and param.endswith("$")
@@ -2010,19 +2099,32 @@ class Lexer:
         except MatchedPairError as e:
             self._dolbrace_state = saved_dolbrace
             raise e
-        # Format process substitution content within param expansion
+        # Parse process substitution content within param expansion
         if op in ("<", ">") and arg.startswith("(") and arg.endswith(")"):
-            inner = arg[1:-1]
+            depth = self._parser._nesting.depth if self._parser is not None else 0
             try:
                 # Use Parser for formatting (calls back via _parser reference)
                 assert self._parser is not None
-                sub_parser = Parser(inner, True, self._parser._extglob)
+                if _starts_with_at(self.source, arg_start, arg):
+                    # Argument is verbatim source text: parse it in place
+                    sub_parser = self._parser._new_sub_parser(
+                        self.source,
+                        True,
+                        arg_start + 1,
+                        arg_start + len(arg) - 1,
+                        self._parser._offset,
+                    )
+                else:
+                    sub_parser = self._parser._new_sub_parser(arg[1:-1], True)
                 parsed = sub_parser.parse_list(True)
                 if parsed and sub_parser.at_end():
-                    formatted = _format_cmdsub_node(parsed, 0, True, False, True)
-                    arg = "(" + formatted + ")"
-            except Exception:
-                pass
+                    # Keep the argument as written; Word.to_sexp formats it from here
+                    self._parser.subs.add_param_arg(param + op + arg, len(param) + len(op), parsed)
+            except Exception as e:
+                if self._parser is not None:
+                    if self._parser._nesting.exceeded:
+                        raise e
+                    self._parser._nesting.depth = depth
         text = "${" + param + op + arg + "}"
         self._dolbrace_state = saved_dolbrace
         return ParamExpansion(param, op, arg), text
@@ -2105,56 +2207,244 @@ def _strip_line_continuations_comment_aware(text: str) -> str:
     return "".join(result)
 
 
-def _append_redirects(base: str, redirects: list[Node] | None) -> str:
-    """Append redirect sexp strings to a base sexp string."""
-    if redirects is not None and len(redirects) > 0:
-        parts: list[str] = []
+def _has_word_sexp_trigger(value: str) -> bool:
+    """Check if value contains any character Word.to_sexp normalizes or escapes."""
+    for c in value:
+        if c in WORD_SEXP_TRIGGER_CHARS:
+            return True
+    return False
+
+
+class SexpWriter:
+    """Sink for streamed S-expression output.
+
+    Buffers written fragments. Any object with a write(str) method (a text file,
+    io.StringIO, sys.stdout) can be used wherever a SexpWriter is expected.
+    """
+
+    parts: list[str]
+
+    def __init__(self):
+        self.parts = []
+
+    def write(self, s: str) -> None:
+        self.parts.append(s)
+
+    def getvalue(self) -> str:
+        return "".join(self.parts)
+
+
+class SubstitutionTable:
+    """Command ASTs of the $(...), <(...)/>(...) and ${ ...; } bodies seen by a parse.
+
+    Keyed by body text as it appears in the enclosing word. Serialization formats
+    substitutions that have no node in Word.parts (inside arithmetic, ${...}
+    arguments, for-loop variables) from here instead of parsing them again.
+    reparses counts the bodies that still had to go through a fresh Parser.
+
+    Bodies with the same text share one entry there, so located also keeps every
+    body that has a source span by where it starts: one per occurrence.
+    """
+
+    nodes: dict[str, Node]
+    param_args: dict[str, Node]  # ${...} body -> command of its <(...)/>(...) argument
+    param_arg_starts: dict[str, int]  # ${...} body -> where that argument starts
+    located: dict[int, Node] | None  # Start offset -> body AST parsed there (last parse wins)
+    reparses: int
+
+    def __init__(self):
+        self.nodes = {}
+        self.param_args = {}
+        self.param_arg_starts = {}
+        self.located = None  # Most parses have no substitutions
+        self.reparses = 0
+
+    def add(self, text: str, node: Node) -> None:
+        self.nodes[text] = node
+        self._locate(node)
+
+    def add_param_arg(self, text: str, arg_start: int, node: Node) -> None:
+        """Record the command parsed from the (...) argument of ${param<(...)} or ${param>(...)}."""
+        self.param_args[text] = node
+        self.param_arg_starts[text] = arg_start
+        self._locate(node)
+
+    def _locate(self, node: Node) -> None:
+        if node.start >= 0:
+            if self.located is None:
+                self.located = {}
+            self.located[node.start] = node
+
+    def get(self, text: str) -> Node | None:
+        if text in self.nodes:
+            return self.nodes[text]
+        return None
+
+
+class ArithSpans:
+    """Where expansions inside a scanned $((...)) end, by position of their $.
+
+    Filled by Parser._scan_arith_expansion as it finds the end of an outer
+    $((...)), and shared by the parsers reading the same source, so nested
+    expansions don't scan their text again.
+    """
+
+    ends: dict[int, int]  # $(( -> its final )
+    content_ends: dict[int, int]  # $(( -> end of its expression
+    paren_ends: dict[int, int]  # $( -> the ) the scan paired with it
+
+    def __init__(self):
+        self.ends = {}
+        self.content_ends = {}
+        self.paren_ends = {}
+
+
+class NestingDepth:
+    """How deeply the constructs being parsed are nested, and the bound on it.
+
+    Shared by a parser and its sub-parsers. A limit of 0 leaves the depth
+    unbounded (up to Python's recursion limit). Once the limit is exceeded the
+    whole parse fails: fallbacks that would retry a construct another way
+    re-raise instead, as the retry would nest just as deep.
+    """
+
+    depth: int
+    limit: int
+    exceeded: bool
+
+    def __init__(self, limit: int = 0):
+        self.depth = 0
+        self.limit = limit
+        self.exceeded = False
+
+
+class LineIndex:
+    """Offsets of the line starts in a source, to turn node spans into lines.
+
+    Build one per source and reuse it; each lookup is a binary search, so
+    nodes only carry offsets and pay nothing for lines they never report.
+    """
+
+    starts: list[int]
+
+    def __init__(self, source: str):
+        starts: list[int] = [0]
+        offset = 0
+        for line in source.split("\n"):
+            offset += len(line) + 1
+            starts.append(offset)
+        starts.pop()
+        self.starts = starts
+
+    def line(self, offset: int) -> int:
+        """1-based line holding offset."""
+        lo = 0
+        hi = len(self.starts)
+        while hi - lo > 1:
+            mid = (lo + hi) // 2
+            if self.starts[mid] <= offset:
+                lo = mid
+            else:
+                hi = mid
+        return lo + 1
+
+    def line_col(self, offset: int) -> tuple[int, int]:
+        """1-based (line, column) of offset."""
+        line = self.line(offset)
+        return line, offset - self.starts[line - 1] + 1
+
+
+def _sexp_via_writer(node: Node) -> str:
+    """Render a node's write_sexp output as a single string."""
+    out = SexpWriter()
+    node.write_sexp(out)
+    return out.getvalue()
+
+
+def _write_redirects(out: SexpWriter, redirects: list[Node] | None) -> None:
+    """Write redirect sexps after a base sexp, each preceded by a space."""
+    if redirects is not None:
         for r in redirects:
-            parts.append(r.to_sexp())
-        return base + " " + " ".join(parts)
-    return base
+            out.write(" ")
+            r.write_sexp(out)
 
 
 class Node:
     """Base class for all AST nodes."""
 
+    __slots__ = ("kind", "start", "end")
+
     kind: str
+    # Source span as offsets into the parsed input, -1 where not known (nodes built
+    # outside a parse, text the parser had to copy such as backtick bodies)
+    start: int
+    end: int
+
+    def __init__(self, kind: str):
+        self.kind = kind
+        self.start = -1
+        self.end = -1
 
     def to_sexp(self) -> str:
         """Convert node to S-expression string for testing."""
         raise NotImplementedError
 
+    def write_sexp(self, out: SexpWriter) -> None:
+        """Write the S-expression to out; nodes with children stream them directly."""
+        out.write(self.to_sexp())
+
 
 class Word(Node):
     """A word token, possibly containing expansions."""
 
+    __slots__ = ("value", "parts", "subs")
+
     value: str
     parts: list[Node]
+    subs: SubstitutionTable | None
 
-    def __init__(self, value: str, parts: list[Node] | None = None):
-        self.kind = "word"
+    def __init__(
+        self,
+        value: str,
+        parts: list[Node] | None = None,
+        subs: SubstitutionTable | None = None,
+    ):
+        super().__init__("word")
         self.value = value
         if parts is None:
             parts = []
         self.parts = parts
+        self.subs = subs
 
     def to_sexp(self) -> str:
         value = self.value
+        # Most words are plain literals that no pass below would change
+        if len(self.parts) == 0 and not _has_word_sexp_trigger(value):
+            return '(word "' + value + '")'
+        # Each pass is skipped when the text it rewrites cannot occur in value
+        # (the pass would copy value unchanged)
         # Expand ALL $'...' ANSI-C quotes (handles escapes and strips $)
-        value = self._expand_all_ansi_c_quotes(value)
+        if "$'" in value:
+            value = self._expand_all_ansi_c_quotes(value)
         # Strip $ from locale strings $"..." (quote-aware)
-        value = self._strip_locale_string_dollars(value)
+        if '$"' in value:
+            value = self._strip_locale_string_dollars(value)
         # Normalize whitespace in array assignments: name=(a  b\tc) -> name=(a b c)
-        value = self._normalize_array_whitespace(value)
+        if "=(" in value:
+            value = self._normalize_array_whitespace(value)
         # Format command substitutions with bash-oracle pretty-printing (before escaping)
-        value = self._format_command_substitutions(value)
+        if len(self.parts) > 0 or "(" in value or "${" in value:
+            value = self._format_command_substitutions(value)
         # Convert newlines at param expansion boundaries to spaces (bash behavior)
-        value = self._normalize_param_expansion_newlines(value)
+        if "${" in value and "\n" in value:
+            value = self._normalize_param_expansion_newlines(value)
         # Strip line continuations (backslash-newline) from arithmetic expressions
-        value = self._strip_arith_line_continuations(value)
+        if "$((" in value and "\\\n" in value:
+            value = self._strip_arith_line_continuations(value)
         # Double CTLESC (0x01) bytes - bash-oracle uses this for quoting control chars
         # Exception: don't double when preceded by odd number of backslashes (escaped)
-        value = self._double_ctlesc_smart(value)
+        if "\x01" in value:
+            value = self._double_ctlesc_smart(value)
         # Prefix DEL (0x7f) with CTLESC - bash-oracle quotes this control char
         value = value.replace("\x7f", "\x01\x7f")
         # Escape backslashes for s-expression output
@@ -2695,6 +2985,13 @@ class Word(Node):
                 i += 1
         return "".join(result)
 
+    def _is_array_literal(self) -> bool:
+        """Whether this word is an array assignment such as x=(a b)."""
+        for p in self.parts:
+            if isinstance(p, Array):
+                return True
+        return False
+
     def _normalize_array_whitespace(self, value: str) -> str:
         """Normalize whitespace inside array assignments: arr=(a  b\tc) -> arr=(a b c)."""
         # Match array assignment pattern: name=( or name+=( or name[sub]=( or name[sub]+=(
@@ -3088,6 +3385,29 @@ class Word(Node):
                         result.extend(self._collect_procsubs(p))
         return result
 
+    def _parse_sub_ast(self, text: str, whole: bool) -> Node | None:
+        """Return the command AST for substitution body text, or None if it doesn't parse.
+
+        An empty body yields Empty. Uses the AST retained by the parse when there is
+        one; otherwise parses text with a fresh Parser and counts the reparse. With
+        whole=True, a body the Parser doesn't consume entirely is treated as unparsed.
+        """
+        if self.subs is not None:
+            retained = self.subs.get(text)
+            if retained is not None:
+                return retained
+            self.subs.reparses += 1
+        try:
+            parser = Parser(text)
+            parsed = parser.parse_list(True)
+        except Exception:
+            return None
+        if whole and parser.pos != len(text):
+            return None
+        if parsed is None:
+            return Empty()
+        return parsed
+
     def _format_command_substitutions(self, value: str, in_arith: bool = False) -> str:
         """Replace $(...) and >(...) / <(...) with bash-oracle-formatted AST output."""
         # Collect command substitutions from all parts, including nested ones
@@ -3263,13 +3583,9 @@ class Word(Node):
                     formatted = _format_cmdsub_node(cmdsub.command)
                     cmdsub_idx += 1
                 else:
-                    # No AST node (e.g., inside arithmetic) - parse content on the fly
-                    try:
-                        parser = Parser(inner)
-                        parsed = parser.parse_list(True)
-                        formatted = _format_cmdsub_node(parsed) if parsed else ""
-                    except Exception:
-                        formatted = inner
+                    # No node in parts (e.g., inside arithmetic) - use the retained AST
+                    parsed = self._parse_sub_ast(inner, False)
+                    formatted = inner if parsed is None else _format_cmdsub_node(parsed)
                 # Add space after $( if content starts with ( to avoid $((
                 if formatted.startswith("("):
                     result.append("$( " + formatted + ")")
@@ -3393,7 +3709,7 @@ class Word(Node):
                     procsub_idx += 1
                     i = j
                 elif is_procsub and len(self.parts):
-                    # No AST node but valid procsub context - parse content on the fly
+                    # No node in parts but valid procsub context - use the retained AST
                     direction = value[i]
                     j = _find_cmdsub_end(value, i + 2)
                     # Check if we found a valid closing ) - if not, treat as literal characters
@@ -3402,17 +3718,13 @@ class Word(Node):
                         i += 1
                         continue
                     inner = _substring(value, i + 2, j - 1)
-                    try:
-                        parser = Parser(inner)
-                        parsed = parser.parse_list(True)
-                        # Only use parsed result if parser consumed all input and no newlines in content
-                        # (newlines would be lost during formatting)
-                        if parsed and parser.pos == len(inner) and "\n" not in inner:
-                            compact = _starts_with_subshell(parsed)
-                            formatted = _format_cmdsub_node(parsed, 0, True, compact, True)
-                        else:
-                            formatted = inner
-                    except Exception:
+                    parsed = self._parse_sub_ast(inner, True)
+                    # Only use parsed result if it covers all input and no newlines in content
+                    # (newlines would be lost during formatting)
+                    if parsed is not None and not isinstance(parsed, Empty) and "\n" not in inner:
+                        compact = _starts_with_subshell(parsed)
+                        formatted = _format_cmdsub_node(parsed, 0, True, compact, True)
+                    else:
                         formatted = inner
                     result.append(direction + "(" + formatted + ")")
                     i = j
@@ -3463,24 +3775,22 @@ class Word(Node):
                 if inner.strip() == "":
                     result.append("${ }")
                 else:
-                    try:
-                        parser = Parser(inner.lstrip(" \t\n|"))
-                        parsed = parser.parse_list(True)
-                        if parsed:
-                            formatted = _format_cmdsub_node(parsed)
-                            formatted = formatted.rstrip(";")
-                            # Preserve trailing newline from original if present
-                            if inner.rstrip(" \t").endswith("\n"):
-                                terminator = "\n }"
-                            elif formatted.endswith(" &"):
-                                terminator = " }"
-                            else:
-                                terminator = "; }"
-                            result.append(prefix + formatted + terminator)
-                        else:
-                            result.append("${ }")
-                    except Exception:
+                    parsed = self._parse_sub_ast(inner.lstrip(" \t\n|"), False)
+                    if parsed is None:
                         result.append(_substring(value, i, j))
+                    elif isinstance(parsed, Empty):
+                        result.append("${ }")
+                    else:
+                        formatted = _format_cmdsub_node(parsed)
+                        formatted = formatted.rstrip(";")
+                        # Preserve trailing newline from original if present
+                        if inner.rstrip(" \t").endswith("\n"):
+                            terminator = "\n }"
+                        elif formatted.endswith(" &"):
+                            terminator = " }"
+                        else:
+                            terminator = "; }"
+                        result.append(prefix + formatted + terminator)
                 i = j
             # Process regular ${...} parameter expansions (recursively format cmdsubs inside)
             # But not if the $ is escaped by a backslash
@@ -3516,6 +3826,19 @@ class Word(Node):
                     inner = _substring(value, i + 2, j)
                 else:
                     inner = _substring(value, i + 2, j - 1)
+                # ${param<(cmd)}: format the argument the lexer parsed as a command list.
+                # Array literal words print the argument as written, like the rest of their text
+                if (
+                    depth == 0
+                    and self.subs is not None
+                    and inner in self.subs.param_args
+                    and not self._is_array_literal()
+                ):
+                    arg_start = self.subs.param_arg_starts[inner]
+                    formatted_arg = _format_cmdsub_node(
+                        self.subs.param_args[inner], 0, True, False, True
+                    )
+                    inner = _substring(inner, 0, arg_start) + "(" + formatted_arg + ")"
                 formatted_inner = self._format_command_substitutions(inner)
                 # Normalize <( and >( patterns in param expansion (for pipe alternation)
                 formatted_inner = self._normalize_extglob_whitespace(formatted_inner)
@@ -3657,40 +3980,50 @@ class Word(Node):
 class Command(Node):
     """A simple command (words + redirections)."""
 
+    __slots__ = ("words", "redirects")
+
     words: list[Word]
     redirects: list[Node]
 
     def __init__(self, words: list[Word], redirects: list[Node] | None = None):
-        self.kind = "command"
+        super().__init__("command")
         self.words = words
         if redirects is None:
             redirects = []
         self.redirects = redirects
 
     def to_sexp(self) -> str:
-        parts: list[str] = []
+        return _sexp_via_writer(self)
+
+    def write_sexp(self, out: SexpWriter) -> None:
+        out.write("(command")
         for w in self.words:
-            parts.append(w.to_sexp())
+            out.write(" ")
+            w.write_sexp(out)
         for r in self.redirects:
-            parts.append(r.to_sexp())
-        inner = " ".join(parts)
-        if not inner:
-            return "(command)"
-        return "(command " + inner + ")"
+            out.write(" ")
+            r.write_sexp(out)
+        out.write(")")
 
 
 class Pipeline(Node):
     """A pipeline of commands."""
 
+    __slots__ = ("commands",)
+
     commands: list[Node]
 
     def __init__(self, commands: list[Node]):
-        self.kind = "pipeline"
+        super().__init__("pipeline")
         self.commands = commands
 
     def to_sexp(self) -> str:
+        return _sexp_via_writer(self)
+
+    def write_sexp(self, out: SexpWriter) -> None:
         if len(self.commands) == 1:
-            return self.commands[0].to_sexp()
+            self.commands[0].write_sexp(out)
+            return
         # Build list of (cmd, needs_pipe_both_redirect) filtering out PipeBoth markers
         cmds: list[tuple[Node, bool]] = []
         i = 0
@@ -3707,54 +4040,61 @@ class Pipeline(Node):
             i += 1
         if len(cmds) == 1:
             pair = cmds[0]
-            cmd = pair[0]
-            needs = pair[1]
-            return self._cmd_sexp(cmd, needs)
+            self._write_cmd(out, pair[0], pair[1])
+            return
         # Nest right-associatively: (pipe a (pipe b c))
-        last_pair = cmds[len(cmds) - 1]
-        last_cmd = last_pair[0]
-        last_needs = last_pair[1]
-        result = self._cmd_sexp(last_cmd, last_needs)
-        j = len(cmds) - 2
-        while j >= 0:
+        # Emit opening parts left to right and close once at the end, so the
+        # output is never rewrapped per command
+        j = 0
+        while j < len(cmds) - 1:
             pair = cmds[j]
             cmd = pair[0]
             needs = pair[1]
+            out.write("(pipe ")
             if needs and not isinstance(cmd, Command):
                 # Compound command: redirect as sibling in pipe
-                result = "(pipe " + cmd.to_sexp() + ' (redirect ">&" 1) ' + result + ")"
+                cmd.write_sexp(out)
+                out.write(' (redirect ">&" 1) ')
             else:
-                result = "(pipe " + self._cmd_sexp(cmd, needs) + " " + result + ")"
-            j -= 1
-        return result
+                self._write_cmd(out, cmd, needs)
+                out.write(" ")
+            j += 1
+        last_pair = cmds[len(cmds) - 1]
+        self._write_cmd(out, last_pair[0], last_pair[1])
+        out.write(_repeat_str(")", len(cmds) - 1))
 
-    def _cmd_sexp(self, cmd: Node, needs_redirect: bool) -> str:
-        """Get s-expression for a command, optionally injecting pipe-both redirect."""
-        if not needs_redirect:
-            return cmd.to_sexp()
-        if isinstance(cmd, Command):
+    def _write_cmd(self, out: SexpWriter, cmd: Node, needs_redirect: bool) -> None:
+        """Write a command, optionally injecting the pipe-both redirect."""
+        if needs_redirect and isinstance(cmd, Command):
             # Inject redirect inside command
-            parts: list[str] = []
+            out.write("(command")
             for w in cmd.words:
-                parts.append(w.to_sexp())
+                out.write(" ")
+                w.write_sexp(out)
             for r in cmd.redirects:
-                parts.append(r.to_sexp())
-            parts.append('(redirect ">&" 1)')
-            return "(command " + " ".join(parts) + ")"
-        # Compound command handled by caller
-        return cmd.to_sexp()
+                out.write(" ")
+                r.write_sexp(out)
+            out.write(' (redirect ">&" 1))')
+            return
+        # Compound command redirect handled by caller
+        cmd.write_sexp(out)
 
 
 class List(Node):
     """A list of pipelines with operators."""
 
+    __slots__ = ("parts",)
+
     parts: list[Node]  # alternating: pipeline, operator, pipeline, ...
 
     def __init__(self, parts: list[Node]):
-        self.kind = "list"
+        super().__init__("list")
         self.parts = parts
 
     def to_sexp(self) -> str:
+        return _sexp_via_writer(self)
+
+    def write_sexp(self, out: SexpWriter) -> None:
         # parts = [cmd, op, cmd, op, cmd, ...]
         # Bash precedence: && and || bind tighter than ; and &
         parts = list(self.parts)
@@ -3768,7 +4108,8 @@ class List(Node):
                 break
             parts = _sublist(parts, 0, len(parts) - 1)
         if len(parts) == 1:
-            return parts[0].to_sexp()
+            parts[0].write_sexp(out)
+            return
         # Handle trailing & as unary background operator
         # & only applies to the immediately preceding pipeline, not the whole list
         last = parts[len(parts) - 1]
@@ -3781,25 +4122,33 @@ class List(Node):
                         continue
                     left = _sublist(parts, 0, i)
                     right = _sublist(parts, i + 1, len(parts) - 1)  # exclude trailing &
+                    out.write("(semi ")
                     if len(left) > 1:
-                        left_sexp = List(left).to_sexp()
+                        List(left).write_sexp(out)
                     else:
-                        left_sexp = left[0].to_sexp()
+                        left[0].write_sexp(out)
+                    out.write(" (background ")
                     if len(right) > 1:
-                        right_sexp = List(right).to_sexp()
+                        List(right).write_sexp(out)
                     else:
-                        right_sexp = right[0].to_sexp()
-                    return "(semi " + left_sexp + " (background " + right_sexp + "))"
+                        right[0].write_sexp(out)
+                    out.write("))")
+                    return
             # No ; or \n found, background the whole list (minus trailing &)
             inner_parts = _sublist(parts, 0, len(parts) - 1)
+            out.write("(background ")
             if len(inner_parts) == 1:
-                return "(background " + inner_parts[0].to_sexp() + ")"
-            inner_list = List(inner_parts)
-            return "(background " + inner_list.to_sexp() + ")"
+                inner_parts[0].write_sexp(out)
+            else:
+                List(inner_parts).write_sexp(out)
+            out.write(")")
+            return
         # Process by precedence: first split on ; and &, then on && and ||
-        return self._to_sexp_with_precedence(parts, op_names)
+        self._write_with_precedence(out, parts, op_names)
 
-    def _to_sexp_with_precedence(self, parts: list[Node], op_names: dict[str, str]) -> str:
+    def _write_with_precedence(
+        self, out: SexpWriter, parts: list[Node], op_names: dict[str, str]
+    ) -> None:
         # Process operators by precedence: ; (lowest), then &, then && and ||
         # Use iterative approach to avoid stack overflow on large lists
         # Find all ; or \n positions (may not be at regular intervals due to consecutive ops)
@@ -3823,25 +4172,27 @@ class List(Node):
             if seg and not isinstance(seg[0], Operator):
                 segments.append(seg)
             if not segments:
-                return "()"
-            # Build left-associative result iteratively
-            result = self._to_sexp_amp_and_higher(segments[0], op_names)
+                out.write("()")
+                return
+            # Left-associative (semi (semi a b) c): write all openers first, then
+            # each segment followed by its closer (linear in output size)
+            out.write(_repeat_str("(semi ", len(segments) - 1))
+            self._write_amp_and_higher(out, segments[0], op_names)
             for i in range(1, len(segments)):
-                result = (
-                    "(semi "
-                    + result
-                    + " "
-                    + self._to_sexp_amp_and_higher(segments[i], op_names)
-                    + ")"
-                )
-            return result
+                out.write(" ")
+                self._write_amp_and_higher(out, segments[i], op_names)
+                out.write(")")
+            return
         # No ; or \n, handle & and higher
-        return self._to_sexp_amp_and_higher(parts, op_names)
+        self._write_amp_and_higher(out, parts, op_names)
 
-    def _to_sexp_amp_and_higher(self, parts: list[Node], op_names: dict[str, str]) -> str:
+    def _write_amp_and_higher(
+        self, out: SexpWriter, parts: list[Node], op_names: dict[str, str]
+    ) -> None:
         # Handle & operator iteratively
         if len(parts) == 1:
-            return parts[0].to_sexp()
+            parts[0].write_sexp(out)
+            return
         amp_positions: list[int] = []
         for i in range(1, len(parts) - 1, 2):
             item = parts[i]
@@ -3855,41 +4206,49 @@ class List(Node):
                 segments.append(_sublist(parts, start, pos))
                 start = pos + 1
             segments.append(_sublist(parts, start, len(parts)))
-            # Build left-associative result iteratively
-            result = self._to_sexp_and_or(segments[0], op_names)
+            # Left-associative, same shape as _write_with_precedence
+            out.write(_repeat_str("(background ", len(segments) - 1))
+            self._write_and_or(out, segments[0], op_names)
             for i in range(1, len(segments)):
-                result = (
-                    "(background "
-                    + result
-                    + " "
-                    + self._to_sexp_and_or(segments[i], op_names)
-                    + ")"
-                )
-            return result
+                out.write(" ")
+                self._write_and_or(out, segments[i], op_names)
+                out.write(")")
+            return
         # No &, handle && and ||
-        return self._to_sexp_and_or(parts, op_names)
+        self._write_and_or(out, parts, op_names)
 
-    def _to_sexp_and_or(self, parts: list[Node], op_names: dict[str, str]) -> str:
-        # Process && and || left-associatively (already iterative)
+    def _write_and_or(self, out: SexpWriter, parts: list[Node], op_names: dict[str, str]) -> None:
+        # Process && and || left-associatively: (or (and a b) c)
+        # Openers are written outermost (last operator) first, then each command
+        # followed by its closer
         if len(parts) == 1:
-            return parts[0].to_sexp()
-        result = parts[0].to_sexp()
+            parts[0].write_sexp(out)
+            return
+        openers: list[str] = []
         for i in range(1, len(parts) - 1, 2):
             op = parts[i]
-            cmd = parts[i + 1]
             assert isinstance(op, Operator)
-            op_name = op_names.get(op.op, op.op)
-            result = "(" + op_name + " " + result + " " + cmd.to_sexp() + ")"
-        return result
+            openers.append("(" + op_names.get(op.op, op.op) + " ")
+        j = len(openers) - 1
+        while j >= 0:
+            out.write(openers[j])
+            j -= 1
+        parts[0].write_sexp(out)
+        for i in range(1, len(parts) - 1, 2):
+            out.write(" ")
+            parts[i + 1].write_sexp(out)
+            out.write(")")
 
 
 class Operator(Node):
     """An operator token (&&, ||, ;, &, |)."""
 
+    __slots__ = ("op",)
+
     op: str
 
     def __init__(self, op: str):
-        self.kind = "operator"
+        super().__init__("operator")
         self.op = op
 
     def to_sexp(self) -> str:
@@ -3906,8 +4265,10 @@ class Operator(Node):
 class PipeBoth(Node):
     """Marker for |& pipe (stdout + stderr)."""
 
+    __slots__ = ()
+
     def __init__(self):
-        self.kind = "pipe-both"
+        super().__init__("pipe-both")
 
     def to_sexp(self) -> str:
         return "(pipe-both)"
@@ -3916,8 +4277,10 @@ class PipeBoth(Node):
 class Empty(Node):
     """Empty input."""
 
+    __slots__ = ()
+
     def __init__(self):
-        self.kind = "empty"
+        super().__init__("empty")
 
     def to_sexp(self) -> str:
         return ""
@@ -3926,10 +4289,12 @@ class Empty(Node):
 class Comment(Node):
     """A comment (# to end of line)."""
 
+    __slots__ = ("text",)
+
     text: str
 
     def __init__(self, text: str):
-        self.kind = "comment"
+        super().__init__("comment")
         self.text = text
 
     def to_sexp(self) -> str:
@@ -3940,12 +4305,14 @@ class Comment(Node):
 class Redirect(Node):
     """A redirection."""
 
+    __slots__ = ("op", "target", "fd")
+
     op: str
     target: Word
-    fd: int = -1  # -1 = no fd specified
+    fd: int  # -1 = no fd specified
 
     def __init__(self, op: str, target: Word, fd: int = -1):
-        self.kind = "redirect"
+        super().__init__("redirect")
         self.op = op
         self.target = target
         self.fd = fd  # -1 = no fd specified
@@ -4022,15 +4389,20 @@ class Redirect(Node):
 
 
 class HereDoc(Node):
-    """A here document <<DELIM ... DELIM."""
+    """A here document <<DELIM ... DELIM.
+
+    Its span covers the <<DELIM redirect; the body follows a later newline.
+    """
+
+    __slots__ = ("delimiter", "content", "strip_tabs", "quoted", "fd", "complete", "_start_pos")
 
     delimiter: str
     content: str
-    strip_tabs: bool = False
-    quoted: bool = False
-    fd: int = -1  # -1 = no fd specified
-    complete: bool = True
-    _start_pos: int = -1  # Parser position where heredoc redirect started (for dedup)
+    strip_tabs: bool
+    quoted: bool
+    fd: int  # -1 = no fd specified
+    complete: bool
+    _start_pos: int  # Parser position where heredoc redirect started (for dedup)
 
     def __init__(
         self,
@@ -4041,7 +4413,7 @@ class HereDoc(Node):
         fd: int = -1,
         complete: bool = True,
     ):
-        self.kind = "heredoc"
+        super().__init__("heredoc")
         self.delimiter = delimiter
         self.content = content
         self.strip_tabs = strip_tabs
@@ -4062,41 +4434,57 @@ class HereDoc(Node):
 class Subshell(Node):
     """A subshell ( list )."""
 
+    __slots__ = ("body", "redirects")
+
     body: Node
-    redirects: list[Node] | None = None
+    redirects: list[Node] | None
 
     def __init__(self, body: Node, redirects: list[Node] | None = None):
-        self.kind = "subshell"
+        super().__init__("subshell")
         self.body = body
         self.redirects = redirects
 
     def to_sexp(self) -> str:
-        base = "(subshell " + self.body.to_sexp() + ")"
-        return _append_redirects(base, self.redirects)
+        return _sexp_via_writer(self)
+
+    def write_sexp(self, out: SexpWriter) -> None:
+        out.write("(subshell ")
+        self.body.write_sexp(out)
+        out.write(")")
+        _write_redirects(out, self.redirects)
 
 
 class BraceGroup(Node):
     """A brace group { list; }."""
 
+    __slots__ = ("body", "redirects")
+
     body: Node
-    redirects: list[Node] | None = None
+    redirects: list[Node] | None
 
     def __init__(self, body: Node, redirects: list[Node] | None = None):
-        self.kind = "brace-group"
+        super().__init__("brace-group")
         self.body = body
         self.redirects = redirects
 
     def to_sexp(self) -> str:
-        base = "(brace-group " + self.body.to_sexp() + ")"
-        return _append_redirects(base, self.redirects)
+        return _sexp_via_writer(self)
+
+    def write_sexp(self, out: SexpWriter) -> None:
+        out.write("(brace-group ")
+        self.body.write_sexp(out)
+        out.write(")")
+        _write_redirects(out, self.redirects)
 
 
 class If(Node):
     """An if statement."""
 
+    __slots__ = ("condition", "then_body", "else_body", "redirects")
+
     condition: Node
     then_body: Node
-    else_body: Node | None = None
+    else_body: Node | None
     redirects: list[Node]
 
     def __init__(
@@ -4106,7 +4494,7 @@ class If(Node):
         else_body: Node | None = None,
         redirects: list[Node] | None = None,
     ):
-        self.kind = "if"
+        super().__init__("if")
         self.condition = condition
         self.then_body = then_body
         self.else_body = else_body
@@ -4115,24 +4503,31 @@ class If(Node):
         self.redirects = redirects
 
     def to_sexp(self) -> str:
-        result = "(if " + self.condition.to_sexp() + " " + self.then_body.to_sexp()
+        return _sexp_via_writer(self)
+
+    def write_sexp(self, out: SexpWriter) -> None:
+        out.write("(if ")
+        self.condition.write_sexp(out)
+        out.write(" ")
+        self.then_body.write_sexp(out)
         if self.else_body:
-            result = result + " " + self.else_body.to_sexp()
-        result = result + ")"
-        for r in self.redirects:
-            result = result + " " + r.to_sexp()
-        return result
+            out.write(" ")
+            self.else_body.write_sexp(out)
+        out.write(")")
+        _write_redirects(out, self.redirects)
 
 
 class While(Node):
     """A while loop."""
 
+    __slots__ = ("condition", "body", "redirects")
+
     condition: Node
     body: Node
     redirects: list[Node]
 
     def __init__(self, condition: Node, body: Node, redirects: list[Node] | None = None):
-        self.kind = "while"
+        super().__init__("while")
         self.condition = condition
         self.body = body
         if redirects is None:
@@ -4140,19 +4535,28 @@ class While(Node):
         self.redirects = redirects
 
     def to_sexp(self) -> str:
-        base = "(while " + self.condition.to_sexp() + " " + self.body.to_sexp() + ")"
-        return _append_redirects(base, self.redirects)
+        return _sexp_via_writer(self)
+
+    def write_sexp(self, out: SexpWriter) -> None:
+        out.write("(while ")
+        self.condition.write_sexp(out)
+        out.write(" ")
+        self.body.write_sexp(out)
+        out.write(")")
+        _write_redirects(out, self.redirects)
 
 
 class Until(Node):
     """An until loop."""
 
+    __slots__ = ("condition", "body", "redirects")
+
     condition: Node
     body: Node
     redirects: list[Node]
 
     def __init__(self, condition: Node, body: Node, redirects: list[Node] | None = None):
-        self.kind = "until"
+        super().__init__("until")
         self.condition = condition
         self.body = body
         if redirects is None:
@@ -4160,74 +4564,75 @@ class Until(Node):
         self.redirects = redirects
 
     def to_sexp(self) -> str:
-        base = "(until " + self.condition.to_sexp() + " " + self.body.to_sexp() + ")"
-        return _append_redirects(base, self.redirects)
+        return _sexp_via_writer(self)
+
+    def write_sexp(self, out: SexpWriter) -> None:
+        out.write("(until ")
+        self.condition.write_sexp(out)
+        out.write(" ")
+        self.body.write_sexp(out)
+        out.write(")")
+        _write_redirects(out, self.redirects)
 
 
 class For(Node):
     """A for loop."""
 
+    __slots__ = ("var", "words", "body", "redirects", "subs")
+
     var: str
     words: list[Word] | None
     body: Node
     redirects: list[Node]
+    subs: SubstitutionTable | None
 
     def __init__(
-        self, var: str, words: list[Word] | None, body: Node, redirects: list[Node] | None = None
+        self,
+        var: str,
+        words: list[Word] | None,
+        body: Node,
+        redirects: list[Node] | None = None,
+        subs: SubstitutionTable | None = None,
     ):
-        self.kind = "for"
+        super().__init__("for")
         self.var = var
         self.words = words
         self.body = body
         if redirects is None:
             redirects = []
         self.redirects = redirects
+        self.subs = subs
 
     def to_sexp(self) -> str:
+        return _sexp_via_writer(self)
+
+    def write_sexp(self, out: SexpWriter) -> None:
         # bash-oracle format: (for (word "var") (in (word "a") ...) body)
-        suffix = ""
-        if self.redirects:
-            redirect_parts: list[str] = []
-            for r in self.redirects:
-                redirect_parts.append(r.to_sexp())
-            suffix = " " + " ".join(redirect_parts)
         # Format command substitutions in var (e.g., for $(echo i) normalizes whitespace)
-        temp_word = Word(self.var, [])
+        temp_word = Word(self.var, [], self.subs)
         var_formatted = temp_word._format_command_substitutions(self.var)
         var_escaped = var_formatted.replace("\\", "\\\\").replace('"', '\\"')
+        out.write('(for (word "' + var_escaped + '") ')
         if self.words is None:
             # No 'in' clause - bash-oracle implies (in (word "\"$@\""))
-            return (
-                '(for (word "'
-                + var_escaped
-                + '") (in (word "\\"$@\\"")) '
-                + self.body.to_sexp()
-                + ")"
-                + suffix
-            )
+            out.write('(in (word "\\"$@\\"")) ')
         elif len(self.words) == 0:
             # Empty 'in' clause - bash-oracle outputs (in)
-            return '(for (word "' + var_escaped + '") (in) ' + self.body.to_sexp() + ")" + suffix
+            out.write("(in) ")
         else:
-            word_parts: list[str] = []
+            out.write("(in")
             for w in self.words:
-                word_parts.append(w.to_sexp())
-            word_strs = " ".join(word_parts)
-            return (
-                '(for (word "'
-                + var_escaped
-                + '") (in '
-                + word_strs
-                + ") "
-                + self.body.to_sexp()
-                + ")"
-                + suffix
-            )
+                out.write(" ")
+                w.write_sexp(out)
+            out.write(") ")
+        self.body.write_sexp(out)
+        out.write(")")
+        _write_redirects(out, self.redirects)
 
 
-def _format_arith_val(s: str) -> str:
+def _format_arith_val(s: str, subs: SubstitutionTable | None = None) -> str:
     """Format arithmetic value for sexp output."""
-    w = Word(s, [])
+    w = Word(s, [], subs)
     val = w._expand_all_ansi_c_quotes(s)
     val = w._strip_locale_string_dollars(val)
     val = w._format_command_substitutions(val)
@@ -4239,16 +4644,42 @@ def _format_arith_val(s: str) -> str:
 class ForArith(Node):
     """A C-style for loop: for ((init; cond; incr)); do ... done."""
 
+    __slots__ = (
+        "init",
+        "cond",
+        "incr",
+        "init_expr",
+        "cond_expr",
+        "incr_expr",
+        "body",
+        "redirects",
+        "subs",
+    )
+
     init: str
     cond: str
     incr: str
+    # Parsed init/cond/incr, or None for empty or unparseable ones (output uses the text)
+    init_expr: Node | None
+    cond_expr: Node | None
+    incr_expr: Node | None
     body: Node
     redirects: list[Node]
+    subs: SubstitutionTable | None
 
     def __init__(
-        self, init: str, cond: str, incr: str, body: Node, redirects: list[Node] | None = None
+        self,
+        init: str,
+        cond: str,
+        incr: str,
+        body: Node,
+        redirects: list[Node] | None = None,
+        subs: SubstitutionTable | None = None,
+        init_expr: Node | None = None,
+        cond_expr: Node | None = None,
+        incr_expr: Node | None = None,
     ):
-        self.kind = "for-arith"
+        super().__init__("for-arith")
         self.init = init
         self.cond = cond
         self.incr = incr
@@ -4256,28 +4687,35 @@ class ForArith(Node):
         if redirects is None:
             redirects = []
         self.redirects = redirects
+        self.subs = subs
+        self.init_expr = init_expr
+        self.cond_expr = cond_expr
+        self.incr_expr = incr_expr
 
     def to_sexp(self) -> str:
+        return _sexp_via_writer(self)
+
+    def write_sexp(self, out: SexpWriter) -> None:
         # bash-oracle format: (arith-for (init (word "x")) (test (word "y")) (step (word "z")) body)
-        suffix = ""
-        if self.redirects:
-            redirect_parts: list[str] = []
-            for r in self.redirects:
-                redirect_parts.append(r.to_sexp())
-            suffix = " " + " ".join(redirect_parts)
         init_val = self.init if self.init else "1"
         cond_val = self.cond if self.cond else "1"
         incr_val = self.incr if self.incr else "1"
-        init_str = _format_arith_val(init_val)
-        cond_str = _format_arith_val(cond_val)
-        incr_str = _format_arith_val(incr_val)
-        body_str = self.body.to_sexp()
-        return f'(arith-for (init (word "{init_str}")) (test (word "{cond_str}")) (step (word "{incr_str}")) {body_str}){suffix}'
+        init_str = _format_arith_val(init_val, self.subs)
+        cond_str = _format_arith_val(cond_val, self.subs)
+        incr_str = _format_arith_val(incr_val, self.subs)
+        out.write(
+            f'(arith-for (init (word "{init_str}")) (test (word "{cond_str}")) (step (word "{incr_str}")) '
+        )
+        self.body.write_sexp(out)
+        out.write(")")
+        _write_redirects(out, self.redirects)
 
 
 class Select(Node):
     """A select statement."""
 
+    __slots__ = ("var", "words", "body", "redirects")
+
     var: str
     words: list[Word] | None
     body: Node
@@ -4286,7 +4724,7 @@ class Select(Node):
     def __init__(
         self, var: str, words: list[Word] | None, body: Node, redirects: list[Node] | None = None
     ):
-        self.kind = "select"
+        super().__init__("select")
         self.var = var
         self.words = words
         self.body = body
@@ -4295,41 +4733,31 @@ class Select(Node):
         self.redirects = redirects
 
     def to_sexp(self) -> str:
+        return _sexp_via_writer(self)
+
+    def write_sexp(self, out: SexpWriter) -> None:
         # bash-oracle format: (select (word "var") (in (word "a") ...) body)
-        suffix = ""
-        if self.redirects:
-            redirect_parts: list[str] = []
-            for r in self.redirects:
-                redirect_parts.append(r.to_sexp())
-            suffix = " " + " ".join(redirect_parts)
         var_escaped = self.var.replace("\\", "\\\\").replace('"', '\\"')
+        out.write('(select (word "' + var_escaped + '") ')
         if self.words is not None:
-            word_parts: list[str] = []
+            out.write("(in")
             for w in self.words:
-                word_parts.append(w.to_sexp())
-            word_strs = " ".join(word_parts)
-            if self.words:
-                in_clause = "(in " + word_strs + ")"
-            else:
-                in_clause = "(in)"
+                out.write(" ")
+                w.write_sexp(out)
+            out.write(") ")
         else:
             # No 'in' clause means implicit "$@"
-            in_clause = '(in (word "\\"$@\\""))'
-        return (
-            '(select (word "'
-            + var_escaped
-            + '") '
-            + in_clause
-            + " "
-            + self.body.to_sexp()
-            + ")"
-            + suffix
-        )
+            out.write('(in (word "\\"$@\\"")) ')
+        self.body.write_sexp(out)
+        out.write(")")
+        _write_redirects(out, self.redirects)
 
 
 class Case(Node):
     """A case statement."""
 
+    __slots__ = ("word", "patterns", "redirects")
+
     word: Word
     patterns: list[CasePattern]
     redirects: list[Node]
@@ -4337,7 +4765,7 @@ class Case(Node):
     def __init__(
         self, word: Word, patterns: list[CasePattern], redirects: list[Node] | None = None
     ):
-        self.kind = "case"
+        super().__init__("case")
         self.word = word
         self.patterns = patterns
         if redirects is None:
@@ -4345,12 +4773,16 @@ class Case(Node):
         self.redirects = redirects
 
     def to_sexp(self) -> str:
-        parts: list[str] = []
-        parts.append("(case " + self.word.to_sexp())
+        return _sexp_via_writer(self)
+
+    def write_sexp(self, out: SexpWriter) -> None:
+        out.write("(case ")
+        self.word.write_sexp(out)
         for p in self.patterns:
-            parts.append(p.to_sexp())
-        base = " ".join(parts) + ")"
-        return _append_redirects(base, self.redirects)
+            out.write(" ")
+            p.write_sexp(out)
+        out.write(")")
+        _write_redirects(out, self.redirects)
 
 
 def _consume_single_quote(s: str, start: int) -> tuple[int, list[str]]:
@@ -4443,17 +4875,30 @@ def _consume_bracket_class(s: str, start: int, depth: int) -> tuple[int, list[st
 class CasePattern(Node):
     """A pattern clause in a case statement."""
 
+    __slots__ = ("pattern", "body", "terminator", "subs")
+
     pattern: str
     body: Node | None
-    terminator: str = ";;"  # ";;", ";&", or ";;&"
+    terminator: str  # ";;", ";&", or ";;&"
+    subs: SubstitutionTable | None
 
-    def __init__(self, pattern: str, body: Node | None, terminator: str = ";;"):
-        self.kind = "pattern"
+    def __init__(
+        self,
+        pattern: str,
+        body: Node | None,
+        terminator: str = ";;",
+        subs: SubstitutionTable | None = None,
+    ):
+        super().__init__("pattern")
         self.pattern = pattern
         self.body = body
         self.terminator = terminator
+        self.subs = subs
 
     def to_sexp(self) -> str:
+        return _sexp_via_writer(self)
+
+    def write_sexp(self, out: SexpWriter) -> None:
         # bash-oracle format: (pattern ((word "a") (word "b")) body)
         # Split pattern by | respecting escapes, extglobs, quotes, and brackets
         alternatives: list[str] = []
@@ -4512,42 +4957,51 @@ class CasePattern(Node):
         word_list: list[str] = []
         for alt in alternatives:
             # Use Word.to_sexp() to properly expand ANSI-C quotes and escape
-            word_list.append(Word(alt).to_sexp())
+            word_list.append(Word(alt, None, self.subs).to_sexp())
         pattern_str = " ".join(word_list)
-        parts = ["(pattern (" + pattern_str + ")"]
+        out.write("(pattern (" + pattern_str + ")")
         if self.body:
-            parts.append(" " + self.body.to_sexp())
+            out.write(" ")
+            self.body.write_sexp(out)
         else:
-            parts.append(" ()")
+            out.write(" ()")
         # bash-oracle doesn't output fallthrough/falltest markers
-        parts.append(")")
-        return "".join(parts)
+        out.write(")")
 
 
 class Function(Node):
     """A function definition."""
 
+    __slots__ = ("name", "body")
+
     name: str
     body: Node
 
     def __init__(self, name: str, body: Node):
-        self.kind = "function"
+        super().__init__("function")
         self.name = name
         self.body = body
 
     def to_sexp(self) -> str:
-        return '(function "' + self.name + '" ' + self.body.to_sexp() + ")"
+        return _sexp_via_writer(self)
+
+    def write_sexp(self, out: SexpWriter) -> None:
+        out.write('(function "' + self.name + '" ')
+        self.body.write_sexp(out)
+        out.write(")")
 
 
 class ParamExpansion(Node):
     """A parameter expansion ${var} or ${var:-default}."""
 
+    __slots__ = ("param", "op", "arg")
+
     param: str
-    op: str | None = None
-    arg: str | None = None
+    op: str | None
+    arg: str | None
 
     def __init__(self, param: str, op: str | None = None, arg: str | None = None):
-        self.kind = "param"
+        super().__init__("param")
         self.param = param
         self.op = op
         self.arg = arg
@@ -4568,10 +5022,12 @@ class ParamExpansion(Node):
 class ParamLength(Node):
     """A parameter length expansion ${#var}."""
 
+    __slots__ = ("param",)
+
     param: str
 
     def __init__(self, param: str):
-        self.kind = "param-len"
+        super().__init__("param-len")
         self.param = param
 
     def to_sexp(self) -> str:
@@ -4582,12 +5038,14 @@ class ParamLength(Node):
 class ParamIndirect(Node):
     """An indirect parameter expansion ${!var} or ${!var<op><arg>}."""
 
+    __slots__ = ("param", "op", "arg")
+
     param: str
     op: str | None
     arg: str | None
 
     def __init__(self, param: str, op: str | None = None, arg: str | None = None):
-        self.kind = "param-indirect"
+        super().__init__("param-indirect")
         self.param = param
         self.op = op
         self.arg = arg
@@ -4608,27 +5066,37 @@ class ParamIndirect(Node):
 class CommandSubstitution(Node):
     """A command substitution $(...), `...`, or ${ cmd; }."""
 
+    __slots__ = ("command", "brace")
+
     command: Node
     brace: bool
 
     def __init__(self, command: Node, brace: bool = False):
-        self.kind = "cmdsub"
+        super().__init__("cmdsub")
         self.command = command
         self.brace = brace
 
     def to_sexp(self) -> str:
+        return _sexp_via_writer(self)
+
+    def write_sexp(self, out: SexpWriter) -> None:
         if self.brace:
-            return "(funsub " + self.command.to_sexp() + ")"
-        return "(cmdsub " + self.command.to_sexp() + ")"
+            out.write("(funsub ")
+        else:
+            out.write("(cmdsub ")
+        self.command.write_sexp(out)
+        out.write(")")
 
 
 class ArithmeticExpansion(Node):
     """An arithmetic expansion $((...)) with parsed internals."""
 
+    __slots__ = ("expression",)
+
     expression: Node | None  # Parsed arithmetic expression, or None for empty
 
     def __init__(self, expression: Node | None):
-        self.kind = "arith"
+        super().__init__("arith")
         self.expression = expression
 
     def to_sexp(self) -> str:
@@ -4640,28 +5108,36 @@ class ArithmeticExpansion(Node):
 class ArithmeticCommand(Node):
     """An arithmetic command ((...)) with parsed internals."""
 
+    __slots__ = ("expression", "redirects", "raw_content", "subs")
+
     expression: Node | None  # Parsed arithmetic expression, or None for empty
     redirects: list[Node]
     raw_content: str  # Raw expression text for bash-oracle-compatible output
+    subs: SubstitutionTable | None
 
     def __init__(
         self,
         expression: Node | None,
         redirects: list[Node] | None = None,
         raw_content: str = "",
+        subs: SubstitutionTable | None = None,
     ):
-        self.kind = "arith-cmd"
+        super().__init__("arith-cmd")
         self.expression = expression
         if redirects is None:
             redirects = []
         self.redirects = redirects
         self.raw_content = raw_content
+        self.subs = subs
 
     def to_sexp(self) -> str:
+        return _sexp_via_writer(self)
+
+    def write_sexp(self, out: SexpWriter) -> None:
         # bash-oracle format: (arith (word "content"))
         # Redirects are siblings: (arith (word "...")) (redirect ...)
         # Format command substitutions using Word's method
-        formatted = Word(self.raw_content)._format_command_substitutions(
+        formatted = Word(self.raw_content, None, self.subs)._format_command_substitutions(
             self.raw_content, in_arith=True
         )
         escaped = (
@@ -4670,14 +5146,8 @@ class ArithmeticCommand(Node):
             .replace("\n", "\\n")
             .replace("\t", "\\t")
         )
-        result = '(arith (word "' + escaped + '"))'
-        if self.redirects:
-            redirect_parts: list[str] = []
-            for r in self.redirects:
-                redirect_parts.append(r.to_sexp())
-            redirect_sexps = " ".join(redirect_parts)
-            return result + " " + redirect_sexps
-        return result
+        out.write('(arith (word "' + escaped + '"))')
+        _write_redirects(out, self.redirects)
 
 
 # Arithmetic expression nodes
@@ -4686,6 +5156,8 @@ class ArithmeticCommand(Node):
 class ArithNode(Node):
     """Base class for arithmetic expression nodes."""
 
+    __slots__ = ()
+
     def to_sexp(self) -> str:
         raise NotImplementedError
 
@@ -4693,10 +5165,12 @@ class ArithNode(Node):
 class ArithNumber(ArithNode):
     """A numeric literal in arithmetic context."""
 
+    __slots__ = ("value",)
+
     value: str  # Raw string (may be hex, octal, base#n)
 
     def __init__(self, value: str):
-        self.kind = "number"
+        super().__init__("number")
         self.value = value
 
     def to_sexp(self) -> str:
@@ -4706,8 +5180,10 @@ class ArithNumber(ArithNode):
 class ArithEmpty(ArithNode):
     """A missing operand in arithmetic context (e.g., in $((|)) or $((1|)))."""
 
+    __slots__ = ()
+
     def __init__(self):
-        self.kind = "empty"
+        super().__init__("empty")
 
     def to_sexp(self) -> str:
         return "(empty)"
@@ -4716,10 +5192,12 @@ class ArithEmpty(ArithNode):
 class ArithVar(ArithNode):
     """A variable reference in arithmetic context (without $)."""
 
+    __slots__ = ("name",)
+
     name: str
 
     def __init__(self, name: str):
-        self.kind = "var"
+        super().__init__("var")
         self.name = name
 
     def to_sexp(self) -> str:
@@ -4729,12 +5207,14 @@ class ArithVar(ArithNode):
 class ArithBinaryOp(ArithNode):
     """A binary operation in arithmetic."""
 
+    __slots__ = ("op", "left", "right")
+
     op: str
     left: Node
     right: Node
 
     def __init__(self, op: str, left: Node, right: Node):
-        self.kind = "binary-op"
+        super().__init__("binary-op")
         self.op = op
         self.left = left
         self.right = right
@@ -4748,11 +5228,13 @@ class ArithBinaryOp(ArithNode):
 class ArithUnaryOp(ArithNode):
     """A unary operation in arithmetic."""
 
+    __slots__ = ("op", "operand")
+
     op: str
     operand: Node
 
     def __init__(self, op: str, operand: Node):
-        self.kind = "unary-op"
+        super().__init__("unary-op")
         self.op = op
         self.operand = operand
 
@@ -4763,10 +5245,12 @@ class ArithUnaryOp(ArithNode):
 class ArithPreIncr(ArithNode):
     """Pre-increment ++var."""
 
+    __slots__ = ("operand",)
+
     operand: Node
 
     def __init__(self, operand: Node):
-        self.kind = "pre-incr"
+        super().__init__("pre-incr")
         self.operand = operand
 
     def to_sexp(self) -> str:
@@ -4776,10 +5260,12 @@ class ArithPreIncr(ArithNode):
 class ArithPostIncr(ArithNode):
     """Post-increment var++."""
 
+    __slots__ = ("operand",)
+
     operand: Node
 
     def __init__(self, operand: Node):
-        self.kind = "post-incr"
+        super().__init__("post-incr")
         self.operand = operand
 
     def to_sexp(self) -> str:
@@ -4789,10 +5275,12 @@ class ArithPostIncr(ArithNode):
 class ArithPreDecr(ArithNode):
     """Pre-decrement --var."""
 
+    __slots__ = ("operand",)
+
     operand: Node
 
     def __init__(self, operand: Node):
-        self.kind = "pre-decr"
+        super().__init__("pre-decr")
         self.operand = operand
 
     def to_sexp(self) -> str:
@@ -4802,10 +5290,12 @@ class ArithPreDecr(ArithNode):
 class ArithPostDecr(ArithNode):
     """Post-decrement var--."""
 
+    __slots__ = ("operand",)
+
     operand: Node
 
     def __init__(self, operand: Node):
-        self.kind = "post-decr"
+        super().__init__("post-decr")
         self.operand = operand
 
     def to_sexp(self) -> str:
@@ -4815,12 +5305,14 @@ class ArithPostDecr(ArithNode):
 class ArithAssign(ArithNode):
     """Assignment operation (=, +=, -=, etc.)."""
 
+    __slots__ = ("op", "target", "value")
+
     op: str
     target: Node
     value: Node
 
     def __init__(self, op: str, target: Node, value: Node):
-        self.kind = "assign"
+        super().__init__("assign")
         self.op = op
         self.target = target
         self.value = value
@@ -4834,12 +5326,14 @@ class ArithAssign(ArithNode):
 class ArithTernary(ArithNode):
     """Ternary conditional expr ? expr : expr."""
 
+    __slots__ = ("condition", "if_true", "if_false")
+
     condition: Node
     if_true: Node | None
     if_false: Node | None
 
     def __init__(self, condition: Node, if_true: Node | None, if_false: Node | None):
-        self.kind = "ternary"
+        super().__init__("ternary")
         self.condition = condition
         self.if_true = if_true
         self.if_false = if_false
@@ -4859,11 +5353,13 @@ class ArithTernary(ArithNode):
 class ArithComma(ArithNode):
     """Comma operator expr, expr."""
 
+    __slots__ = ("left", "right")
+
     left: Node
     right: Node
 
     def __init__(self, left: Node, right: Node):
-        self.kind = "comma"
+        super().__init__("comma")
         self.left = left
         self.right = right
 
@@ -4874,11 +5370,13 @@ class ArithComma(ArithNode):
 class ArithSubscript(ArithNode):
     """Array subscript arr[expr]."""
 
+    __slots__ = ("array", "index")
+
     array: str
     index: Node
 
     def __init__(self, array: str, index: Node):
-        self.kind = "subscript"
+        super().__init__("subscript")
         self.array = array
         self.index = index
 
@@ -4889,10 +5387,12 @@ class ArithSubscript(ArithNode):
 class ArithEscape(ArithNode):
     """An escaped character in arithmetic expression."""
 
+    __slots__ = ("char",)
+
     char: str
 
     def __init__(self, char: str):
-        self.kind = "escape"
+        super().__init__("escape")
         self.char = char
 
     def to_sexp(self) -> str:
@@ -4902,10 +5402,12 @@ class ArithEscape(ArithNode):
 class ArithDeprecated(ArithNode):
     """A deprecated arithmetic expansion $[expr]."""
 
+    __slots__ = ("expression",)
+
     expression: str
 
     def __init__(self, expression: str):
-        self.kind = "arith-deprecated"
+        super().__init__("arith-deprecated")
         self.expression = expression
 
     def to_sexp(self) -> str:
@@ -4916,10 +5418,12 @@ class ArithDeprecated(ArithNode):
 class ArithConcat(ArithNode):
     """A concatenation of prefix + expansion in arithmetic (e.g., 0x$var)."""
 
+    __slots__ = ("parts",)
+
     parts: list[Node]
 
     def __init__(self, parts: list[Node]):
-        self.kind = "arith-concat"
+        super().__init__("arith-concat")
         self.parts = parts
 
     def to_sexp(self) -> str:
@@ -4932,10 +5436,12 @@ class ArithConcat(ArithNode):
 class AnsiCQuote(Node):
     """An ANSI-C quoted string $'...'."""
 
+    __slots__ = ("content",)
+
     content: str
 
     def __init__(self, content: str):
-        self.kind = "ansi-c"
+        super().__init__("ansi-c")
         self.content = content
 
     def to_sexp(self) -> str:
@@ -4946,10 +5452,12 @@ class AnsiCQuote(Node):
 class LocaleString(Node):
     """A locale-translated string $"..."."""
 
+    __slots__ = ("content",)
+
     content: str
 
     def __init__(self, content: str):
-        self.kind = "locale"
+        super().__init__("locale")
         self.content = content
 
     def to_sexp(self) -> str:
@@ -4960,84 +5468,109 @@ class LocaleString(Node):
 class ProcessSubstitution(Node):
     """A process substitution <(...) or >(...)."""
 
+    __slots__ = ("direction", "command")
+
     direction: str  # "<" for input, ">" for output
     command: Node
 
     def __init__(self, direction: str, command: Node):
-        self.kind = "procsub"
+        super().__init__("procsub")
         self.direction = direction
         self.command = command
 
     def to_sexp(self) -> str:
-        return '(procsub "' + self.direction + '" ' + self.command.to_sexp() + ")"
+        return _sexp_via_writer(self)
+
+    def write_sexp(self, out: SexpWriter) -> None:
+        out.write('(procsub "' + self.direction + '" ')
+        self.command.write_sexp(out)
+        out.write(")")
 
 
 class Negation(Node):
     """Pipeline negation with !."""
 
+    __slots__ = ("pipeline",)
+
     pipeline: Node
 
     def __init__(self, pipeline: Node):
-        self.kind = "negation"
+        super().__init__("negation")
         self.pipeline = pipeline
 
     def to_sexp(self) -> str:
-        return "(negation " + self.pipeline.to_sexp() + ")"
+        return _sexp_via_writer(self)
+
+    def write_sexp(self, out: SexpWriter) -> None:
+        out.write("(negation ")
+        self.pipeline.write_sexp(out)
+        out.write(")")
 
 
 class Time(Node):
     """Time measurement with time keyword."""
 
+    __slots__ = ("pipeline", "posix")
+
     pipeline: Node
-    posix: bool = False  # -p flag
+    posix: bool  # -p flag
 
     def __init__(self, pipeline: Node, posix: bool = False):
-        self.kind = "time"
+        super().__init__("time")
         self.pipeline = pipeline
         self.posix = posix
 
     def to_sexp(self) -> str:
+        return _sexp_via_writer(self)
+
+    def write_sexp(self, out: SexpWriter) -> None:
         if self.posix:
-            return "(time -p " + self.pipeline.to_sexp() + ")"
-        return "(time " + self.pipeline.to_sexp() + ")"
+            out.write("(time -p ")
+        else:
+            out.write("(time ")
+        self.pipeline.write_sexp(out)
+        out.write(")")
 
 
 class ConditionalExpr(Node):
     """A conditional expression [[ expression ]]."""
 
+    __slots__ = ("body", "redirects")
+
     body: CondNode | str  # Parsed node or raw string for backwards compat
     redirects: list[Node]
 
     def __init__(self, body: CondNode | str, redirects: list[Node] | None = None):
-        self.kind = "cond-expr"
+        super().__init__("cond-expr")
         self.body = body
         if redirects is None:
             redirects = []
         self.redirects = redirects
 
     def to_sexp(self) -> str:
+        return _sexp_via_writer(self)
+
+    def write_sexp(self, out: SexpWriter) -> None:
         # bash-oracle format: (cond ...) not (cond-expr ...)
         # Redirects are siblings, not children: (cond ...) (redirect ...)
         body = self.body
         if isinstance(body, str):
             escaped = body.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
-            result = '(cond "' + escaped + '")'
+            out.write('(cond "' + escaped + '")')
         elif isinstance(body, CondNode):
-            result = "(cond " + body.to_sexp() + ")"
+            out.write("(cond ")
+            body.write_sexp(out)
+            out.write(")")
         else:
-            result = "(cond)"
-        if self.redirects:
-            redirect_parts: list[str] = []
-            for r in self.redirects:
-                redirect_parts.append(r.to_sexp())
-            redirect_sexps = " ".join(redirect_parts)
-            return result + " " + redirect_sexps
-        return result
+            out.write("(cond)")
+        _write_redirects(out, self.redirects)
 
 
 class CondNode(Node):
     """Base class for conditional expression nodes."""
 
+    __slots__ = ()
+
     def to_sexp(self) -> str:
         raise NotImplementedError
 
@@ -5045,11 +5578,13 @@ class CondNode(Node):
 class UnaryTest(CondNode):
     """A unary test in [[ ]], e.g., -f file, -z string."""
 
+    __slots__ = ("op", "operand")
+
     op: str
     operand: Word
 
     def __init__(self, op: str, operand: Word):
-        self.kind = "unary-test"
+        super().__init__("unary-test")
         self.op = op
         self.operand = operand
 
@@ -5063,12 +5598,14 @@ class UnaryTest(CondNode):
 class BinaryTest(CondNode):
     """A binary test in [[ ]], e.g., $a == $b, file1 -nt file2."""
 
+    __slots__ = ("op", "left", "right")
+
     op: str
     left: Word
     right: Word
 
     def __init__(self, op: str, left: Word, right: Word):
-        self.kind = "binary-test"
+        super().__init__("binary-test")
         self.op = op
         self.left = left
         self.right = right
@@ -5092,97 +5629,137 @@ class BinaryTest(CondNode):
 class CondAnd(CondNode):
     """Logical AND in [[ ]], e.g., expr1 && expr2."""
 
+    __slots__ = ("left", "right")
+
     left: CondNode
     right: CondNode
 
     def __init__(self, left: CondNode, right: CondNode):
-        self.kind = "cond-and"
+        super().__init__("cond-and")
         self.left = left
         self.right = right
 
     def to_sexp(self) -> str:
-        return "(cond-and " + self.left.to_sexp() + " " + self.right.to_sexp() + ")"
+        return _sexp_via_writer(self)
+
+    def write_sexp(self, out: SexpWriter) -> None:
+        out.write("(cond-and ")
+        self.left.write_sexp(out)
+        out.write(" ")
+        self.right.write_sexp(out)
+        out.write(")")
 
 
 class CondOr(CondNode):
     """Logical OR in [[ ]], e.g., expr1 || expr2."""
 
+    __slots__ = ("left", "right")
+
     left: CondNode
     right: CondNode
 
     def __init__(self, left: CondNode, right: CondNode):
-        self.kind = "cond-or"
+        super().__init__("cond-or")
         self.left = left
         self.right = right
 
     def to_sexp(self) -> str:
-        return "(cond-or " + self.left.to_sexp() + " " + self.right.to_sexp() + ")"
+        return _sexp_via_writer(self)
+
+    def write_sexp(self, out: SexpWriter) -> None:
+        out.write("(cond-or ")
+        self.left.write_sexp(out)
+        out.write(" ")
+        self.right.write_sexp(out)
+        out.write(")")
 
 
 class CondNot(CondNode):
     """Logical NOT in [[ ]], e.g., ! expr."""
 
+    __slots__ = ("operand",)
+
     operand: CondNode
 
     def __init__(self, operand: CondNode):
-        self.kind = "cond-not"
+        super().__init__("cond-not")
         self.operand = operand
 
     def to_sexp(self) -> str:
         # bash-oracle ignores negation - just output the operand
         return self.operand.to_sexp()
 
+    def write_sexp(self, out: SexpWriter) -> None:
+        self.operand.write_sexp(out)
+
 
 class CondParen(CondNode):
     """Parenthesized group in [[ ]], e.g., ( expr )."""
 
+    __slots__ = ("inner",)
+
     inner: CondNode
 
     def __init__(self, inner: CondNode):
-        self.kind = "cond-paren"
+        super().__init__("cond-paren")
         self.inner = inner
 
     def to_sexp(self) -> str:
-        return "(cond-expr " + self.inner.to_sexp() + ")"
+        return _sexp_via_writer(self)
+
+    def write_sexp(self, out: SexpWriter) -> None:
+        out.write("(cond-expr ")
+        self.inner.write_sexp(out)
+        out.write(")")
 
 
 class Array(Node):
     """An array literal (word1 word2 ...)."""
 
+    __slots__ = ("elements",)
+
     elements: list[Word]
 
     def __init__(self, elements: list[Word]):
-        self.kind = "array"
+        super().__init__("array")
         self.elements = elements
 
     def to_sexp(self) -> str:
-        if not self.elements:
-            return "(array)"
-        parts: list[str] = []
+        return _sexp_via_writer(self)
+
+    def write_sexp(self, out: SexpWriter) -> None:
+        out.write("(array")
         for e in self.elements:
-            parts.append(e.to_sexp())
-        inner = " ".join(parts)
-        return "(array " + inner + ")"
+            out.write(" ")
+            e.write_sexp(out)
+        out.write(")")
 
 
 class Coproc(Node):
     """A coprocess coproc [NAME] command."""
 
+    __slots__ = ("command", "name")
+
     command: Node
-    name: str | None = None
+    name: str | None
 
     def __init__(self, command: Node, name: str | None = None):
-        self.kind = "coproc"
+        super().__init__("coproc")
         self.command = command
         self.name = name
 
     def to_sexp(self) -> str:
+        return _sexp_via_writer(self)
+
+    def write_sexp(self, out: SexpWriter) -> None:
         # Use provided name for compound commands, "COPROC" for simple commands
         if self.name is not None:
             name = self.name
         else:
             name = "COPROC"
-        return '(coproc "' + name + '" ' + self.command.to_sexp() + ")"
+        out.write('(coproc "' + name + '" ')
+        self.command.write_sexp(out)
+        out.write(")")
 
 
 def _format_cond_body(node: CondNode) -> str:
@@ -6616,11 +7193,11 @@ def _assignment(s: str, flags: int = 0) -> int:
 
 def _is_array_assignment_prefix(chars: list[str]) -> bool:
     """Check if chars form name or name[subscript]... for array assignments."""
-    if not chars:
+    s = "".join(chars)
+    if not s:
         return False
-    if not (chars[0].isalpha() or chars[0] == "_"):
+    if not (s[0].isalpha() or s[0] == "_"):
         return False
-    s = "".join(chars)
     i = 1
     while i < len(s) and (s[i].isalnum() or s[i] == "_"):
         i += 1
@@ -6739,14 +7316,71 @@ WORD_CTX_NORMAL = 0  # Regular command context
 WORD_CTX_COND = 1  # Inside [[ ]]
 WORD_CTX_REGEX = 2  # RHS of =~ in [[ ]]
 
+# Peeked tokens kept by the parser before the cache is dropped
+TOKEN_CACHE_SIZE = 16
+
+
+def _token_key_without_word_flags(key: int) -> int:
+    """Turn a Parser._token_cache_key() into the key for tokens the word flags didn't affect."""
+    return key - (key // 65536 % 8) * 65536 + 1
+
+
+class ParseStats:
+    """Counters collected by a parser whose stats field is set.
+
+    Nested parsers share their parent's stats. Timings stay 0.0 unless clock()
+    is overridden to return seconds (parable_extras.parse does so). Lexing a
+    word parses any substitutions in it, and that time counts as lexing.
+    """
+
+    tokens_lexed: int
+    tokens_consumed: int
+    token_cache_hits: int
+    token_cache_drops: int  # Peeked tokens discarded without being consumed
+    state_saves: int
+    state_restores: int
+    sub_parsers: int
+    heredocs_gathered: int
+    max_depth: int  # Deepest nesting reached, as bounded by Parser max_depth
+    lex_seconds: float
+    parse_seconds: float
+    sexp_seconds: float
+
+    def __init__(self):
+        self.tokens_lexed = 0
+        self.tokens_consumed = 0
+        self.token_cache_hits = 0
+        self.token_cache_drops = 0
+        self.state_saves = 0
+        self.state_restores = 0
+        self.sub_parsers = 0
+        self.heredocs_gathered = 0
+        self.max_depth = 0
+        self.lex_seconds = 0.0
+        self.parse_seconds = 0.0
+        self.sexp_seconds = 0.0
+        self._lex_depth = 0
+
+    def clock(self) -> float:
+        """Current time in seconds; parable.py has no clock, so timings stay 0."""
+        return 0.0
+
 
 class Parser:
     """Recursive descent parser for bash."""
 
-    def __init__(self, source: str, in_process_sub: bool = False, extglob: bool = False):
+    def __init__(
+        self,
+        source: str,
+        in_process_sub: bool = False,
+        extglob: bool = False,
+        max_depth: int = 0,
+    ):
         self.source = source
         self.pos = 0
         self.length: int = len(source)
+        # Substitution ASTs kept for serialization (shared with nested sub-parsers)
+        self.subs: SubstitutionTable = SubstitutionTable()
         self._pending_heredocs: list[HereDoc] = []
         # Track heredoc content that was consumed into command/process substitutions
         # and needs to be skipped when we reach a newline
@@ -6773,10 +7407,26 @@ class Parser:
         self._at_command_start = False
         self._in_array_literal = False
         self._in_assign_builtin = False
+        # Peeked tokens not yet consumed, by _token_cache_key(), and the position
+        # after reading each (may differ from token.pos due to heredocs)
+        self._token_cache: dict[int, Token] = {}
+        self._token_cache_end: dict[int, int] = {}
+        # Instrumentation counters; None (the default) keeps them off
+        self.stats: ParseStats | None = None
+        # Nesting of pipelines, arithmetic and conditional groups and ${...};
+        # max_depth > 0 turns deeper input into a ParseError
+        self._nesting: NestingDepth = NestingDepth(max_depth)
         # Arithmetic expression parsing context (for nested parsing)
         self._arith_src: str = ""
         self._arith_pos: int = 0
         self._arith_len: int = 0
+        # Whether _arith_src is this parser's source (the window of a $((...)))
+        self._arith_in_source = False
+        # Ends of nested $(( and $( found by _scan_arith_expansion
+        self._arith_spans: ArithSpans = ArithSpans()
+        # Offset of source[0] in the input being parsed, added to node spans; -1
+        # for sub-parsers reading copied text, whose nodes get no span
+        self._offset: int = 0
 
     def _set_state(self, flag: int) -> None:
         """Set a parser state flag."""
@@ -6796,12 +7446,15 @@ class Parser:
         Based on bash's save_parser_state(). Used when entering nested
         constructs like command substitutions to preserve context.
         """
+        if self.stats is not None:
+            self.stats.state_saves += 1
         return SavedParserState(
             parser_state=self._parser_state,
             dolbrace_state=self._dolbrace_state,
             pending_heredocs=list(self._pending_heredocs),
             ctx_stack=self._ctx.copy_stack(),
             eof_token=self._eof_token,
+            depth=self._nesting.depth,
         )
 
     def _restore_parser_state(self, saved: SavedParserState) -> None:
@@ -6811,9 +7464,12 @@ class Parser:
         since we've advanced through the nested content. Heredocs are also not
         restored since they were consumed during nested parsing.
         """
+        if self.stats is not None:
+            self.stats.state_restores += 1
         self._parser_state = saved.parser_state
         self._dolbrace_state = saved.dolbrace_state
         self._eof_token = saved.eof_token
+        self._nesting.depth = saved.depth
         # Restore complete context stack
         self._ctx.restore_from(saved.ctx_stack)
 
@@ -6851,16 +7507,6 @@ class Parser:
 
     def _sync_lexer(self) -> None:
         """Sync Lexer position and state to Parser."""
-        # Invalidate cache if it doesn't match our current position or context
-        if self._lexer._token_cache is not None:
-            if (
-                self._lexer._token_cache.pos != self.pos
-                or self._lexer._cached_word_context != self._word_context
-                or self._lexer._cached_at_command_start != self._at_command_start
-                or self._lexer._cached_in_array_literal != self._in_array_literal
-                or self._lexer._cached_in_assign_builtin != self._in_assign_builtin
-            ):
-                self._lexer._token_cache = None
         # Sync lexer position
         if self._lexer.pos != self.pos:
             self._lexer.pos = self.pos
@@ -6878,62 +7524,197 @@ class Parser:
         """Sync Parser position to Lexer position."""
         self.pos = self._lexer.pos
 
+    def _token_cache_key(self) -> int:
+        """Pack position and the state the lexer's result depends on into one key."""
+        eof = 0
+        if self._eof_token == ")":
+            eof = 1
+        elif self._eof_token == "}":
+            eof = 2
+        elif self._eof_token is not None:
+            eof = 3
+        flags = (
+            (4 if self._at_command_start else 0)
+            + (2 if self._in_array_literal else 0)
+            + (1 if self._in_assign_builtin else 0)
+        )
+        state = self._parser_state & (ParserStateFlags.PST_CASEPAT | ParserStateFlags.PST_EOFTOKEN)
+        # Low bit 0 marks a key holding the word flags (bits 16-18), see
+        # _token_key_without_word_flags
+        return ((((self.pos * 4 + self._word_context) * 8 + flags) * 8192 + state) * 4 + eof) * 2
+
+    def _cached_token_key(self) -> int:
+        """Key of the cached token valid in the current context, or -1."""
+        key = self._token_cache_key()
+        if key in self._token_cache:
+            return key
+        key = _token_key_without_word_flags(key)
+        if key in self._token_cache:
+            return key
+        return -1
+
     def _lex_peek_token(self) -> Token:
         """Peek at next token via Lexer."""
-        # Check if cached token is valid: same position AND same word context
-        # (word context affects how array subscripts and other constructs are parsed)
-        if (
-            self._lexer._token_cache is not None
-            and self._lexer._token_cache.pos == self.pos
-            and self._lexer._cached_word_context == self._word_context
-            and self._lexer._cached_at_command_start == self._at_command_start
-            and self._lexer._cached_in_array_literal == self._in_array_literal
-            and self._lexer._cached_in_assign_builtin == self._in_assign_builtin
-        ):
-            return self._lexer._token_cache
+        # Word context and parser state change how the same text is tokenized
+        # (array subscripts, reserved words, EOF token), so they are part of the key
+        key = self._cached_token_key()
+        if key != -1:
+            if self.stats is not None:
+                self.stats.token_cache_hits += 1
+            return self._token_cache[key]
         # Need to read a new token - sync lexer to our position first
         saved_pos = self.pos
         self._sync_lexer()
-        result = self._lexer.peek_token()
-        # Save the context used for this cached token
-        self._lexer._cached_word_context = self._word_context
-        self._lexer._cached_at_command_start = self._at_command_start
-        self._lexer._cached_in_array_literal = self._in_array_literal
-        self._lexer._cached_in_assign_builtin = self._in_assign_builtin
-        # Save the post-read position (may have advanced for heredocs)
-        self._lexer._post_read_pos = self._lexer.pos
+        saved_last = self._lexer._last_read_token
+        # Words read while lexing this one (nested substitutions) leave the flag
+        # set for it too, which only makes the entry more specific than needed
+        saved_used = self._lexer._used_word_flags
+        self._lexer._used_word_flags = False
+        if self.stats is not None:
+            result = self._lex_counted()
+        else:
+            result = self._lexer.next_token()
+        used_word_flags = self._lexer._used_word_flags
+        self._lexer._used_word_flags = saved_used or used_word_flags
+        self._lexer._last_read_token = saved_last  # Peeking shouldn't advance history
+        end = self._lexer.pos
         # Restore parser position for peek semantics
         self.pos = saved_pos
+        # Store under the context as it is now: words parsed while lexing (array
+        # literal elements) reset it, and the caller consumes the token in that state.
+        # A token the word flags didn't affect is valid whatever they are.
+        key = self._token_cache_key()
+        if not used_word_flags:
+            key = _token_key_without_word_flags(key)
+        if len(self._token_cache) >= TOKEN_CACHE_SIZE:
+            self._drop_token_cache()
+        self._token_cache[key] = result
+        # Save the post-read position (may have advanced for heredocs)
+        self._token_cache_end[key] = end
         return result
 
     def _lex_next_token(self) -> Token:
         """Get next token via Lexer and sync position."""
-        # Check if cached token is valid: same position AND same word context
-        if (
-            self._lexer._token_cache is not None
-            and self._lexer._token_cache.pos == self.pos
-            and self._lexer._cached_word_context == self._word_context
-            and self._lexer._cached_at_command_start == self._at_command_start
-            and self._lexer._cached_in_array_literal == self._in_array_literal
-            and self._lexer._cached_in_assign_builtin == self._in_assign_builtin
-        ):
+        key = self._cached_token_key()
+        if key != -1:
             # Consume cached token - use saved post-read position
-            tok = self._lexer.next_token()
-            self.pos = self._lexer._post_read_pos
-            self._lexer.pos = self._lexer._post_read_pos
+            tok = self._token_cache[key]
+            self.pos = self._token_cache_end[key]
+            self._lexer.pos = self.pos
+            self._lexer._last_read_token = tok
+            if self.stats is not None:
+                self.stats.token_cache_hits += 1
+                self.stats.token_cache_drops -= 1  # Consumed, not discarded
         else:
             # No valid cache - sync and read fresh
             self._sync_lexer()
-            tok = self._lexer.next_token()
-            # Save context for this token
-            self._lexer._cached_word_context = self._word_context
-            self._lexer._cached_at_command_start = self._at_command_start
-            self._lexer._cached_in_array_literal = self._in_array_literal
-            self._lexer._cached_in_assign_builtin = self._in_assign_builtin
+            if self.stats is not None:
+                tok = self._lex_counted()
+            else:
+                tok = self._lexer.next_token()
             self._sync_parser()
+        if self.stats is not None:
+            self.stats.tokens_consumed += 1
+        # Other entries were peeked at or before this token: they are stale now
+        self._drop_token_cache()
         self._record_token(tok)
         return tok
 
+    def _lex_counted(self) -> Token:
+        """Read a token from the Lexer, counting it and timing the outermost read."""
+        stats = self.stats
+        assert stats is not None
+        stats.tokens_lexed += 1
+        # Depth is restored rather than decremented, so a read abandoned by an
+        # exception doesn't leave it raised
+        depth = stats._lex_depth
+        stats._lex_depth = depth + 1
+        start = stats.clock() if depth == 0 else 0.0
+        tok = self._lexer.next_token()
+        stats._lex_depth = depth
+        if depth == 0:
+            stats.lex_seconds += stats.clock() - start
+        return tok
+
+    def _drop_token_cache(self) -> None:
+        """Forget all peeked tokens."""
+        if len(self._token_cache) > 0:
+            if self.stats is not None:
+                self.stats.token_cache_drops += len(self._token_cache)
+            self._token_cache = {}
+            self._token_cache_end = {}
+
+    def _set_window(self, start: int, end: int) -> None:
+        """Parse only source[start:end], reading the shared buffer in place."""
+        self.pos = start
+        self.length = end
+        self._lexer.pos = start
+        self._lexer.length = end
+
+    def _new_sub_parser(
+        self, source: str, in_process_sub: bool, start: int = 0, end: int = -1, offset: int = -1
+    ) -> Parser:
+        """Create a parser for nested content sharing this one's tables and stats.
+
+        With end set it parses source[start:end] in place, so nested content that
+        appears verbatim in the buffer is not copied once per nesting level.
+        offset is where source[0] sits in the input, or -1 for copied text.
+        """
+        sub_parser = Parser(source, in_process_sub, self._extglob)
+        sub_parser._offset = offset
+        if end != -1:
+            sub_parser._set_window(start, end)
+        sub_parser.subs = self.subs
+        sub_parser._nesting = self._nesting
+        if self.stats is not None:
+            sub_parser.stats = self.stats
+            self.stats.sub_parsers += 1
+        return sub_parser
+
+    def _span(self, node: Node, start: int) -> None:
+        """Record node as covering source[start:pos], in input offsets."""
+        self._span_to(node, start, self.pos)
+
+    def _span_to(self, node: Node, start: int, end: int) -> None:
+        """Record node as covering source[start:end], in input offsets."""
+        if self._offset >= 0:
+            node.start = start + self._offset
+            node.end = end + self._offset
+
+    def _span_compound(self, node: Node, start: int, end: int, redirects: list[Node]) -> None:
+        """Record a compound command as covering source[start:end] and its redirects."""
+        self._span_to(node, start, end)
+        if redirects and self._offset >= 0:
+            node.end = redirects[len(redirects) - 1].end
+
+    def _span_from(self, node: Node, start: int, last: Node) -> None:
+        """Record node as covering source[start:] through its child last."""
+        if self._offset >= 0:
+            node.start = start + self._offset
+            node.end = last.end
+
+    def _span_nodes(self, node: Node, first: Node, last: Node) -> None:
+        """Record node as covering its children from first through last."""
+        node.start = first.start
+        node.end = last.end
+
+    def _enter_nesting(self) -> int:
+        """Count one more level of nesting, raising ParseError past max_depth.
+
+        Returns the depth to put back on leaving the level. It is restored rather
+        than decremented, so levels abandoned by an exception don't stay counted
+        once a fallback that caught it restores its own.
+        """
+        nesting = self._nesting
+        depth = nesting.depth + 1
+        nesting.depth = depth
+        if self.stats is not None and depth > self.stats.max_depth:
+            self.stats.max_depth = depth
+        if nesting.limit > 0 and depth > nesting.limit:
+            nesting.exceeded = True
+            raise ParseError("Maximum nesting depth exceeded", self.pos)
+        return depth - 1
+
     def _lex_skip_blanks(self) -> None:
         """Skip blanks via Lexer."""
         self._sync_lexer()
@@ -7401,9 +8182,24 @@ class Parser:
         self.advance()  # consume final )
         text_end = self.pos
         text = _substring(self.source, start, text_end)
+        if not self._has_unread_heredoc(saved):
+            self.subs.add(_substring(text, 2, len(text) - 1), cmd)
 
         self._restore_parser_state(saved)
-        return CommandSubstitution(cmd), text
+        node = CommandSubstitution(cmd)
+        self._span(node, start)
+        return node, text
+
+    def _has_unread_heredoc(self, saved: SavedParserState) -> bool:
+        """Whether a heredoc registered since saved is still waiting for its body.
+
+        Its body lies past the substitution's closing delimiter, so the inline AST
+        doesn't match what parsing the substitution text alone would produce.
+        """
+        for heredoc in self._pending_heredocs:
+            if heredoc not in saved.pending_heredocs:
+                return True
+        return False
 
     def _parse_funsub(self, start: int) -> tuple[Node | None, str]:
         """Parse brace command substitution ${ cmd; } or ${| cmd; }.
@@ -7430,6 +8226,8 @@ class Parser:
             raise MatchedPairError("unexpected EOF looking for `}'", start)
         self.advance()  # consume final }
         text = _substring(self.source, start, self.pos)
+        if not self._has_unread_heredoc(saved):
+            self.subs.add(_substring(text, 2, len(text) - 1).lstrip(" \t\n|"), cmd)
         self._restore_parser_state(saved)
         self._sync_lexer()
         return CommandSubstitution(cmd, brace=True), text
@@ -7454,9 +8252,9 @@ class Parser:
         # \$ -> $, \` -> `, \\ -> \, \<newline> -> removed (line continuation)
         # other \X -> \X (backslash is literal)
         # content_chars: what gets parsed as the inner command
-        # text_chars: what appears in the word representation (with line continuations removed)
+        # text: the source as written, for the word representation, less line continuations
         content_chars: list[str] = []
-        text_chars = ["`"]  # opening backtick
+        continuations: list[int] = []
         # Heredoc state tracking
         pending_heredocs: list[tuple[str, bool]] = []
         in_heredoc_body = False
@@ -7476,11 +8274,9 @@ class Parser:
                     # Found delimiter - add line to content and exit body mode
                     for ch in line:
                         content_chars.append(ch)
-                        text_chars.append(ch)
                     self.pos = line_end
                     if self.pos < self.length and self.source[self.pos] == "\n":
                         content_chars.append("\n")
-                        text_chars.append("\n")
                         self.advance()
                     in_heredoc_body = False
                     if len(pending_heredocs) > 0:
@@ -7494,7 +8290,6 @@ class Parser:
                     end_pos = tabs_stripped + len(current_heredoc_delim)
                     for i in range(end_pos):
                         content_chars.append(line[i])
-                        text_chars.append(line[i])
                     self.pos = line_start + end_pos
                     in_heredoc_body = False
                     if len(pending_heredocs) > 0:
@@ -7504,11 +8299,9 @@ class Parser:
                     # Not delimiter - add line and newline to content
                     for ch in line:
                         content_chars.append(ch)
-                        text_chars.append(ch)
                     self.pos = line_end
                     if self.pos < self.length and self.source[self.pos] == "\n":
                         content_chars.append("\n")
-                        text_chars.append("\n")
                         self.advance()
                 continue
 
@@ -7519,21 +8312,18 @@ class Parser:
                 next_c = self.source[self.pos + 1]
                 if next_c == "\n":
                     # Line continuation: skip both backslash and newline
+                    continuations.append(self.pos)
                     self.advance()  # skip \
                     self.advance()  # skip newline
-                    # Don't add to content_chars or text_chars
                 elif _is_escape_char_in_backtick(next_c):
                     # Escape sequence: skip backslash in content, keep both in text
                     self.advance()  # skip \
                     escaped = self.advance()
                     content_chars.append(escaped)
-                    text_chars.append("\\")
-                    text_chars.append(escaped)
                 else:
                     # Backslash is literal before other characters
                     ch = self.advance()
                     content_chars.append(ch)
-                    text_chars.append(ch)
                 continue
 
             # Heredoc declaration
@@ -7541,16 +8331,12 @@ class Parser:
                 # Check for here-string <<<
                 if self.pos + 2 < self.length and self.source[self.pos + 2] == "<":
                     content_chars.append(self.advance())  # <
-                    text_chars.append("<")
                     content_chars.append(self.advance())  # <
-                    text_chars.append("<")
                     content_chars.append(self.advance())  # <
-                    text_chars.append("<")
                     # Skip whitespace and here-string word
                     while not self.at_end() and _is_whitespace_no_newline(self.peek()):
                         ch = self.advance()
                         content_chars.append(ch)
-                        text_chars.append(ch)
                     while (
                         not self.at_end()
                         and not _is_whitespace(self.peek())
@@ -7559,47 +8345,36 @@ class Parser:
                         if self.peek() == "\\" and self.pos + 1 < self.length:
                             ch = self.advance()
                             content_chars.append(ch)
-                            text_chars.append(ch)
                             ch = self.advance()
                             content_chars.append(ch)
-                            text_chars.append(ch)
                         elif self.peek() in "\"'":
                             quote = self.peek()
                             ch = self.advance()
                             content_chars.append(ch)
-                            text_chars.append(ch)
                             while not self.at_end() and self.peek() != quote:
                                 if quote == '"' and self.peek() == "\\":
                                     ch = self.advance()
                                     content_chars.append(ch)
-                                    text_chars.append(ch)
                                 ch = self.advance()
                                 content_chars.append(ch)
-                                text_chars.append(ch)
                             if not self.at_end():
                                 ch = self.advance()
                                 content_chars.append(ch)
-                                text_chars.append(ch)
                         else:
                             ch = self.advance()
                             content_chars.append(ch)
-                            text_chars.append(ch)
                     continue
                 # Heredoc <<
                 content_chars.append(self.advance())  # <
-                text_chars.append("<")
                 content_chars.append(self.advance())  # <
-                text_chars.append("<")
                 strip_tabs = False
                 if not self.at_end() and self.peek() == "-":
                     strip_tabs = True
                     content_chars.append(self.advance())
-                    text_chars.append("-")
                 # Skip whitespace
                 while not self.at_end() and _is_whitespace_no_newline(self.peek()):
                     ch = self.advance()
                     content_chars.append(ch)
-                    text_chars.append(ch)
                 # Parse delimiter
                 delimiter_chars: list[str] = []
                 if not self.at_end():
@@ -7607,29 +8382,23 @@ class Parser:
                     if _is_quote(ch):
                         quote = self.advance()
                         content_chars.append(quote)
-                        text_chars.append(quote)
                         while not self.at_end() and self.peek() != quote:
                             dch = self.advance()
                             content_chars.append(dch)
-                            text_chars.append(dch)
                             delimiter_chars.append(dch)
                         if not self.at_end():
                             closing = self.advance()
                             content_chars.append(closing)
-                            text_chars.append(closing)
                     elif ch == "\\":
                         esc = self.advance()
                         content_chars.append(esc)
-                        text_chars.append(esc)
                         if not self.at_end():
                             dch = self.advance()
                             content_chars.append(dch)
-                            text_chars.append(dch)
                             delimiter_chars.append(dch)
                         while not self.at_end() and not _is_metachar(self.peek()):
                             dch = self.advance()
                             content_chars.append(dch)
-                            text_chars.append(dch)
                             delimiter_chars.append(dch)
                     else:
                         # Stop at backtick (closes substitution) or metachar
@@ -7642,29 +8411,23 @@ class Parser:
                             if _is_quote(ch):
                                 quote = self.advance()
                                 content_chars.append(quote)
-                                text_chars.append(quote)
                                 while not self.at_end() and self.peek() != quote:
                                     dch = self.advance()
                                     content_chars.append(dch)
-                                    text_chars.append(dch)
                                     delimiter_chars.append(dch)
                                 if not self.at_end():
                                     closing = self.advance()
                                     content_chars.append(closing)
-                                    text_chars.append(closing)
                             elif ch == "\\":
                                 esc = self.advance()
                                 content_chars.append(esc)
-                                text_chars.append(esc)
                                 if not self.at_end():
                                     dch = self.advance()
                                     content_chars.append(dch)
-                                    text_chars.append(dch)
                                     delimiter_chars.append(dch)
                             else:
                                 dch = self.advance()
                                 content_chars.append(dch)
-                                text_chars.append(dch)
                                 delimiter_chars.append(dch)
                 delimiter = "".join(delimiter_chars)
                 if delimiter:
@@ -7675,7 +8438,6 @@ class Parser:
             if c == "\n":
                 ch = self.advance()
                 content_chars.append(ch)
-                text_chars.append(ch)
                 if len(pending_heredocs) > 0:
                     current_heredoc_delim, current_heredoc_strip = pending_heredocs.pop(0)
                     in_heredoc_body = True
@@ -7684,14 +8446,20 @@ class Parser:
             # Regular character
             ch = self.advance()
             content_chars.append(ch)
-            text_chars.append(ch)
 
         if self.at_end():
             raise ParseError("Unterminated backtick", start)
 
         self.advance()  # consume closing `
-        text_chars.append("`")  # closing backtick
-        text = "".join(text_chars)
+        text = _substring(self.source, start, self.pos)
+        if len(continuations) > 0:
+            text_parts: list[str] = []
+            copied = start
+            for pos in continuations:
+                text_parts.append(_substring(self.source, copied, pos))
+                copied = pos + 2
+            text_parts.append(_substring(self.source, copied, self.pos))
+            text = "".join(text_parts)
         content = "".join(content_chars)
 
         # Check for heredocs whose bodies follow the closing backtick
@@ -7707,12 +8475,14 @@ class Parser:
                     self._cmdsub_heredoc_end = max(self._cmdsub_heredoc_end, heredoc_end)
 
         # Parse the content as a command list
-        sub_parser = Parser(content, False, self._extglob)
+        sub_parser = self._new_sub_parser(content, False)
         cmd = sub_parser.parse_list(True)
         if cmd is None:
             cmd = Empty()
 
-        return CommandSubstitution(cmd), text
+        node = CommandSubstitution(cmd)
+        self._span(node, start)
+        return node, text
 
     def _parse_process_substitution(self) -> tuple[Node | None, str]:
         """Parse a <(...) or >(...) process substitution using EOF token mechanism.
@@ -7757,15 +8527,21 @@ class Parser:
             text = _substring(self.source, start, text_end)
             # Strip line continuations (backslash-newline) from text
             text = _strip_line_continuations_comment_aware(text)
+            if not self._has_unread_heredoc(saved):
+                self.subs.add(_substring(text, 2, len(text) - 1), cmd)
 
             self._restore_parser_state(saved)
             self._in_process_sub = old_in_process_sub
-            return ProcessSubstitution(direction, cmd), text
+            node = ProcessSubstitution(direction, cmd)
+            self._span(node, start)
+            return node, text
 
         except (ParseError, MatchedPairError) as e:
             # Parsing failed - check if we should error or fall back to literal
             self._restore_parser_state(saved)
             self._in_process_sub = old_in_process_sub
+            if self._nesting.exceeded:
+                raise e
 
             # Check what's after the opening <( or >(
             content_start_char = self.source[start + 2] if start + 2 < self.length else ""
@@ -7829,7 +8605,9 @@ class Parser:
 
         text = _substring(self.source, start, self.pos)
         self._clear_state(ParserStateFlags.PST_COMPASSIGN)
-        return Array(elements), text
+        node = Array(elements)
+        self._span(node, start)
+        return node, text
 
     def _parse_arithmetic_expansion(self) -> tuple[Node | None, str]:
         """Parse a $((...)) arithmetic expansion with parsed internals.
@@ -7847,71 +8625,101 @@ class Parser:
             or self.source[self.pos + 2] != "("
         ):
             return None, ""
-        self.advance()  # consume $
-        self.advance()  # consume first (
-        self.advance()  # consume second (
-        # Find matching )) by tracking paren depth
-        content_start = self.pos
+        content_start = self.pos + 3
+        spans = self._arith_spans
+        if start in spans.ends and spans.ends[start] < self.length:
+            # Found by the scan of an enclosing expansion
+            close = spans.ends[start]
+            content_end = spans.content_ends[start]
+        else:
+            close, content_end = self._scan_arith_expansion(start)
+            if close == -1:
+                raise MatchedPairError("unexpected EOF looking for `))'", start)
+        self.pos = close
+        self.advance()  # consume final )
+        text = _substring(self.source, start, self.pos)
+        # Parse the arithmetic expression
+        depth = self._nesting.depth
+        try:
+            expr = self._parse_arith_window(self.source, content_start, content_end, True)
+        except (ParseError, MatchedPairError) as e:
+            if self._nesting.exceeded:
+                raise e
+            self._nesting.depth = depth
+            self.pos = start
+            return None, ""
+        node = ArithmeticExpansion(expr)
+        self._span(node, start)
+        return node, text
+
+    def _scan_arith_expansion(self, start: int) -> tuple[int, int]:
+        """Find the final ) of the $(( at start and where its content ends.
+
+        Parens inside quotes don't count. Content ends before the ) closing the
+        second ( when only the final ) follows it. Returns (-1, -1) if unclosed.
+
+        Every $(( passed on the way is resolved by the same rules and recorded in
+        _arith_spans, so nested expansions parsed later don't scan their text
+        again; so is the ) paired with each $(, which _arith_parse_cmdsub checks.
+        """
+        spans = self._arith_spans
+        # Open $(( and $( by paren depth before them: start and pending content end
+        frame_start: list[int] = [start, -1, -1]
+        frame_first: list[int] = [-1, -1, -1]
         depth = 2
-        first_close_pos: int = -1  # -1 = not set
-        while not self.at_end() and depth > 0:
-            c = self.peek()
-            # Skip single-quoted strings (parens inside don't count)
+        pos = start + 3
+        while pos < self.length:
+            c = self.source[pos]
             if c == "'":
-                self.advance()
-                while not self.at_end() and self.peek() != "'":
-                    self.advance()
-                if not self.at_end():
-                    self.advance()
-            # Skip double-quoted strings (parens inside don't count)
+                # Skip single-quoted strings (parens inside don't count)
+                pos += 1
+                while pos < self.length and self.source[pos] != "'":
+                    pos += 1
+                if pos < self.length:
+                    pos += 1
             elif c == '"':
-                self.advance()
-                while not self.at_end():
-                    if self.peek() == "\\" and self.pos + 1 < self.length:
-                        self.advance()
-                        self.advance()
-                    elif self.peek() == '"':
-                        self.advance()
+                # Skip double-quoted strings (parens inside don't count)
+                pos += 1
+                while pos < self.length:
+                    if self.source[pos] == "\\" and pos + 1 < self.length:
+                        pos += 2
+                    elif self.source[pos] == '"':
+                        pos += 1
                         break
                     else:
-                        self.advance()
-            # Handle backslash escapes outside quotes
-            elif c == "\\" and self.pos + 1 < self.length:
-                self.advance()
-                self.advance()
+                        pos += 1
+            elif c == "\\" and pos + 1 < self.length:
+                pos += 2
             elif c == "(":
                 depth += 1
-                self.advance()
+                while len(frame_start) <= depth + 2:
+                    frame_start.append(-1)
+                    frame_first.append(-1)
+                pos += 1
             elif c == ")":
-                if depth == 2:
-                    first_close_pos = self.pos
+                if depth >= 2 and frame_start[depth - 2] != -1:
+                    frame_first[depth - 2] = pos
                 depth -= 1
-                if depth == 0:
-                    break
-                self.advance()
+                if depth >= 0 and frame_start[depth] != -1:
+                    content_end = frame_first[depth] if frame_first[depth] != -1 else pos
+                    if depth == 0:
+                        return pos, content_end
+                    opened = frame_start[depth]
+                    if self.source[opened + 2] == "(":
+                        spans.ends[opened] = pos
+                        spans.content_ends[opened] = content_end
+                    else:
+                        spans.paren_ends[opened] = pos
+                    frame_start[depth] = -1
+                pos += 1
             else:
-                if depth == 1:
-                    first_close_pos = -1
-                self.advance()
-        if depth != 0:
-            if self.at_end():
-                raise MatchedPairError("unexpected EOF looking for `))'", start)
-            self.pos = start
-            return None, ""
-        # Content ends at first_close_pos if set, else at final )
-        if first_close_pos != -1:
-            content = _substring(self.source, content_start, first_close_pos)
-        else:
-            content = _substring(self.source, content_start, self.pos)
-        self.advance()  # consume final )
-        text = _substring(self.source, start, self.pos)
-        # Parse the arithmetic expression
-        try:
-            expr = self._parse_arith_expr(content)
-        except (ParseError, MatchedPairError):
-            self.pos = start
-            return None, ""
-        return ArithmeticExpansion(expr), text
+                if frame_start[depth - 1] != -1:
+                    frame_first[depth - 1] = -1
+                if c == "$" and pos + 1 < self.length and self.source[pos + 1] == "(":
+                    frame_start[depth] = pos
+                    frame_first[depth] = -1
+                pos += 1
+        return -1, -1
 
     # ========== Arithmetic expression parser ==========
     # Operator precedence (lowest to highest):
@@ -7934,16 +8742,26 @@ class Parser:
 
     def _parse_arith_expr(self, content: str) -> Node | None:
         """Parse an arithmetic expression string into AST nodes."""
+        return self._parse_arith_window(content, 0, len(content), False)
+
+    def _parse_arith_window(self, src: str, start: int, end: int, in_source: bool) -> Node | None:
+        """Parse the arithmetic expression in src[start:end] without copying it.
+
+        in_source says src is this parser's source, so positions (and node spans)
+        in it are shared.
+        """
         # Save any existing arith context (for nested parsing)
         saved_arith_src = self._arith_src
         saved_arith_pos = self._arith_pos
         saved_arith_len = self._arith_len
+        saved_arith_in_source = self._arith_in_source
         saved_parser_state = self._parser_state
 
         self._set_state(ParserStateFlags.PST_ARITH)
-        self._arith_src: str = content
-        self._arith_pos: int = 0
-        self._arith_len: int = len(content)
+        self._arith_src: str = src
+        self._arith_pos: int = start
+        self._arith_len: int = end
+        self._arith_in_source = in_source
         self._arith_skip_ws()
         if self._arith_at_end():
             result = None
@@ -7956,9 +8774,28 @@ class Parser:
             self._arith_src = saved_arith_src
             self._arith_pos = saved_arith_pos
             self._arith_len = saved_arith_len
+            self._arith_in_source = saved_arith_in_source
 
         return result
 
+    def _arith_offset(self) -> int:
+        """Offset of _arith_src[0] in the input, -1 when it is a copy."""
+        return self._offset if self._arith_in_source else -1
+
+    def _arith_span(self, node: Node, start: int) -> Node:
+        """Record node as covering _arith_src[start:_arith_pos], in input offsets."""
+        offset = self._arith_offset()
+        if offset >= 0:
+            node.start = start + offset
+            node.end = self._arith_pos + offset
+        return node
+
+    def _arith_binary(self, op: str, left: Node, right: Node) -> Node:
+        """A binary operation node spanning its operands."""
+        node = ArithBinaryOp(op, left, right)
+        self._span_nodes(node, left, right)
+        return node
+
     def _arith_at_end(self) -> bool:
         return self._arith_pos >= self._arith_len
 
@@ -7992,7 +8829,9 @@ class Parser:
 
     def _arith_match(self, s: str) -> bool:
         """Check if the next characters match s (without consuming)."""
-        return _starts_with_at(self._arith_src, self._arith_pos, s)
+        return self._arith_pos + len(s) <= self._arith_len and _starts_with_at(
+            self._arith_src, self._arith_pos, s
+        )
 
     def _arith_consume(self, s: str) -> bool:
         """If next chars match s, consume them and return True."""
@@ -8003,15 +8842,20 @@ class Parser:
 
     def _arith_parse_comma(self) -> Node:
         """Parse comma expressions (lowest precedence)."""
+        # Parenthesized groups, subscripts and nested $((...)) start over here
+        depth = self._enter_nesting()
         left = self._arith_parse_assign()
         while True:
             self._arith_skip_ws()
             if self._arith_consume(","):
                 self._arith_skip_ws()
                 right = self._arith_parse_assign()
-                left = ArithComma(left, right)
+                comma = ArithComma(left, right)
+                self._span_nodes(comma, left, right)
+                left = comma
             else:
                 break
+        self._nesting.depth = depth
         return left
 
     def _arith_parse_assign(self) -> Node:
@@ -8027,8 +8871,12 @@ class Parser:
                     break
                 self._arith_consume(op)
                 self._arith_skip_ws()
+                depth = self._enter_nesting()
                 right = self._arith_parse_assign()  # right associative
-                return ArithAssign(op, left, right)
+                self._nesting.depth = depth
+                assign = ArithAssign(op, left, right)
+                self._span_nodes(assign, left, right)
+                return assign
         return left
 
     def _arith_parse_ternary(self) -> Node:
@@ -8036,24 +8884,39 @@ class Parser:
         cond = self._arith_parse_logical_or()
         self._arith_skip_ws()
         if self._arith_consume("?"):
+            # The expression ends with its last branch, or the ? or : if it's empty
+            last: Node | None = None
+            end = self._arith_pos
+            depth = self._enter_nesting()
             self._arith_skip_ws()
             # True branch can be empty (e.g., 4 ? : $A - invalid at runtime, valid syntax)
             if self._arith_match(":"):
                 if_true = None
             else:
                 if_true = self._arith_parse_assign()
+                last = if_true
             self._arith_skip_ws()
             # Check for : (may be missing in malformed expressions like 1 ? 20)
             if self._arith_consume(":"):
+                last = None
+                end = self._arith_pos
                 self._arith_skip_ws()
                 # False branch can be empty (e.g., 4 ? 20 : - invalid at runtime)
                 if self._arith_at_end() or self._arith_peek() == ")":
                     if_false = None
                 else:
                     if_false = self._arith_parse_ternary()
+                    last = if_false
             else:
                 if_false = None
-            return ArithTernary(cond, if_true, if_false)
+            self._nesting.depth = depth
+            ternary = ArithTernary(cond, if_true, if_false)
+            if last is not None:
+                self._span_nodes(ternary, cond, last)
+            elif self._arith_offset() >= 0:
+                ternary.start = cond.start
+                ternary.end = end + self._arith_offset()
+            return ternary
         return cond
 
     def _arith_parse_logical_or(self) -> Node:
@@ -8064,7 +8927,7 @@ class Parser:
             if self._arith_match("||"):
                 self._arith_consume("||")
                 self._arith_skip_ws()
-                left = ArithBinaryOp("||", left, self._arith_parse_logical_and())
+                left = self._arith_binary("||", left, self._arith_parse_logical_and())
             else:
                 break
         return left
@@ -8077,7 +8940,7 @@ class Parser:
             if self._arith_match("&&"):
                 self._arith_consume("&&")
                 self._arith_skip_ws()
-                left = ArithBinaryOp("&&", left, self._arith_parse_bitwise_or())
+                left = self._arith_binary("&&", left, self._arith_parse_bitwise_or())
             else:
                 break
         return left
@@ -8094,7 +8957,7 @@ class Parser:
                 self._arith_advance()
                 self._arith_skip_ws()
                 right = self._arith_parse_bitwise_xor()
-                left = ArithBinaryOp("|", left, right)
+                left = self._arith_binary("|", left, right)
             else:
                 break
         return left
@@ -8109,7 +8972,7 @@ class Parser:
                 self._arith_advance()
                 self._arith_skip_ws()
                 right = self._arith_parse_bitwise_and()
-                left = ArithBinaryOp("^", left, right)
+                left = self._arith_binary("^", left, right)
             else:
                 break
         return left
@@ -8126,7 +8989,7 @@ class Parser:
                 self._arith_advance()
                 self._arith_skip_ws()
                 right = self._arith_parse_equality()
-                left = ArithBinaryOp("&", left, right)
+                left = self._arith_binary("&", left, right)
             else:
                 break
         return left
@@ -8141,7 +9004,7 @@ class Parser:
                 if self._arith_match(op):
                     self._arith_consume(op)
                     self._arith_skip_ws()
-                    left = ArithBinaryOp(op, left, self._arith_parse_comparison())
+                    left = self._arith_binary(op, left, self._arith_parse_comparison())
                     matched = True
                     break
             if not matched:
@@ -8157,26 +9020,26 @@ class Parser:
                 self._arith_consume("<=")
                 self._arith_skip_ws()
                 right = self._arith_parse_shift()
-                left = ArithBinaryOp("<=", left, right)
+                left = self._arith_binary("<=", left, right)
             elif self._arith_match(">="):
                 self._arith_consume(">=")
                 self._arith_skip_ws()
                 right = self._arith_parse_shift()
-                left = ArithBinaryOp(">=", left, right)
+                left = self._arith_binary(">=", left, right)
             elif self._arith_peek() == "<" and (
                 self._arith_peek(1) != "<" and self._arith_peek(1) != "="
             ):
                 self._arith_advance()
                 self._arith_skip_ws()
                 right = self._arith_parse_shift()
-                left = ArithBinaryOp("<", left, right)
+                left = self._arith_binary("<", left, right)
             elif self._arith_peek() == ">" and (
                 self._arith_peek(1) != ">" and self._arith_peek(1) != "="
             ):
                 self._arith_advance()
                 self._arith_skip_ws()
                 right = self._arith_parse_shift()
-                left = ArithBinaryOp(">", left, right)
+                left = self._arith_binary(">", left, right)
             else:
                 break
         return left
@@ -8194,12 +9057,12 @@ class Parser:
                 self._arith_consume("<<")
                 self._arith_skip_ws()
                 right = self._arith_parse_additive()
-                left = ArithBinaryOp("<<", left, right)
+                left = self._arith_binary("<<", left, right)
             elif self._arith_match(">>"):
                 self._arith_consume(">>")
                 self._arith_skip_ws()
                 right = self._arith_parse_additive()
-                left = ArithBinaryOp(">>", left, right)
+                left = self._arith_binary(">>", left, right)
             else:
                 break
         return left
@@ -8215,12 +9078,12 @@ class Parser:
                 self._arith_advance()
                 self._arith_skip_ws()
                 right = self._arith_parse_multiplicative()
-                left = ArithBinaryOp("+", left, right)
+                left = self._arith_binary("+", left, right)
             elif c == "-" and (c2 != "-" and c2 != "="):
                 self._arith_advance()
                 self._arith_skip_ws()
                 right = self._arith_parse_multiplicative()
-                left = ArithBinaryOp("-", left, right)
+                left = self._arith_binary("-", left, right)
             else:
                 break
         return left
@@ -8236,17 +9099,17 @@ class Parser:
                 self._arith_advance()
                 self._arith_skip_ws()
                 right = self._arith_parse_exponentiation()
-                left = ArithBinaryOp("*", left, right)
+                left = self._arith_binary("*", left, right)
             elif c == "/" and c2 != "=":
                 self._arith_advance()
                 self._arith_skip_ws()
                 right = self._arith_parse_exponentiation()
-                left = ArithBinaryOp("/", left, right)
+                left = self._arith_binary("/", left, right)
             elif c == "%" and c2 != "=":
                 self._arith_advance()
                 self._arith_skip_ws()
                 right = self._arith_parse_exponentiation()
-                left = ArithBinaryOp("%", left, right)
+                left = self._arith_binary("%", left, right)
             else:
                 break
         return left
@@ -8258,59 +9121,69 @@ class Parser:
         if self._arith_match("**"):
             self._arith_consume("**")
             self._arith_skip_ws()
+            depth = self._enter_nesting()
             right = self._arith_parse_exponentiation()  # right associative
-            return ArithBinaryOp("**", left, right)
+            self._nesting.depth = depth
+            return self._arith_binary("**", left, right)
         return left
 
     def _arith_parse_unary(self) -> Node:
         """Parse unary operators (! ~ + - ++ --)."""
-        self._arith_skip_ws()
-        # Pre-increment/decrement
-        if self._arith_match("++"):
-            self._arith_consume("++")
-            self._arith_skip_ws()
-            operand = self._arith_parse_unary()
-            return ArithPreIncr(operand)
-        if self._arith_match("--"):
-            self._arith_consume("--")
-            self._arith_skip_ws()
-            operand = self._arith_parse_unary()
-            return ArithPreDecr(operand)
-        # Unary operators
-        c = self._arith_peek()
-        if c == "!":
-            self._arith_advance()
-            self._arith_skip_ws()
-            operand = self._arith_parse_unary()
-            return ArithUnaryOp("!", operand)
-        if c == "~":
-            self._arith_advance()
-            self._arith_skip_ws()
-            operand = self._arith_parse_unary()
-            return ArithUnaryOp("~", operand)
-        if c == "+" and self._arith_peek(1) != "+":
-            self._arith_advance()
-            self._arith_skip_ws()
-            operand = self._arith_parse_unary()
-            return ArithUnaryOp("+", operand)
-        if c == "-" and self._arith_peek(1) != "-":
-            self._arith_advance()
+        # Prefixes are collected in a loop rather than by recursion, so a long
+        # run of them doesn't use up the stack
+        ops: list[str] = []
+        op_starts: list[int] = []
+        while True:
             self._arith_skip_ws()
-            operand = self._arith_parse_unary()
-            return ArithUnaryOp("-", operand)
-        return self._arith_parse_postfix()
+            op_starts.append(self._arith_pos)
+            # Pre-increment/decrement
+            if self._arith_match("++"):
+                self._arith_consume("++")
+                ops.append("++")
+                continue
+            if self._arith_match("--"):
+                self._arith_consume("--")
+                ops.append("--")
+                continue
+            # Unary operators
+            c = self._arith_peek()
+            if c == "!" or c == "~":
+                ops.append(self._arith_advance())
+                continue
+            if (c == "+" or c == "-") and self._arith_peek(1) != c:
+                ops.append(self._arith_advance())
+                continue
+            break
+        operand = self._arith_parse_postfix()
+        offset = self._arith_offset()
+        i = len(ops) - 1
+        while i >= 0:
+            inner = operand
+            if ops[i] == "++":
+                operand = ArithPreIncr(inner)
+            elif ops[i] == "--":
+                operand = ArithPreDecr(inner)
+            else:
+                operand = ArithUnaryOp(ops[i], inner)
+            if offset >= 0:
+                operand.start = op_starts[i] + offset
+                operand.end = inner.end
+            i -= 1
+        return operand
 
     def _arith_parse_postfix(self) -> Node:
         """Parse postfix operators (++ -- [])."""
+        self._arith_skip_ws()
+        start = self._arith_pos
         left = self._arith_parse_primary()
         while True:
             self._arith_skip_ws()
             if self._arith_match("++"):
                 self._arith_consume("++")
-                left = ArithPostIncr(left)
+                left = self._arith_span(ArithPostIncr(left), start)
             elif self._arith_match("--"):
                 self._arith_consume("--")
-                left = ArithPostDecr(left)
+                left = self._arith_span(ArithPostDecr(left), start)
             elif self._arith_peek() == "[":
                 # Array subscript - but only for variables
                 if isinstance(left, ArithVar):
@@ -8320,7 +9193,7 @@ class Parser:
                     self._arith_skip_ws()
                     if not self._arith_consume("]"):
                         raise ParseError("Expected ']' in array subscript", self._arith_pos)
-                    left = ArithSubscript(left.name, index)
+                    left = self._arith_span(ArithSubscript(left.name, index), start)
                 else:
                     break
             else:
@@ -8330,6 +9203,7 @@ class Parser:
     def _arith_parse_primary(self) -> Node:
         """Parse primary expressions (numbers, variables, parens, expansions)."""
         self._arith_skip_ws()
+        start = self._arith_pos
         c = self._arith_peek()
 
         # Parenthesized expression
@@ -8345,23 +9219,23 @@ class Parser:
         # Parameter length #$var or #${...}
         if c == "#" and self._arith_peek(1) == "$":
             self._arith_advance()  # consume #
-            return self._arith_parse_expansion()
+            return self._arith_span(self._arith_parse_expansion(), start)
 
         # Parameter expansion ${...} or $var or $(...)
         if c == "$":
-            return self._arith_parse_expansion()
+            return self._arith_span(self._arith_parse_expansion(), start)
 
         # Single-quoted string - content becomes the number
         if c == "'":
-            return self._arith_parse_single_quote()
+            return self._arith_span(self._arith_parse_single_quote(), start)
 
         # Double-quoted string - may contain expansions
         if c == '"':
-            return self._arith_parse_double_quote()
+            return self._arith_span(self._arith_parse_double_quote(), start)
 
         # Backtick command substitution
         if c == "`":
-            return self._arith_parse_backtick()
+            return self._arith_span(self._arith_parse_backtick(), start)
 
         # Escape sequence \X (not line continuation, which is handled in _arith_skip_ws)
         # Escape covers only the single character after backslash
@@ -8370,13 +9244,13 @@ class Parser:
             if self._arith_at_end():
                 raise ParseError("Unexpected end after backslash in arithmetic", self._arith_pos)
             escaped_char = self._arith_advance()  # consume escaped character
-            return ArithEscape(escaped_char)
+            return self._arith_span(ArithEscape(escaped_char), start)
 
         # Check for end of expression or operators - bash allows missing operands
         # (defers validation to runtime), so we return an empty node
         # Include #{} and ; which bash accepts syntactically but fails at runtime
         if self._arith_at_end() or c in ")]:,;?|&<>=!+-*/%^~#{}":
-            return ArithEmpty()
+            return self._arith_span(ArithEmpty(), start)
 
         # Number or variable
         return self._arith_parse_number_or_var()
@@ -8434,35 +9308,43 @@ class Parser:
                     self._arith_advance()
                 else:
                     self._arith_advance()
-            content = _substring(self._arith_src, content_start, self._arith_pos)
+            content_end = self._arith_pos
             self._arith_advance()  # consume first )
             self._arith_advance()  # consume second )
-            inner_expr = self._parse_arith_expr(content)
+            inner_expr = self._parse_arith_window(
+                self._arith_src, content_start, content_end, self._arith_in_source
+            )
             return ArithmeticExpansion(inner_expr)
 
-        # Regular command substitution
-        depth = 1
+        # Regular command substitution: parse it in place, the grammar stops at
+        # the matching ) (like _parse_command_substitution)
         content_start = self._arith_pos
-        while not self._arith_at_end() and depth > 0:
-            ch = self._arith_peek()
-            if ch == "(":
-                depth += 1
-                self._arith_advance()
-            elif ch == ")":
-                depth -= 1
-                if depth == 0:
-                    break
-                self._arith_advance()
-            else:
-                self._arith_advance()
-        content = _substring(self._arith_src, content_start, self._arith_pos)
-        self._arith_advance()  # consume )
-
-        # Parse the command inside
-        sub_parser = Parser(content, False, self._extglob)
+        sub_parser = self._new_sub_parser(
+            self._arith_src, False, content_start, self._arith_len, self._arith_offset()
+        )
+        if self._arith_in_source:
+            # Same buffer and positions: $(( found by our scans needn't be rescanned
+            sub_parser._arith_spans = self._arith_spans
+        sub_parser._set_state(ParserStateFlags.PST_CMDSUBST | ParserStateFlags.PST_EOFTOKEN)
+        sub_parser._eof_token = ")"
         cmd = sub_parser.parse_list(True)
         if cmd is None:
             cmd = Empty()
+        sub_parser.skip_whitespace_and_newlines()
+        if sub_parser.at_end() or sub_parser.peek() != ")":
+            raise ParseError("Unterminated command substitution in arithmetic", sub_parser.pos)
+        spans = self._arith_spans
+        dollar = content_start - 2
+        if (
+            self._arith_in_source
+            and dollar in spans.paren_ends
+            and spans.paren_ends[dollar] != sub_parser.pos
+        ):
+            # The enclosing $((...)) was delimited by counting parens that the
+            # command uses differently (case patterns): it isn't arithmetic
+            raise ParseError("Command substitution in arithmetic ends past its parens", dollar)
+        self._arith_pos = sub_parser.pos + 1  # past )
+        self.subs.add(_substring(self._arith_src, content_start, sub_parser.pos), cmd)
         return CommandSubstitution(cmd)
 
     def _arith_parse_braced_param(self) -> Node:
@@ -8582,11 +9464,15 @@ class Parser:
                 self._arith_advance()  # skip escaped char
             else:
                 self._arith_advance()
-        content = _substring(self._arith_src, content_start, self._arith_pos)
+        content_end = self._arith_pos
         if not self._arith_consume("`"):
             raise ParseError("Unterminated backtick in arithmetic", self._arith_pos)
         # Parse the command inside
-        sub_parser = Parser(content, False, self._extglob)
+        sub_parser = self._new_sub_parser(
+            self._arith_src, False, content_start, content_end, self._arith_offset()
+        )
+        if self._arith_in_source:
+            sub_parser._arith_spans = self._arith_spans
         cmd = sub_parser.parse_list(True)
         if cmd is None:
             cmd = Empty()
@@ -8595,6 +9481,7 @@ class Parser:
     def _arith_parse_number_or_var(self) -> Node:
         """Parse a number or variable name."""
         self._arith_skip_ws()
+        start = self._arith_pos
         chars: list[str] = []
         c = self._arith_peek()
 
@@ -8609,10 +9496,12 @@ class Parser:
                     break
             prefix = "".join(chars)
             # Check if followed by $ expansion (e.g., 0x$var)
+            number = self._arith_span(ArithNumber(prefix), start)
             if not self._arith_at_end() and self._arith_peek() == "$":
-                expansion = self._arith_parse_expansion()
-                return ArithConcat([ArithNumber(prefix), expansion])
-            return ArithNumber(prefix)
+                expansion_start = self._arith_pos
+                expansion = self._arith_span(self._arith_parse_expansion(), expansion_start)
+                return self._arith_span(ArithConcat([number, expansion]), start)
+            return number
 
         # Variable name (starts with letter or _)
         if c.isalpha() or c == "_":
@@ -8622,7 +9511,7 @@ class Parser:
                     chars.append(self._arith_advance())
                 else:
                     break
-            return ArithVar("".join(chars))
+            return self._arith_span(ArithVar("".join(chars)), start)
 
         raise ParseError(
             "Unexpected character '" + c + "' in arithmetic expression", self._arith_pos
@@ -8646,18 +9535,27 @@ class Parser:
         self.advance()  # consume [
 
         # Find matching ] using unified matched pair parsing
+        depth = self._enter_nesting()
         self._lexer.pos = self.pos  # sync lexer to parser
         content = self._lexer._parse_matched_pair("[", "]", MatchedPairFlags.ARITH)
         self.pos = self._lexer.pos  # sync parser from lexer
+        self._nesting.depth = depth
 
         text = _substring(self.source, start, self.pos)
-        return ArithDeprecated(content), text
+        node = ArithDeprecated(content)
+        self._span(node, start)
+        return node, text
 
     def _parse_param_expansion(self, in_dquote: bool = False) -> tuple[Node | None, str]:
         """Parse a parameter expansion starting at $. Delegates to Lexer."""
+        depth = self._enter_nesting()
+        start = self.pos
         self._sync_lexer()
         result = self._lexer._read_param_expansion(in_dquote)
         self._sync_parser()
+        self._nesting.depth = depth
+        if result[0] is not None:
+            self._span(result[0], start)
         return result
 
     def parse_redirect(self) -> Redirect | HereDoc | None:
@@ -8750,7 +9648,9 @@ class Parser:
             target = self.parse_word()
             if target is None:
                 raise ParseError("Expected target for redirect " + op, self.pos)
-            return Redirect(op, target)
+            redirect = Redirect(op, target)
+            self._span(redirect, start)
+            return redirect
 
         if ch is None or not _is_redirect_char(ch):
             # Not a redirect, restore position
@@ -8808,7 +9708,9 @@ class Parser:
 
         # Handle here document
         if op == "<<":
-            return self._parse_heredoc(fd, strip_tabs)
+            heredoc = self._parse_heredoc(fd, strip_tabs)
+            self._span(heredoc, start)
+            return heredoc
 
         # Combine fd or varfd with operator if present
         if varfd != "":
@@ -8819,6 +9721,7 @@ class Parser:
         # Handle fd duplication targets like &1, &2, &-, &10-, &$var
         # NOTE: No whitespace allowed between operator and & (e.g., <&- is valid, < &- is not)
         if not self.at_end() and self.peek() == "&":
+            amp_start = self.pos
             self.advance()  # consume &
             # Skip whitespace after & to check what follows
             self.skip_whitespace()
@@ -8827,7 +9730,7 @@ class Parser:
                 if self.pos + 1 < self.length and not _is_metachar(self.source[self.pos + 1]):
                     # Consume just the - as close target, leave rest for next word
                     self.advance()
-                    target = Word("&-")
+                    target = Word("&-", None, self.subs)
                 else:
                     # Set target to None to fall through to normal parsing
                     target = None
@@ -8853,20 +9756,22 @@ class Parser:
                         self.pos = word_start
                         inner_word = self.parse_word()
                         if inner_word is not None:
-                            target = Word("&" + inner_word.value)
+                            target = Word("&" + inner_word.value, None, self.subs)
                             target.parts = inner_word.parts
                         else:
                             raise ParseError("Expected target for redirect " + op, self.pos)
                     else:
-                        target = Word("&" + fd_target)
+                        target = Word("&" + fd_target, None, self.subs)
                 else:
                     # Could be &$var or &word - parse word and prepend &
                     inner_word = self.parse_word()
                     if inner_word is not None:
-                        target = Word("&" + inner_word.value)
+                        target = Word("&" + inner_word.value, None, self.subs)
                         target.parts = inner_word.parts
                     else:
                         raise ParseError("Expected target for redirect " + op, self.pos)
+            # The target is built from the & and what follows it
+            self._span(target, amp_start)
         else:
             self.skip_whitespace()
             # Handle >& - or <& - where space precedes the close syntax
@@ -8875,8 +9780,10 @@ class Parser:
             if op in (">&", "<&") and not self.at_end() and self.peek() == "-":
                 if self.pos + 1 < self.length and not _is_metachar(self.source[self.pos + 1]):
                     # Consume just the - as close target, leave rest for next word
+                    dash_start = self.pos
                     self.advance()
-                    target = Word("&-")
+                    target = Word("&-", None, self.subs)
+                    self._span(target, dash_start)
                 else:
                     target = self.parse_word()
             else:
@@ -8885,7 +9792,9 @@ class Parser:
         if target is None:
             raise ParseError("Expected target for redirect " + op, self.pos)
 
-        return Redirect(op, target)
+        redirect = Redirect(op, target)
+        self._span(redirect, start)
+        return redirect
 
     def _parse_heredoc_delimiter(self) -> tuple[str, bool]:
         """Parse heredoc delimiter, handling quoting (can be mixed like 'EOF'"2").
@@ -9123,6 +10032,8 @@ class Parser:
         Called after a newline is consumed. Reads content for each pending heredoc
         in order, advancing self.pos past all heredoc content.
         """
+        if self.stats is not None:
+            self.stats.heredocs_gathered += len(self._pending_heredocs)
         for heredoc in self._pending_heredocs:
             content_lines: list[str] = []
             line_start = self.pos
@@ -9241,11 +10152,21 @@ class Parser:
         if not words and not redirects:
             return None
 
-        return Command(words, redirects)
+        command = Command(words, redirects)
+        # Words and redirects can interleave, so take the outermost of each kind
+        if not words:
+            self._span_nodes(command, redirects[0], redirects[len(redirects) - 1])
+        elif not redirects:
+            self._span_nodes(command, words[0], words[len(words) - 1])
+        else:
+            command.start = min(words[0].start, redirects[0].start)
+            command.end = max(words[len(words) - 1].end, redirects[len(redirects) - 1].end)
+        return command
 
     def parse_subshell(self) -> Node | None:
         """Parse a subshell ( list )."""
         self.skip_whitespace()
+        start = self.pos
         if self.at_end() or self.peek() != "(":
             return None
 
@@ -9263,7 +10184,11 @@ class Parser:
             raise ParseError("Expected ) to close subshell", self.pos)
         self.advance()  # consume )
         self._clear_state(ParserStateFlags.PST_SUBSHELL)
-        return Subshell(body, self._collect_redirects())
+        end = self.pos
+        redirects = self._collect_redirects()
+        node = Subshell(body, redirects)
+        self._span_compound(node, start, end, redirects)
+        return node
 
     def parse_arithmetic_command(self) -> ArithmeticCommand | None:
         """Parse an arithmetic command (( expression )) with parsed internals.
@@ -9272,6 +10197,7 @@ class Parser:
         like '( ( x ) )' that close with ') )' instead of '))').
         """
         self.skip_whitespace()
+        start = self.pos
 
         # Check for ((
         if (
@@ -9341,15 +10267,23 @@ class Parser:
             self.pos = saved_pos
             return None
 
-        content = _substring(self.source, content_start, self.pos)
-        # Strip backslash-newline line continuations
-        content = content.replace("\\\n", "")
+        content_end = self.pos
+        content = _substring(self.source, content_start, content_end)
         self.advance()  # consume first )
         self.advance()  # consume second )
 
-        # Parse the arithmetic expression
-        expr = self._parse_arith_expr(content)
-        return ArithmeticCommand(expr, self._collect_redirects(), raw_content=content)
+        # Parse the arithmetic expression, in place unless line continuations
+        # (backslash-newline) have to be stripped from it first
+        if "\\\n" in content:
+            content = content.replace("\\\n", "")
+            expr = self._parse_arith_expr(content)
+        else:
+            expr = self._parse_arith_window(self.source, content_start, content_end, True)
+        end = self.pos
+        redirects = self._collect_redirects()
+        node = ArithmeticCommand(expr, redirects, content, self.subs)
+        self._span_compound(node, start, end, redirects)
+        return node
 
     # Unary operators for [[ ]] conditionals
     COND_UNARY_OPS = {
@@ -9402,6 +10336,7 @@ class Parser:
     def parse_conditional_expr(self) -> Node | None:
         """Parse a conditional expression [[ expression ]]."""
         self.skip_whitespace()
+        start = self.pos
 
         # Check for [[
         if (
@@ -9449,7 +10384,11 @@ class Parser:
         self.advance()  # consume second ]
         self._clear_state(ParserStateFlags.PST_CONDEXPR)
         self._word_context = WORD_CTX_NORMAL
-        return ConditionalExpr(body, self._collect_redirects())
+        end = self.pos
+        redirects = self._collect_redirects()
+        node = ConditionalExpr(body, redirects)
+        self._span_compound(node, start, end, redirects)
+        return node
 
     def _cond_skip_whitespace(self) -> None:
         """Skip whitespace inside [[ ]], including backslash-newline continuation."""
@@ -9489,7 +10428,9 @@ class Parser:
             self.advance()  # consume first |
             self.advance()  # consume second |
             right = self._parse_cond_or()  # recursive for right-associativity
-            return CondOr(left, right)
+            cond_or = CondOr(left, right)
+            self._span_nodes(cond_or, left, right)
+            return cond_or
         return left
 
     def _parse_cond_and(self) -> CondNode:
@@ -9506,7 +10447,9 @@ class Parser:
             self.advance()  # consume first &
             self.advance()  # consume second &
             right = self._parse_cond_and()  # recursive for right-associativity
-            return CondAnd(left, right)
+            cond_and = CondAnd(left, right)
+            self._span_nodes(cond_and, left, right)
+            return cond_and
         return left
 
     def _parse_cond_term(self) -> CondNode:
@@ -9515,6 +10458,7 @@ class Parser:
 
         if self._cond_at_end():
             raise ParseError("Unexpected end of conditional expression", self.pos)
+        start = self.pos
 
         # Negation: ! term
         if self.peek() == "!":
@@ -9525,18 +10469,26 @@ class Parser:
                 pass  # not negation, fall through to word parsing
             else:
                 self.advance()  # consume !
+                depth = self._enter_nesting()
                 operand = self._parse_cond_term()
-                return CondNot(operand)
+                self._nesting.depth = depth
+                cond_not = CondNot(operand)
+                self._span_from(cond_not, start, operand)
+                return cond_not
 
         # Parenthesized group: ( or_expr )
         if self.peek() == "(":
             self.advance()  # consume (
+            depth = self._enter_nesting()
             inner = self._parse_cond_or()
+            self._nesting.depth = depth
             self._cond_skip_whitespace()
             if self.at_end() or self.peek() != ")":
                 raise ParseError("Expected ) in conditional expression", self.pos)
             self.advance()  # consume )
-            return CondParen(inner)
+            cond_paren = CondParen(inner)
+            self._span(cond_paren, start)
+            return cond_paren
 
         # Parse first word
         word1 = self._parse_cond_word()
@@ -9551,7 +10503,9 @@ class Parser:
             unary_operand = self._parse_cond_word()
             if unary_operand is None:
                 raise ParseError("Expected operand after " + word1.value, self.pos)
-            return UnaryTest(word1.value, unary_operand)
+            unary = UnaryTest(word1.value, unary_operand)
+            self._span_nodes(unary, word1, unary_operand)
+            return unary
 
         # Check if next token is a binary operator
         if not self._cond_at_end() and (
@@ -9567,7 +10521,9 @@ class Parser:
                 word2 = self._parse_cond_word()
                 if word2 is None:
                     raise ParseError("Expected operand after " + op, self.pos)
-                return BinaryTest(op, word1, word2)
+                binary = BinaryTest(op, word1, word2)
+                self._span_nodes(binary, word1, word2)
+                return binary
             # Peek at next word to see if it's a binary operator
             saved_pos = self.pos
             op_word = self._parse_cond_word()
@@ -9581,13 +10537,17 @@ class Parser:
                     word2 = self._parse_cond_word()
                 if word2 is None:
                     raise ParseError("Expected operand after " + op_word.value, self.pos)
-                return BinaryTest(op_word.value, word1, word2)
+                binary = BinaryTest(op_word.value, word1, word2)
+                self._span_nodes(binary, word1, word2)
+                return binary
             else:
                 # Not a binary op, restore position
                 self.pos = saved_pos
 
         # Bare word: implicit -n test
-        return UnaryTest("-n", word1)
+        unary = UnaryTest("-n", word1)
+        self._span_nodes(unary, word1, word1)
+        return unary
 
     def _parse_cond_word(self) -> Word | None:
         """Parse a word inside [[ ]], handling expansions but stopping at conditional operators."""
@@ -9619,6 +10579,7 @@ class Parser:
     def parse_brace_group(self) -> BraceGroup | None:
         """Parse a brace group { list }."""
         self.skip_whitespace()
+        start = self.pos
         # Lexer handles { vs {abc distinction: only returns reserved word for standalone {
         if not self._lex_consume_word("{"):
             return None
@@ -9631,11 +10592,16 @@ class Parser:
         self.skip_whitespace()
         if not self._lex_consume_word("}"):
             raise ParseError("Expected } to close brace group", self._lex_peek_token().pos)
-        return BraceGroup(body, self._collect_redirects())
+        end = self.pos
+        redirects = self._collect_redirects()
+        node = BraceGroup(body, redirects)
+        self._span_compound(node, start, end, redirects)
+        return node
 
     def parse_if(self) -> Node | None:
         """Parse an if statement: if list; then list [elif list; then list]* [else list] fi."""
         self.skip_whitespace()
+        start = self.pos
         if not self._lex_consume_word("if"):
             return None
 
@@ -9660,37 +10626,7 @@ class Parser:
         else_body = None
         if self._lex_is_at_reserved_word("elif"):
             # elif is syntactic sugar for else if ... fi
-            self._lex_consume_word("elif")
-            # Parse the rest as a nested if (but we've already consumed 'elif')
-            # We need to parse: condition; then body [elif|else|fi]
-            elif_condition = self.parse_list_until({"then"})
-            if elif_condition is None:
-                raise ParseError("Expected condition after 'elif'", self._lex_peek_token().pos)
-
-            self.skip_whitespace_and_newlines()
-            if not self._lex_consume_word("then"):
-                raise ParseError("Expected 'then' after elif condition", self._lex_peek_token().pos)
-
-            elif_then_body = self.parse_list_until({"elif", "else", "fi"})
-            if elif_then_body is None:
-                raise ParseError("Expected commands after 'then'", self._lex_peek_token().pos)
-
-            # Recursively handle more elif/else/fi
-            self.skip_whitespace_and_newlines()
-
-            inner_else = None
-            if self._lex_is_at_reserved_word("elif"):
-                # More elif - recurse by creating a fake "if" and parsing
-                # Actually, let's just recursively call a helper
-                inner_else = self._parse_elif_chain()
-            elif self._lex_is_at_reserved_word("else"):
-                self._lex_consume_word("else")
-                inner_else = self.parse_list_until({"fi"})
-                if inner_else is None:
-                    raise ParseError("Expected commands after 'else'", self._lex_peek_token().pos)
-
-            else_body = If(elif_condition, elif_then_body, inner_else)
-
+            else_body = self._parse_elif_chain()
         elif self._lex_is_at_reserved_word("else"):
             self._lex_consume_word("else")
             else_body = self.parse_list_until({"fi"})
@@ -9701,40 +10637,60 @@ class Parser:
         self.skip_whitespace_and_newlines()
         if not self._lex_consume_word("fi"):
             raise ParseError("Expected 'fi' to close if statement", self._lex_peek_token().pos)
-        return If(condition, then_body, else_body, self._collect_redirects())
+        end = self.pos
+        redirects = self._collect_redirects()
+        node = If(condition, then_body, else_body, redirects)
+        self._span_compound(node, start, end, redirects)
+        return node
 
     def _parse_elif_chain(self) -> If:
-        """Parse elif chain (after seeing 'elif' keyword)."""
-        self._lex_consume_word("elif")
+        """Parse elif chain (after seeing 'elif' keyword).
 
-        condition = self.parse_list_until({"then"})
-        if condition is None:
-            raise ParseError("Expected condition after 'elif'", self._lex_peek_token().pos)
+        Each elif nests an If in the else branch of the one before it. The chain
+        is built in a loop, with every elif counted as a level of nesting.
+        """
+        depth = self._nesting.depth
+        links: list[tuple[int, Node, Node]] = []
+        else_body = None
+        while True:
+            self._enter_nesting()
+            start = self.pos
+            self._lex_consume_word("elif")
 
-        self.skip_whitespace_and_newlines()
-        if not self._lex_consume_word("then"):
-            raise ParseError("Expected 'then' after elif condition", self._lex_peek_token().pos)
+            condition = self.parse_list_until({"then"})
+            if condition is None:
+                raise ParseError("Expected condition after 'elif'", self._lex_peek_token().pos)
 
-        then_body = self.parse_list_until({"elif", "else", "fi"})
-        if then_body is None:
-            raise ParseError("Expected commands after 'then'", self._lex_peek_token().pos)
+            self.skip_whitespace_and_newlines()
+            if not self._lex_consume_word("then"):
+                raise ParseError("Expected 'then' after elif condition", self._lex_peek_token().pos)
 
-        self.skip_whitespace_and_newlines()
+            then_body = self.parse_list_until({"elif", "else", "fi"})
+            if then_body is None:
+                raise ParseError("Expected commands after 'then'", self._lex_peek_token().pos)
 
-        else_body = None
-        if self._lex_is_at_reserved_word("elif"):
-            else_body = self._parse_elif_chain()
-        elif self._lex_is_at_reserved_word("else"):
-            self._lex_consume_word("else")
-            else_body = self.parse_list_until({"fi"})
-            if else_body is None:
-                raise ParseError("Expected commands after 'else'", self._lex_peek_token().pos)
+            links.append((start, condition, then_body))
+            self.skip_whitespace_and_newlines()
+            if self._lex_is_at_reserved_word("elif"):
+                continue
+            if self._lex_is_at_reserved_word("else"):
+                self._lex_consume_word("else")
+                else_body = self.parse_list_until({"fi"})
+                if else_body is None:
+                    raise ParseError("Expected commands after 'else'", self._lex_peek_token().pos)
+            break
+        self._nesting.depth = depth
 
-        return If(condition, then_body, else_body)
+        for start, condition, then_body in reversed(links):
+            node = If(condition, then_body, else_body)
+            self._span_from(node, start, else_body if else_body is not None else then_body)
+            else_body = node
+        return node
 
     def parse_while(self) -> Node | None:
         """Parse a while loop: while list; do list; done."""
         self.skip_whitespace()
+        start = self.pos
         if not self._lex_consume_word("while"):
             return None
 
@@ -9757,11 +10713,16 @@ class Parser:
         self.skip_whitespace_and_newlines()
         if not self._lex_consume_word("done"):
             raise ParseError("Expected 'done' to close while loop", self._lex_peek_token().pos)
-        return While(condition, body, self._collect_redirects())
+        end = self.pos
+        redirects = self._collect_redirects()
+        node = While(condition, body, redirects)
+        self._span_compound(node, start, end, redirects)
+        return node
 
     def parse_until(self) -> Node | None:
         """Parse an until loop: until list; do list; done."""
         self.skip_whitespace()
+        start = self.pos
         if not self._lex_consume_word("until"):
             return None
 
@@ -9784,18 +10745,23 @@ class Parser:
         self.skip_whitespace_and_newlines()
         if not self._lex_consume_word("done"):
             raise ParseError("Expected 'done' to close until loop", self._lex_peek_token().pos)
-        return Until(condition, body, self._collect_redirects())
+        end = self.pos
+        redirects = self._collect_redirects()
+        node = Until(condition, body, redirects)
+        self._span_compound(node, start, end, redirects)
+        return node
 
     def parse_for(self) -> Node | None:
         """Parse a for loop: for name [in words]; do list; done or C-style for ((;;))."""
         self.skip_whitespace()
+        start = self.pos
         if not self._lex_consume_word("for"):
             return None
         self.skip_whitespace()
 
         # Check for C-style for loop: for ((init; cond; incr))
         if self.peek() == "(" and self.pos + 1 < self.length and self.source[self.pos + 1] == "(":
-            return self._parse_for_arith()
+            return self._parse_for_arith(start)
 
         # Parse variable name (bash allows reserved words and command substitutions as variable names)
         var_name: str = ""
@@ -9866,7 +10832,11 @@ class Parser:
             brace_group = self.parse_brace_group()
             if brace_group is None:
                 raise ParseError("Expected brace group in for loop", self._lex_peek_token().pos)
-            return For(var_name, words, brace_group.body, self._collect_redirects())
+            end = self.pos
+            redirects = self._collect_redirects()
+            node = For(var_name, words, brace_group.body, redirects, self.subs)
+            self._span_compound(node, start, end, redirects)
+            return node
 
         # Expect 'do'
         if not self._lex_consume_word("do"):
@@ -9881,10 +10851,17 @@ class Parser:
         self.skip_whitespace_and_newlines()
         if not self._lex_consume_word("done"):
             raise ParseError("Expected 'done' to close for loop", self._lex_peek_token().pos)
-        return For(var_name, words, body, self._collect_redirects())
+        end = self.pos
+        redirects = self._collect_redirects()
+        node = For(var_name, words, body, redirects, self.subs)
+        self._span_compound(node, start, end, redirects)
+        return node
+
+    def _parse_for_arith(self, start: int) -> ForArith:
+        """Parse C-style for loop: for ((init; cond; incr)); do list; done.
 
-    def _parse_for_arith(self) -> ForArith:
-        """Parse C-style for loop: for ((init; cond; incr)); do list; done."""
+        start is the position of the for keyword.
+        """
         # We've already consumed 'for' and positioned at '(('
         self.advance()  # consume first (
         self.advance()  # consume second (
@@ -9928,6 +10905,9 @@ class Parser:
         init = parts[0]
         cond = parts[1]
         incr = parts[2]
+        init_expr = self._parse_for_arith_expr(init)
+        cond_expr = self._parse_for_arith_expr(cond)
+        incr_expr = self._parse_for_arith_expr(incr)
 
         self.skip_whitespace()
 
@@ -9937,11 +10917,33 @@ class Parser:
 
         self.skip_whitespace_and_newlines()
         body = self._parse_loop_body("for loop")
-        return ForArith(init, cond, incr, body, self._collect_redirects())
+        end = self.pos
+        redirects = self._collect_redirects()
+        node = ForArith(
+            init, cond, incr, body, redirects, self.subs, init_expr, cond_expr, incr_expr
+        )
+        self._span_compound(node, start, end, redirects)
+        return node
+
+    def _parse_for_arith_expr(self, text: str) -> Node | None:
+        """Parse one for ((;;)) expression, or None if it is empty or not arithmetic.
+
+        bash only evaluates these when the loop runs, so an expression that doesn't
+        parse is not a syntax error; the text is kept on ForArith either way.
+        """
+        depth = self._nesting.depth
+        try:
+            return self._parse_arith_expr(text)
+        except (ParseError, MatchedPairError) as e:
+            if self._nesting.exceeded:
+                raise e
+            self._nesting.depth = depth
+            return None
 
     def parse_select(self) -> Node | None:
         """Parse a select statement: select name [in words]; do list; done."""
         self.skip_whitespace()
+        start = self.pos
         if not self._lex_consume_word("select"):
             return None
         self.skip_whitespace()
@@ -9989,7 +10991,11 @@ class Parser:
         # Skip whitespace before body
         self.skip_whitespace_and_newlines()
         body = self._parse_loop_body("select")
-        return Select(var_name, words, body, self._collect_redirects())
+        end = self.pos
+        redirects = self._collect_redirects()
+        node = Select(var_name, words, body, redirects)
+        self._span_compound(node, start, end, redirects)
+        return node
 
     def _consume_case_terminator(self) -> str:
         """Consume and return case pattern terminator (;;, ;&, or ;;&)."""
@@ -10002,6 +11008,8 @@ class Parser:
     def parse_case(self) -> Node | None:
         """Parse a case statement: case word in pattern) commands;; ... esac."""
         # Use consume_word for initial keyword to handle leading } in process subs
+        self.skip_whitespace()
+        start = self.pos
         if not self.consume_word("case"):
             return None
         self._set_state(ParserStateFlags.PST_CASESTMT)
@@ -10064,6 +11072,7 @@ class Parser:
 
             # Skip optional leading ( before pattern (POSIX allows this)
             self.skip_whitespace_and_newlines()
+            pattern_start = self.pos
             if not self.at_end() and self.peek() == "(":
                 self.advance()
                 self.skip_whitespace_and_newlines()
@@ -10201,6 +11210,7 @@ class Parser:
             pattern = "".join(pattern_chars)
             if not pattern:
                 raise ParseError("Expected pattern in case statement", self._lex_peek_token().pos)
+            pattern_end = self.pos
 
             # Parse commands until ;;, ;&, ;;&, or esac
             # Commands are optional (can have empty body)
@@ -10221,11 +11231,20 @@ class Parser:
                         self.skip_whitespace()
 
             # Handle terminator: ;;, ;&, or ;;&
+            terminator_start = self.pos
             terminator = self._consume_case_terminator()
+            case_pattern = CasePattern(pattern, body, terminator, self.subs)
+            # The clause runs through its terminator, or its body before esac
+            if self.pos > terminator_start:
+                self._span_to(case_pattern, pattern_start, self.pos)
+            elif body is not None:
+                self._span_from(case_pattern, pattern_start, body)
+            else:
+                self._span_to(case_pattern, pattern_start, pattern_end)
 
             self.skip_whitespace_and_newlines()
 
-            patterns.append(CasePattern(pattern, body, terminator))
+            patterns.append(case_pattern)
 
         self._clear_state(ParserStateFlags.PST_CASEPAT)
         # Expect 'esac'
@@ -10234,7 +11253,11 @@ class Parser:
             self._clear_state(ParserStateFlags.PST_CASESTMT)
             raise ParseError("Expected 'esac' to close case statement", self._lex_peek_token().pos)
         self._clear_state(ParserStateFlags.PST_CASESTMT)
-        return Case(word, patterns, self._collect_redirects())
+        end = self.pos
+        redirects = self._collect_redirects()
+        node = Case(word, patterns, redirects)
+        self._span_compound(node, start, end, redirects)
+        return node
 
     def parse_coproc(self) -> Node | None:
         """Parse a coproc statement.
@@ -10244,6 +11267,7 @@ class Parser:
         - For simple commands, don't extract NAME (treat everything as the command)
         """
         self.skip_whitespace()
+        start = self.pos
         if not self._lex_consume_word("coproc"):
             return None
         self.skip_whitespace()
@@ -10257,22 +11281,30 @@ class Parser:
         if ch == "{":
             body = self.parse_brace_group()
             if body is not None:
-                return Coproc(body, name)
+                coproc = Coproc(body, name)
+                self._span_from(coproc, start, body)
+                return coproc
         if ch == "(":
             if self.pos + 1 < self.length and self.source[self.pos + 1] == "(":
                 body = self.parse_arithmetic_command()
                 if body is not None:
-                    return Coproc(body, name)
+                    coproc = Coproc(body, name)
+                    self._span_from(coproc, start, body)
+                    return coproc
             body = self.parse_subshell()
             if body is not None:
-                return Coproc(body, name)
+                coproc = Coproc(body, name)
+                self._span_from(coproc, start, body)
+                return coproc
 
         # Check for reserved word compounds directly
         next_word = self._lex_peek_reserved_word()
         if next_word is not None and next_word in COMPOUND_KEYWORDS:
             body = self.parse_compound_command()
             if body is not None:
-                return Coproc(body, name)
+                coproc = Coproc(body, name)
+                self._span_from(coproc, start, body)
+                return coproc
 
         # Check if first word is NAME followed by compound command
         word_start = self.pos
@@ -10297,7 +11329,9 @@ class Parser:
                     name = potential_name
                     body = self.parse_brace_group()
                     if body is not None:
-                        return Coproc(body, name)
+                        coproc = Coproc(body, name)
+                        self._span_from(coproc, start, body)
+                        return coproc
                 elif ch == "(":
                     name = potential_name
                     if self.pos + 1 < self.length and self.source[self.pos + 1] == "(":
@@ -10305,12 +11339,16 @@ class Parser:
                     else:
                         body = self.parse_subshell()
                     if body is not None:
-                        return Coproc(body, name)
+                        coproc = Coproc(body, name)
+                        self._span_from(coproc, start, body)
+                        return coproc
                 elif next_word is not None and next_word in COMPOUND_KEYWORDS:
                     name = potential_name
                     body = self.parse_compound_command()
                     if body is not None:
-                        return Coproc(body, name)
+                        coproc = Coproc(body, name)
+                        self._span_from(coproc, start, body)
+                        return coproc
 
             # Not followed by compound - restore position and parse as simple command
             self.pos = word_start
@@ -10318,7 +11356,9 @@ class Parser:
         # Parse as simple command (includes any "NAME" as part of the command)
         body = self.parse_command()
         if body is not None:
-            return Coproc(body, name)
+            coproc = Coproc(body, name)
+            self._span_from(coproc, start, body)
+            return coproc
 
         raise ParseError("Expected command after coproc", self.pos)
 
@@ -10365,7 +11405,9 @@ class Parser:
             if body is None:
                 raise ParseError("Expected function body", self.pos)
 
-            return Function(name, body)
+            function = Function(name, body)
+            self._span_from(function, saved_pos, body)
+            return function
 
         # Check for POSIX form: name()
         # We need to peek ahead to see if there's a () after the word
@@ -10441,7 +11483,9 @@ class Parser:
         if body is None:
             raise ParseError("Expected function body", self.pos)
 
-        return Function(name, body)
+        function = Function(name, body)
+        self._span_from(function, saved_pos, body)
+        return function
 
     def _parse_compound_command(self) -> Node | None:
         """Parse any compound command (for function bodies, etc.)."""
@@ -10505,16 +11549,25 @@ class Parser:
             return True
         return False
 
+    def _new_operator(self, op: str, start: int) -> Operator:
+        """An Operator node for the list operator op found at start."""
+        operator = Operator(op)
+        self._span_to(operator, start, start + len(op))
+        return operator
+
     def parse_list_until(self, stop_words: set[str]) -> Node | None:
         """Parse a list that stops before certain reserved words."""
+        depth = self._enter_nesting()
         # Check if we're already at a stop word
         self.skip_whitespace_and_newlines()
         reserved = self._lex_peek_reserved_word()
         if reserved is not None and reserved in stop_words:
+            self._nesting.depth = depth
             return None
 
         pipeline = self.parse_pipeline()
         if pipeline is None:
+            self._nesting.depth = depth
             return None
 
         parts = [pipeline]
@@ -10522,12 +11575,14 @@ class Parser:
         while True:
             # Check for explicit operator FIRST (without consuming newlines)
             self.skip_whitespace()
+            op_start = self.pos
             op = self.parse_list_operator()
 
             if op is None:
                 # No explicit operator - check for newline as implicit separator
                 if not self.at_end() and self.peek() == "\n":
                     # compound_list context: newline acts as separator
+                    op_start = self.pos
                     self.advance()  # consume \n
                     self._gather_heredoc_bodies()
                     if self._cmdsub_heredoc_end != -1 and self._cmdsub_heredoc_end > self.pos:
@@ -10554,18 +11609,18 @@ class Parser:
                 if self._at_list_until_terminator(stop_words):
                     # Don't include trailing semicolon - it's just a terminator
                     break
-                parts.append(Operator(op))
+                parts.append(self._new_operator(op, op_start))
             elif op == "&":
-                parts.append(Operator(op))
+                parts.append(self._new_operator(op, op_start))
                 self.skip_whitespace_and_newlines()
                 if self._at_list_until_terminator(stop_words):
                     break
             elif op in ("&&", "||"):
-                parts.append(Operator(op))
+                parts.append(self._new_operator(op, op_start))
                 self.skip_whitespace_and_newlines()
             else:
                 # op == "\n" - already handled above
-                parts.append(Operator(op))
+                parts.append(self._new_operator(op, op_start))
 
             # Check for stop words before parsing next pipeline
             if self._at_list_until_terminator(stop_words):
@@ -10576,9 +11631,12 @@ class Parser:
                 raise ParseError("Expected command after " + op, self.pos)
             parts.append(pipeline)
 
+        self._nesting.depth = depth
         if len(parts) == 1:
             return parts[0]
-        return List(parts)
+        result = List(parts)
+        self._span_nodes(result, parts[0], parts[len(parts) - 1])
+        return result
 
     def parse_compound_command(self) -> Node | None:
         """Parse a compound command (subshell, brace group, if, loops, or simple command)."""
@@ -10679,6 +11737,7 @@ class Parser:
     def parse_pipeline(self) -> Node | None:
         """Parse a pipeline (commands separated by |), with optional time/negation prefix."""
         self.skip_whitespace()
+        start = self.pos
 
         # Track order of prefixes: "time", "negation", or "time_negation" or "negation_time"
         prefix_order = None
@@ -10744,16 +11803,20 @@ class Parser:
                 self.skip_whitespace()
                 # Recursively parse pipeline to handle ! ! cmd, ! time cmd, etc.
                 # Bare ! (no following command) is valid POSIX - equivalent to false
+                depth = self._enter_nesting()
                 inner = self.parse_pipeline()
+                self._nesting.depth = depth
                 # Double negation cancels out (! ! cmd -> cmd, ! ! -> empty command)
                 if isinstance(inner, Negation):
                     if inner.pipeline is not None:
                         return inner.pipeline
                     else:
-                        return Command([])
+                        return self._empty_command()
                 if inner is None:
-                    return Negation(Command([]))
-                return Negation(inner)
+                    inner = self._empty_command()
+                negation = Negation(inner)
+                self._span_from(negation, start, inner)
+                return negation
 
         # Parse the actual pipeline
         parsed: Node | None = self._parse_simple_pipeline()
@@ -10761,9 +11824,10 @@ class Parser:
         if parsed is None and prefix_order == "":
             return None
         # After early return, parsed is either Node or None with a prefix
-        result: Node = parsed if parsed is not None else Command([])
+        result: Node = parsed if parsed is not None else self._empty_command()
 
         # Wrap based on prefix order
+        inner = result
         if prefix_order == "time":
             result = Time(result, time_posix)
         elif prefix_order == "negation":
@@ -10771,14 +11835,24 @@ class Parser:
         elif prefix_order == "time_negation":
             # time ! cmd -> Negation(Time(cmd)) per bash-oracle
             result = Time(result, time_posix)
+            self._span_from(result, start, inner)
             result = Negation(result)
         elif prefix_order == "negation_time":
             # ! time cmd -> Negation(Time(cmd))
             result = Time(result, time_posix)
+            self._span_from(result, start, inner)
             result = Negation(result)
+        if result is not inner:
+            self._span_from(result, start, inner)
 
         return result
 
+    def _empty_command(self) -> Command:
+        """The empty command standing in for a missing one, spanning no text."""
+        command = Command([])
+        self._span(command, self.pos)
+        return command
+
     def _parse_simple_pipeline(self) -> Node | None:
         """Parse a simple pipeline (commands separated by | or |&) without time/negation."""
         cmd = self.parse_compound_command()
@@ -10795,14 +11869,17 @@ class Parser:
             if token_type != TokenType.PIPE and token_type != TokenType.PIPE_AMP:
                 break
 
+            pipe_start = self.pos
             self._lex_next_token()  # consume pipe operator
             is_pipe_both = token_type == TokenType.PIPE_AMP
 
-            self.skip_whitespace_and_newlines()  # Allow command on next line after pipe
-
             # Add pipe-both marker if this is a |& pipe
             if is_pipe_both:
-                commands.append(PipeBoth())
+                pipe_both = PipeBoth()
+                self._span(pipe_both, pipe_start)
+                commands.append(pipe_both)
+
+            self.skip_whitespace_and_newlines()  # Allow command on next line after pipe
 
             cmd = self.parse_compound_command()
             if cmd is None:
@@ -10811,7 +11888,9 @@ class Parser:
 
         if len(commands) == 1:
             return commands[0]
-        return Pipeline(commands)
+        pipeline = Pipeline(commands)
+        self._span_nodes(pipeline, commands[0], commands[len(commands) - 1])
+        return pipeline
 
     def parse_list_operator(self) -> str | None:
         """Parse a list operator (&&, ||, ;, &)."""
@@ -10847,23 +11926,29 @@ class Parser:
             newline_as_separator: If True, treat newlines as implicit semicolons.
                 If False, stop at newlines (for top-level parsing).
         """
+        # Every nested command (compound commands, substitutions) parses its
+        # body through here or parse_list_until
+        depth = self._enter_nesting()
         if newline_as_separator:
             self.skip_whitespace_and_newlines()
         else:
             self.skip_whitespace()
         pipeline = self.parse_pipeline()
         if pipeline is None:
+            self._nesting.depth = depth
             return None
 
         parts = [pipeline]
 
         # Grammar-level EOF token check (like Bash's simple_list rule)
         if self._in_state(ParserStateFlags.PST_EOFTOKEN) and self._at_eof_token():
-            return parts[0] if len(parts) == 1 else List(parts)
+            self._nesting.depth = depth
+            return pipeline
 
         while True:
             # Check for explicit operator FIRST (without consuming newlines)
             self.skip_whitespace()
+            op_start = self.pos
             op = self.parse_list_operator()
 
             if op is None:
@@ -10871,6 +11956,7 @@ class Parser:
                 if not self.at_end() and self.peek() == "\n":
                     if not newline_as_separator:
                         break  # top-level: newline ends this parse
+                    op_start = self.pos
                     # compound_list: newline acts as separator
                     self.advance()  # consume \n
                     self._gather_heredoc_bodies()
@@ -10892,7 +11978,7 @@ class Parser:
             if op is None:
                 break
 
-            parts.append(Operator(op))
+            parts.append(self._new_operator(op, op_start))
 
             # Handle trailing newlines AFTER the operator
             if op in ("&&", "||"):
@@ -10930,9 +12016,12 @@ class Parser:
             if self._in_state(ParserStateFlags.PST_EOFTOKEN) and self._at_eof_token():
                 break
 
+        self._nesting.depth = depth
         if len(parts) == 1:
             return parts[0]
-        return List(parts)
+        result = List(parts)
+        self._span_nodes(result, parts[0], parts[len(parts) - 1])
+        return result
 
     def parse_comment(self) -> Node | None:
         """Parse a comment (# to end of line)."""
@@ -10946,13 +12035,51 @@ class Parser:
 
     def parse(self) -> list[Node]:
         """Parse the entire input."""
-        source = self.source.strip()
-        if not source:
-            return [Empty()]
+        if not self.source or self.source.isspace():
+            return [self._empty_input()]
 
         results: list[Node] = []
+        self._skip_leading_comments()
+
+        # Parse statements separated by newlines as separate top-level nodes.
+        # Errors are raised with positions only; the line is filled in here,
+        # once, rather than tracked while parsing
+        parse_error: ParseError | None = None
+        pair_error: MatchedPairError | None = None
+        try:
+            while not self.at_end():
+                result = self._parse_top_level()
+                if result is not None:
+                    results.append(result)
+        except ParseError as e:
+            if e.line != 0 or e.pos == 0:
+                raise e
+            parse_error = e
+        except MatchedPairError as e:
+            if e.line != 0 or e.pos == 0:
+                raise e
+            pair_error = e
+        if parse_error is not None:
+            line = LineIndex(self.source).line(parse_error.pos)
+            raise ParseError(parse_error.message, parse_error.pos, line)
+        if pair_error is not None:
+            line = LineIndex(self.source).line(pair_error.pos)
+            raise MatchedPairError(pair_error.message, pair_error.pos, line)
 
-        # Skip leading comments (bash-oracle doesn't output them)
+        if not results:
+            return [self._empty_input()]
+
+        self._strip_final_line_continuation(results, 0)
+        return results
+
+    def _empty_input(self) -> Empty:
+        """The node for input with no commands, spanning all of it."""
+        empty = Empty()
+        self._span_to(empty, 0, self.length)
+        return empty
+
+    def _skip_leading_comments(self) -> None:
+        """Skip blank lines and comments before the first statement."""
         while True:
             self.skip_whitespace()
             # Skip newlines but not comments
@@ -10965,33 +12092,39 @@ class Parser:
                 break
             # Don't add to results - bash-oracle doesn't output comments
 
-        # Parse statements separated by newlines as separate top-level nodes
-        while not self.at_end():
-            result = self.parse_list(newline_as_separator=False)
-            if result is not None:
-                results.append(result)
+    def _parse_top_level(self) -> Node | None:
+        """Parse one top-level statement and the newlines and heredoc bodies after it."""
+        # Nothing is being lexed or parsed between statements
+        self._nesting.depth = 0
+        if self.stats is not None:
+            self.stats._lex_depth = 0
+        result = self.parse_list(newline_as_separator=False)
 
-            self.skip_whitespace()
+        self.skip_whitespace()
 
-            # Skip newlines (and any pending heredoc content) between statements
-            found_newline = False
-            while not self.at_end() and self.peek() == "\n":
-                found_newline = True
-                self.advance()
-                # Gather pending heredoc content after newline
-                self._gather_heredoc_bodies()
-                if self._cmdsub_heredoc_end != -1 and self._cmdsub_heredoc_end > self.pos:
-                    self.pos = self._cmdsub_heredoc_end
-                    self._cmdsub_heredoc_end = -1
-                self.skip_whitespace()
+        # Skip newlines (and any pending heredoc content) between statements
+        found_newline = False
+        while not self.at_end() and self.peek() == "\n":
+            found_newline = True
+            self.advance()
+            # Gather pending heredoc content after newline
+            self._gather_heredoc_bodies()
+            if self._cmdsub_heredoc_end != -1 and self._cmdsub_heredoc_end > self.pos:
+                self.pos = self._cmdsub_heredoc_end
+                self._cmdsub_heredoc_end = -1
+            self.skip_whitespace()
 
-            # If no newline and not at end, we have unparsed content
-            if not found_newline and not self.at_end():
-                raise ParseError("Syntax error", self.pos)
+        # If no newline and not at end, we have unparsed content
+        if not found_newline and not self.at_end():
+            raise ParseError("Syntax error", self.pos)
+        return result
 
-        if not results:
-            return [Empty()]
+    def _strip_final_line_continuation(self, results: list[Node], earlier: int) -> None:
+        """Apply bash-oracle's trailing backslash rule to the last of all results.
 
+        earlier counts top-level nodes produced before results (when the input is
+        parsed in pieces, results holds only the final piece's nodes).
+        """
         # bash-oracle strips trailing backslash at EOF when there was a newline
         # inside single quotes and the last word is on the same line as other content
         # (not on its own line after a newline)
@@ -11007,11 +12140,9 @@ class Parser:
         ):
             # Check if the last word started on its own line (after a newline)
             # If so, keep the backslash. Otherwise, strip it as line continuation.
-            if not self._last_word_on_own_line(results):
+            if earlier == 0 and not self._last_word_on_own_line(results):
                 self._strip_trailing_backslash_from_last_word(results)
 
-        return results
-
     def _last_word_on_own_line(self, nodes: list[Node]) -> bool:
         """Check if the last word is on its own line (after a newline with no other content)."""
         # If we have multiple top-level nodes, they were separated by newlines,
@@ -11058,13 +12189,30 @@ class Parser:
         return None
 
 
-def parse(source: str, extglob: bool = False) -> list[Node]:
+def write_sexp(node: Node, out: SexpWriter) -> None:
+    """
+    Write the S-expression for a node to a stream.
+
+    Output is identical to node.to_sexp(), but child output is written straight
+    to out instead of being concatenated into per-node strings.
+
+    Args:
+        node: The AST node to serialize.
+        out: A SexpWriter or any text stream with a write(str) method.
+    """
+    node.write_sexp(out)
+
+
+def parse(source: str, extglob: bool = False, max_depth: int = 0) -> list[Node]:
     """
     Parse bash source code and return a list of AST nodes.
 
     Args:
         source: The bash source code to parse.
         extglob: Enable extended glob patterns (@, ?, *, +, ! followed by parentheses).
+        max_depth: If above 0, raise ParseError for constructs nested deeper than
+            this instead of recursing further. A level can take up to about 20
+            Python stack frames, so 40 stays within the default recursion limit.
 
     Returns:
         A list of AST nodes representing the parsed code.
@@ -11072,5 +12220,5 @@ def parse(source: str, extglob: bool = False) -> list[Node]:
     Raises:
         ParseError: If the source code cannot be parsed.
     """
-    parser = Parser(source, False, extglob)
+    parser = Parser(source, False, extglob, max_depth)
     return parser.parse()
@@ -0,0 +1,1441 @@
+"""Python-only helpers built on the parser.
+
+parable.py is transpiled to other languages and stays free of imports and
+generators. Features that need the standard library live here instead.
+"""
+
+import array
+import collections
+import functools
+import gc
+import hashlib
+import io
+import json
+import os
+import struct
+import sys
+import tempfile
+import threading
+import time
+import typing
+import zlib
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from json.encoder import encode_basestring_ascii
+
+import parable
+from parable import (
+    Command,
+    Empty,
+    LineIndex,
+    MatchedPairError,
+    Node,
+    ParseError,
+    Parser,
+    ParseStats,
+    SubstitutionTable,
+    Word,
+)
+
+# Characters read before re-trying a parse of the pending window
+STREAM_CHUNK_SIZE = 65536
+
+# Sources sent to a worker per task in parse_many
+PARSE_MANY_CHUNK_SIZE = 64
+
+# Files sent to a worker per task in dump_files
+DUMP_FILES_CHUNK_SIZE = 16
+
+# Parse results kept in memory by a ParseCache
+PARSE_CACHE_SIZE = 1024
+
+# Node classes in definition order; a node's kind id in flatten() is its index here
+NODE_CLASSES = tuple(
+    value for value in vars(parable).values() if isinstance(value, type) and issubclass(value, Node)
+)
+_KIND_IDS = {cls: index for index, cls in enumerate(NODE_CLASSES)}
+
+# dump_ast() output: magic, then format version, int count and string bytes
+AST_FORMAT_VERSION = 3
+_AST_MAGIC = b"PRBL"
+_AST_HEADER = struct.Struct("<4sHII")
+
+# to_dict() / write_json() layout, as described by json_schema()
+JSON_FORMAT_VERSION = 1
+
+# dump_ast() program: one int per step, arg * 16 + opcode, run by load_ast() on a value stack
+_OP_NONE = 0
+_OP_FALSE = 1
+_OP_TRUE = 2
+_OP_STR = 3  # arg: string index
+_OP_INT = 4  # arg: value
+_OP_LIST = 5  # arg: item count, popped
+_OP_NODE = 6  # arg: class index; pops one value per field, then reads start and end
+_OP_REF = 7  # arg: index of a node already built (shared subtrees)
+_OP_TABLE = 8  # arg: SubstitutionTable index
+_OP_FILL = 9  # arg: entry count; pops text, node pairs into the next table
+_OP_WORDS_TABLE = 10  # arg: SubstitutionTable index, used by the _OP_WORD steps after it
+_OP_WORD = 11  # arg: string index; a Word with that value and no parts, then start and end
+_OP_FILL_ARGS = 12  # arg: entry count; pops text, start, node triples into the last filled table
+
+
+def iter_parse(source, extglob=False, chunk_size=STREAM_CHUNK_SIZE):
+    """Parse bash source incrementally, yielding top-level nodes as they complete.
+
+    source is a string or a text file object; a file is read line by line and
+    only the window holding statements not yet yielded is kept in memory. The
+    nodes yielded (heredoc bodies included) are the same as parse() returns.
+
+    A statement is yielded once input after it has been seen: until then more
+    lines could still extend it (line continuations, && at end of line, heredoc
+    bodies). A parse error can't be told apart from a statement that is merely
+    incomplete, so it is raised when the input ends, with positions and lines
+    relative to the whole input. Node spans are offsets into the whole input too.
+    """
+    if isinstance(source, str):
+        source = io.StringIO(source)
+    window = ""
+    base = 0  # Offset of window in the whole input
+    base_lines = 0  # Newlines before the window
+    earlier = 0  # Top-level nodes yielded so far
+    at_start = True  # Still before the first statement (leading comments skipped)
+    saw_newline_in_single_quote = False
+    retry_at = 0
+    for line in source:
+        window += line
+        if len(window) < retry_at:
+            continue
+        parser = Parser(window, False, extglob)
+        parser._offset = base
+        nodes, end = _parse_complete(parser, at_start)
+        saw_newline_in_single_quote = (
+            saw_newline_in_single_quote or parser._saw_newline_in_single_quote
+        )
+        yield from nodes
+        earlier += len(nodes)
+        if end > 0:
+            at_start = False
+            base_lines += window.count("\n", 0, end)
+            window = window[end:]
+            base += end
+        # Back off geometrically so a long statement is re-parsed O(log n) times;
+        # the step grows with input seen so early statements come out quickly
+        retry_at = len(window) * 2 + min(chunk_size, base + len(window))
+    # End of input: whatever is left must parse completely
+    parser = Parser(window, False, extglob)
+    parser._offset = base
+    results: list[Node] = []
+    try:
+        if window and not window.isspace():
+            if at_start:
+                parser._skip_leading_comments()
+            while not parser.at_end():
+                result = parser._parse_top_level()
+                if result is not None:
+                    results.append(result)
+    except (ParseError, MatchedPairError) as e:
+        if e.pos:
+            if not e.line:
+                e.line = base_lines + LineIndex(window).line(e.pos)
+            e.pos += base
+            if isinstance(e, ParseError):
+                e.args = (e._format_message(),)
+        raise
+    parser._saw_newline_in_single_quote = (
+        saw_newline_in_single_quote or parser._saw_newline_in_single_quote
+    )
+    parser._strip_final_line_continuation(results, earlier)
+    if earlier == 0 and not results:
+        empty = Empty()
+        empty.start = 0
+        empty.end = base + len(window)
+        results.append(empty)
+    yield from results
+
+
+def _parse_complete(parser, at_start):
+    """Parse the statements in parser's window that input after them can't change.
+
+    Returns (nodes, end) where end is the offset just past the last such
+    statement (and the newlines and heredoc bodies following it), or 0.
+    """
+    nodes = []
+    end = 0
+    try:
+        if at_start:
+            parser._skip_leading_comments()
+            if parser.at_end():
+                return nodes, end
+        while not parser.at_end():
+            result = parser._parse_top_level()
+            if parser.at_end():
+                # Ends at the edge of the window: later lines may still extend it
+                break
+            if result is not None:
+                nodes.append(result)
+            end = parser.pos
+    except (ParseError, MatchedPairError):
+        # Possibly just incomplete; it is parsed again once more input arrives
+        pass
+    return nodes, end
+
+
+class ParseFailure:
+    """Picklable record of an error raised while parsing one source.
+
+    ParseError doesn't survive pickling intact (its args hold the formatted
+    message), so parse_many returns this in its place.
+    """
+
+    def __init__(self, kind, message, pos=0, line=0):
+        self.kind = kind  # "ParseError", "MatchedPairError" or "RecursionError"
+        self.message = message
+        self.pos = pos
+        self.line = line
+
+    def __repr__(self):
+        return f"ParseFailure({self.kind!r}, {self.message!r}, {self.pos!r}, {self.line!r})"
+
+    def __eq__(self, other):
+        return isinstance(other, ParseFailure) and (
+            self.kind,
+            self.message,
+            self.pos,
+            self.line,
+        ) == (other.kind, other.message, other.pos, other.line)
+
+    def to_exception(self):
+        """Rebuild the exception the parser raised."""
+        if self.kind == "MatchedPairError":
+            return MatchedPairError(self.message, self.pos, self.line)
+        if self.kind == "RecursionError":
+            return RecursionError(self.message)
+        return ParseError(self.message, self.pos, self.line)
+
+
+def parse_many(
+    sources, workers=None, chunksize=PARSE_MANY_CHUNK_SIZE, extglob=False, ordered=True, max_depth=0
+):
+    """Parse many bash sources across a pool of worker processes.
+
+    Yields (index, result) pairs, where index is the position of the source in
+    sources and result is the list of nodes parse() returns, or a ParseFailure.
+    Input nested too deeply for the stack is a "RecursionError" failure; set
+    max_depth, as for parse(), to get a ParseError for it instead.
+    With ordered=True pairs come in input order; otherwise as batches complete.
+
+    Sources are sent to workers chunksize at a time to amortize pickling, and
+    only a few batches per worker are in flight, so sources can be a lazy
+    iterable of any length. workers defaults to os.cpu_count(); workers=1
+    parses in this process without starting a pool.
+    """
+    if chunksize < 1:
+        raise ValueError("chunksize must be at least 1")
+    batches = _batches(sources, chunksize)
+    args = (extglob, max_depth)
+    for start, results in _map_batches(_parse_batch, batches, args, workers, ordered):
+        yield from enumerate(results, start)
+
+
+def _map_batches(function, batches, args, workers, ordered):
+    """Run function(batch, *args) for each (start, batch), yielding (start, result).
+
+    Uses a pool of workers processes (os.cpu_count() for None) with a few
+    batches per worker in flight; workers=1 runs in this process instead.
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers <= 1:
+        for start, batch in batches:
+            yield start, function(batch, *args)
+        return
+    max_in_flight = workers * 2
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        if ordered:
+            queue = collections.deque()
+            for start, batch in batches:
+                queue.append((start, executor.submit(function, batch, *args)))
+                if len(queue) >= max_in_flight:
+                    start, future = queue.popleft()
+                    yield start, future.result()
+            while queue:
+                start, future = queue.popleft()
+                yield start, future.result()
+            return
+        pending = {}
+        exhausted = False
+        while True:
+            while not exhausted and len(pending) < max_in_flight:
+                item = next(batches, None)
+                if item is None:
+                    exhausted = True
+                    break
+                start, batch = item
+                pending[executor.submit(function, batch, *args)] = start
+            if not pending:
+                return
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield pending.pop(future), future.result()
+
+
+def _batches(sources, chunksize):
+    """Yield (start_index, list_of_sources) groups of up to chunksize sources."""
+    batch = []
+    start = 0
+    for source in sources:
+        batch.append(source)
+        if len(batch) == chunksize:
+            yield start, batch
+            start += len(batch)
+            batch = []
+    if batch:
+        yield start, batch
+
+
+def _parse_batch(batch, extglob, max_depth):
+    """Parse each source in a worker, recording errors instead of raising."""
+    results = []
+    for source in batch:
+        try:
+            results.append(Parser(source, False, extglob, max_depth).parse())
+        except (ParseError, MatchedPairError) as e:
+            results.append(ParseFailure(type(e).__name__, e.message, e.pos, e.line))
+        except RecursionError as e:
+            results.append(ParseFailure("RecursionError", str(e)))
+    return results
+
+
+def dump_files(
+    paths, workers=None, chunksize=DUMP_FILES_CHUNK_SIZE, extglob=False, ast=False, max_depth=0
+):
+    """Parse many script files across a pool of worker processes, one JSON record each.
+
+    Yields a line of JSON text (no trailing newline) per path, in input order:
+    {"path", "bytes", "seconds" (parse time), "nodes" (all nodes in the tree),
+    "error"}, where error is null or {"kind", "message", "pos", "line"}. kind
+    is the exception's class name: a file that can't be read has kind
+    "OSError", and any other exception while parsing is recorded the same way
+    rather than ending the run. With ast=True each record also has "ast", the
+    write_json() document of the tree (null after an error). Records are
+    encoded in the workers, so no trees are sent between processes. paths can
+    be a lazy iterable of any length; workers and max_depth are as for
+    parse_many.
+    """
+    if chunksize < 1:
+        raise ValueError("chunksize must be at least 1")
+    batches = _batches(paths, chunksize)
+    args = (extglob, ast, max_depth)
+    for _, records in _map_batches(_dump_batch, batches, args, workers, True):
+        yield from records
+
+
+def _dump_batch(batch, extglob, ast, max_depth):
+    """Parse each file in a worker into its dump_files() record."""
+    records = []
+    for path in batch:
+        record = {"path": path, "bytes": 0, "seconds": 0.0, "nodes": 0, "error": None}
+        nodes = []
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except OSError as e:
+            record["error"] = {"kind": "OSError", "message": str(e), "pos": 0, "line": 0}
+        else:
+            record["bytes"] = len(data)
+            source = data.decode("utf-8", "surrogateescape")
+            start = time.perf_counter()
+            try:
+                nodes = Parser(source, False, extglob, max_depth).parse()
+            except (ParseError, MatchedPairError) as e:
+                record["error"] = {
+                    "kind": type(e).__name__,
+                    "message": e.message,
+                    "pos": e.pos,
+                    "line": e.line,
+                }
+            except Exception as e:
+                # RecursionError, or a parser bug: one file must not end a long run
+                record["error"] = {
+                    "kind": type(e).__name__,
+                    "message": str(e),
+                    "pos": 0,
+                    "line": 0,
+                }
+            record["seconds"] = time.perf_counter() - start
+            record["nodes"] = sum(1 for _ in walk(nodes))
+        text = json.dumps(record, separators=(",", ":"))
+        if ast:
+            out = io.StringIO()
+            if record["error"] is None:
+                write_json(nodes, out)
+            else:
+                out.write("null")
+            text = text[:-1] + ',"ast":' + out.getvalue() + "}"
+        records.append(text)
+    return records
+
+
+@functools.cache
+def parser_version():
+    """Checksum of parable.py identifying the parser, as the justfile's _src-checksum."""
+    with open(parable.__file__, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()[:16]
+
+
+class ParseCache:
+    """Content-addressed cache in front of parse().
+
+    Entries are keyed on the sha256 of the source, extglob and parser_version(),
+    so a changed parser never serves results from an older one. The most
+    recently used maxsize results are kept in memory; with directory set,
+    results are also stored there compressed (trees as dump_ast() data, errors
+    as JSON records) and shared between processes and runs. Parse errors are
+    cached too and raised again.
+
+    A hit returns the same node objects as the parse that filled the entry:
+    treat them as read-only, or copy before mutating.
+    """
+
+    def __init__(self, maxsize=PARSE_CACHE_SIZE, directory=None):
+        self.maxsize = maxsize
+        self.directory = directory
+        self.hits = 0  # Served from memory
+        self.disk_hits = 0  # Served from directory, then kept in memory
+        self.misses = 0  # Parsed
+        self.evictions = 0  # Dropped from memory to stay within maxsize
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+        if directory is not None:
+            os.makedirs(self._version_dir(), exist_ok=True)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def parse(self, source, extglob=False):
+        """Return parse(source, extglob), from the cache when possible."""
+        key = hashlib.sha256(source.encode("utf-8", "surrogatepass")).hexdigest()
+        key += "-x" if extglob else "-n"
+        with self._lock:
+            result = self._entries.get(key)
+            if result is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+        if result is None:
+            result = self._load(key)
+            if result is not None:
+                with self._lock:
+                    self.disk_hits += 1
+            else:
+                try:
+                    result = Parser(source, False, extglob).parse()
+                except (ParseError, MatchedPairError) as e:
+                    result = ParseFailure(type(e).__name__, e.message, e.pos, e.line)
+                with self._lock:
+                    self.misses += 1
+                self._store(key, result)
+            self._remember(key, result)
+        if isinstance(result, ParseFailure):
+            raise result.to_exception()
+        return result
+
+    def clear(self):
+        """Drop the in-memory entries; the directory store is left alone."""
+        with self._lock:
+            self._entries.clear()
+
+    def _remember(self, key, result):
+        with self._lock:
+            self._entries[key] = result
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def _version_dir(self):
+        return os.path.join(self.directory, parser_version())
+
+    def _path(self, key):
+        return os.path.join(self._version_dir(), key[:2], key)
+
+    def _load(self, key):
+        if self.directory is None:
+            return None
+        try:
+            with open(self._path(key), "rb") as f:
+                data = zlib.decompress(f.read())
+            if data.startswith(_AST_MAGIC):
+                return load_ast(data)
+            return _load_failure(data)
+        except (OSError, ValueError, zlib.error):
+            # Missing or damaged: parse again and overwrite
+            return None
+
+    def _store(self, key, result):
+        if self.directory is None:
+            return
+        if isinstance(result, ParseFailure):
+            record = {
+                "kind": result.kind,
+                "message": result.message,
+                "pos": result.pos,
+                "line": result.line,
+            }
+            data = zlib.compress(json.dumps(record).encode())
+        else:
+            data = zlib.compress(dump_ast(result))
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write then rename so concurrent readers never see a partial entry
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path))
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+        except OSError:
+            os.unlink(tmp)
+            raise
+
+
+def _load_failure(data):
+    """Read a ParseFailure that ParseCache stored as a JSON error record.
+
+    The record has the fields of a dump_files() error. Anything else is
+    refused, so a damaged entry is parsed again.
+    """
+    record = json.loads(data)
+    if (
+        not isinstance(record, dict)
+        or record.keys() != {"kind", "message", "pos", "line"}
+        or record["kind"] not in ("ParseError", "MatchedPairError")
+        or not isinstance(record["message"], str)
+        or type(record["pos"]) is not int
+        or type(record["line"]) is not int
+    ):
+        raise ValueError("malformed cached parse error")
+    return ParseFailure(record["kind"], record["message"], record["pos"], record["line"])
+
+
+class TimedParseStats(ParseStats):
+    """ParseStats whose timings are measured with time.perf_counter."""
+
+    def clock(self):
+        return time.perf_counter()
+
+
+def parse(source, extglob=False, stats=False, index=False):
+    """parable.parse(), optionally reporting what the parse cost or indexing it.
+
+    With stats=True returns (nodes, stats) where stats is a TimedParseStats.
+    Each node is serialized once with to_sexp() to fill in sexp_seconds.
+    With index=True a NodeIndex of the nodes comes last: (nodes, index) or
+    (nodes, stats, index).
+    """
+    if index:
+        if stats:
+            nodes, timed = parse(source, extglob, stats=True)
+            return nodes, timed, NodeIndex(nodes)
+        nodes = parable.parse(source, extglob)
+        return nodes, NodeIndex(nodes)
+    if not stats:
+        return parable.parse(source, extglob)
+    parser = Parser(source, False, extglob)
+    parser.stats = TimedParseStats()
+    start = time.perf_counter()
+    nodes = parser.parse()
+    parsed = time.perf_counter()
+    for node in nodes:
+        node.to_sexp()
+    parser.stats.sexp_seconds = time.perf_counter() - parsed
+    parser.stats.parse_seconds = parsed - start - parser.stats.lex_seconds
+    return nodes, parser.stats
+
+
+def format_stats(stats):
+    """Render ParseStats as aligned "name: value" lines."""
+    lines = [
+        f"tokens lexed:      {stats.tokens_lexed}",
+        f"tokens consumed:   {stats.tokens_consumed}",
+        f"token cache hits:  {stats.token_cache_hits}",
+        f"token cache drops: {stats.token_cache_drops}",
+        f"state saves:       {stats.state_saves}",
+        f"state restores:    {stats.state_restores}",
+        f"sub-parsers:       {stats.sub_parsers}",
+        f"heredocs gathered: {stats.heredocs_gathered}",
+        f"max depth:         {stats.max_depth}",
+        f"lex time:          {stats.lex_seconds * 1000:.2f}ms",
+        f"parse time:        {stats.parse_seconds * 1000:.2f}ms",
+        f"to_sexp time:      {stats.sexp_seconds * 1000:.2f}ms",
+    ]
+    return "\n".join(lines)
+
+
+def _holds_nodes(annotation):
+    if isinstance(annotation, type):
+        return issubclass(annotation, Node)
+    return any(_holds_nodes(arg) for arg in typing.get_args(annotation))
+
+
+@functools.cache
+def _child_fields(cls):
+    """Attributes of a node class that can hold child nodes, base class slots first.
+
+    Read from the class annotations, so fields holding only strings, flags and
+    the shared SubstitutionTable (Word.subs) are never looked at.
+    """
+    hints = typing.get_type_hints(cls)
+    fields = []
+    for klass in reversed(cls.__mro__):
+        for name in klass.__dict__.get("__slots__", ()):
+            if name in hints and _holds_nodes(hints[name]):
+                fields.append(name)
+    return tuple(fields)
+
+
+@functools.cache
+def _reversed_child_fields(cls):
+    return _child_fields(cls)[::-1]
+
+
+def _push_children(stack, node):
+    """Push node's children so that they pop in attribute order."""
+    for name in _reversed_child_fields(node.__class__):
+        value = getattr(node, name)
+        if value.__class__ is list:
+            stack.extend(reversed(value))
+        elif isinstance(value, Node):
+            stack.append(value)
+
+
+def iter_child_nodes(node):
+    """Yield the direct children of node, in attribute order."""
+    for name in _child_fields(node.__class__):
+        value = getattr(node, name)
+        if value.__class__ is list:
+            yield from value
+        elif isinstance(value, Node):
+            yield value
+
+
+def walk(node):
+    """Yield node (or each node of a list, as parse() returns) and all nodes below it.
+
+    Nodes come in preorder: each before its children, children in attribute
+    order. The walk keeps its own stack, so no tree is too deep for it.
+    """
+    stack = list(reversed(node)) if isinstance(node, list) else [node]
+    while stack:
+        node = stack.pop()
+        yield node
+        _push_children(stack, node)
+
+
+class NodeVisitor:
+    """Base class for code that handles nodes by class, like ast.NodeVisitor.
+
+    visit() calls visit_<ClassName>(node) (visit_Command, visit_Redirect, ...)
+    for every node in walk() order, and generic_visit(node) for classes without
+    such a method. Children are visited after their parent returns, unless it
+    returns False. Unlike ast.NodeVisitor, methods don't recurse themselves, so
+    no tree is too deep to visit.
+    """
+
+    def visit(self, node):
+        """Visit node, or each node of a list, and everything below it."""
+        handlers = {}
+        stack = list(reversed(node)) if isinstance(node, list) else [node]
+        while stack:
+            node = stack.pop()
+            cls = node.__class__
+            handler = handlers.get(cls)
+            if handler is None:
+                handler = getattr(self, "visit_" + cls.__name__, self.generic_visit)
+                handlers[cls] = handler
+            if handler(node) is not False:
+                _push_children(stack, node)
+
+    def generic_visit(self, node):
+        """Called for nodes without a visit_ method; does nothing by default."""
+
+
+class NodeIndex:
+    """The nodes of parsed trees grouped by kind, with links to their parents.
+
+    Built with one walk over the trees, so each later query costs only its
+    matches: index["command"] lists every Command, index["redirect"] every
+    Redirect, in preorder (source order for nodes that don't nest). Kinds
+    with no nodes give an empty list. parent(node) is None for top-level nodes.
+    """
+
+    def __init__(self, nodes):
+        by_kind = collections.defaultdict(list)
+        parents = {}
+        stack = [(node, None) for node in reversed(nodes)]
+        children = []
+        while stack:
+            node, parent = stack.pop()
+            by_kind[node.kind].append(node)
+            parents[id(node)] = parent
+            _push_children(children, node)
+            stack.extend((child, node) for child in children)
+            children.clear()
+        self.nodes = nodes
+        self._by_kind = dict(by_kind)
+        self._parents = parents
+
+    def __getitem__(self, kind):
+        return self._by_kind.get(kind, [])
+
+    def __contains__(self, kind):
+        return kind in self._by_kind
+
+    def __len__(self):
+        return len(self._parents)
+
+    def kinds(self):
+        """Kinds present, in the order their first node was reached."""
+        return list(self._by_kind)
+
+    def parent(self, node):
+        """The node whose attribute holds node; KeyError if node isn't indexed."""
+        return self._parents[id(node)]
+
+    def ancestors(self, node):
+        """Yield node's parent, its parent, and so on up to a top-level node."""
+        node = self.parent(node)
+        while node is not None:
+            yield node
+            node = self._parents[id(node)]
+
+
+class ExtractedCommand:
+    """A simple command found by extract_commands().
+
+    assignments are the leading NAME=value words and argv the words after
+    them, as written (quotes included); name is argv[0], or None for a command
+    that only assigns or redirects. literal[i] is argv[i] with its quotes
+    removed, or None when it contains an expansion; tildes and glob characters
+    are left as written. redirects holds the Redirect and HereDoc nodes and
+    start/end the source span (-1 inside backticks and other copied text).
+    """
+
+    def __init__(self, command):
+        words = command.words
+        i = 0
+        while i < len(words) and parable._looks_like_assignment(words[i].value):
+            i += 1
+        self.command = command
+        self.assignments = [word.value for word in words[:i]]
+        self.argv = [word.value for word in words[i:]]
+        self.literal = [_literal_word(word) for word in words[i:]]
+        self.name = self.argv[0] if self.argv else None
+        self.redirects = command.redirects
+        self.start = command.start
+        self.end = command.end
+
+    def __repr__(self):
+        return f"ExtractedCommand({self.name!r}, {self.argv!r}, {self.start!r}, {self.end!r})"
+
+
+def _literal_word(word):
+    """The text of a word without expansions after quote removal, else None."""
+    if word.parts:
+        return None
+    value = word.value
+    if "'" not in value and '"' not in value and "\\" not in value:
+        return value
+    chars = []
+    i = 0
+    n = len(value)
+    while i < n:
+        c = value[i]
+        if c == "'":
+            end = value.find("'", i + 1)
+            if end < 0:
+                end = n
+            chars.append(value[i + 1 : end])
+            i = end + 1
+        elif c == '"':
+            i += 1
+            while i < n and value[i] != '"':
+                if value[i] == "\\" and i + 1 < n and value[i + 1] in '$`"\\\n':
+                    i += 1
+                    if value[i] != "\n":
+                        chars.append(value[i])
+                else:
+                    chars.append(value[i])
+                i += 1
+            i += 1
+        elif c == "\\" and i + 1 < n:
+            if value[i + 1] != "\n":
+                chars.append(value[i + 1])
+            i += 2
+        else:
+            chars.append(c)
+            i += 1
+    return "".join(chars)
+
+
+def extract_commands(source, extglob=False):
+    """Every simple command in source, at any depth, as ExtractedCommand records.
+
+    Includes commands inside $(...), backticks, <(...)/>(...), function
+    bodies, coproc and compound commands, in walk() order, followed in source
+    order by those from substitutions in ${...} arguments, including
+    ${x<(cmd)} and ${x>(cmd)}, which have no node in the tree. Each occurrence
+    gets its own record and span, even where the same ${...} text is repeated.
+    The exception is copied text with no spans (inside backticks, or with line
+    continuations), where repeats of one ${...} argument give a single record.
+    Heredoc bodies are text and aren't searched. Only the parse is done: no
+    S-expression formatting or node index.
+    """
+    parser = Parser(source, False, extglob)
+    nodes = parser.parse()
+    commands = []
+    seen = set()  # Commands by id, for those without a span
+    seen_starts = set()  # Commands by start offset: one per occurrence
+    stack = list(reversed(nodes))
+    tables = []
+    subs = parser.subs
+    if subs is not None:
+        unlocated = [
+            body
+            for body in list(subs.param_args.values()) + list(subs.nodes.values())
+            if body.start < 0
+        ]
+        located = []
+        if subs.located is not None:
+            located = [subs.located[start] for start in sorted(subs.located)]
+        tables = [unlocated, located]
+    while True:
+        while stack:
+            node = stack.pop()
+            if node.__class__ is Command:
+                if node.start >= 0:
+                    # The parser may have parsed a substitution more than once
+                    if node.start in seen_starts:
+                        continue
+                    seen_starts.add(node.start)
+                elif id(node) in seen:
+                    continue
+                else:
+                    seen.add(id(node))
+                commands.append(ExtractedCommand(node))
+            _push_children(stack, node)
+        if not tables:
+            return commands
+        stack.extend(reversed(tables.pop()))
+
+
+@functools.cache
+def _node_fields(cls):
+    """Public attribute names of a node class, base class slots first."""
+    fields = []
+    for klass in reversed(cls.__mro__):
+        for name in klass.__dict__.get("__slots__", ()):
+            if name not in ("kind", "subs", "start", "end") and not name.startswith("_"):
+                fields.append(name)
+    return tuple(fields)
+
+
+class FlatAST:
+    """Nodes of one or more trees as parallel typed arrays, in preorder.
+
+    Node i has kind[i] (an index into kinds, the NODE_CLASSES names), parent[i],
+    first_child[i] and next_sibling[i] (node indexes, -1 for none; top-level
+    nodes are siblings of each other), field[i] (the parent attribute holding
+    it, as an index into strings) and its source span start[i]:end[i] (-1 where
+    the parser recorded none).
+
+    Scalar attributes are rows of two side tables: str_node/str_name/str_value
+    for strings and int_node/int_name/int_value for ints and bools. Names and
+    string values index strings, one table shared by the whole export; None
+    attributes have no row. The arrays support the buffer protocol, so
+    memoryview() or tobytes() serializes a column without touching its items.
+    """
+
+    def __init__(self):
+        self.kinds = [cls.__name__ for cls in NODE_CLASSES]
+        self.strings = []
+        self.kind = array.array("B")
+        self.parent = array.array("i")
+        self.first_child = array.array("i")
+        self.next_sibling = array.array("i")
+        self.field = array.array("i")
+        self.start = array.array("i")
+        self.end = array.array("i")
+        self.str_node = array.array("i")
+        self.str_name = array.array("i")
+        self.str_value = array.array("i")
+        self.int_node = array.array("i")
+        self.int_name = array.array("i")
+        self.int_value = array.array("q")
+        self._string_ids = {}
+
+    def __len__(self):
+        return len(self.kind)
+
+    def string_id(self, s):
+        """Index of s in strings, adding it on first use."""
+        index = self._string_ids.get(s)
+        if index is None:
+            index = len(self.strings)
+            self._string_ids[s] = index
+            self.strings.append(s)
+        return index
+
+    def columns(self):
+        """Every typed array by name, for bulk export."""
+        return {name: value for name, value in vars(self).items() if isinstance(value, array.array)}
+
+
+def flatten(nodes):
+    """Convert a list of top-level nodes (as parse() returns) into a FlatAST.
+
+    Children are numbered after their parent in attribute order, so a subtree
+    is a contiguous run of indexes. The walk is iterative; any depth the parser
+    accepts can be flattened.
+    """
+    flat = FlatAST()
+    string_id = flat.string_id
+    last_child = array.array("i")
+    previous_root = -1
+    stack = [(node, -1, -1) for node in reversed(nodes)]
+    while stack:
+        node, parent, field = stack.pop()
+        index = len(flat.kind)
+        cls = type(node)
+        flat.kind.append(_KIND_IDS[cls])
+        flat.parent.append(parent)
+        flat.first_child.append(-1)
+        flat.next_sibling.append(-1)
+        flat.field.append(field)
+        flat.start.append(node.start)
+        flat.end.append(node.end)
+        last_child.append(-1)
+        if parent < 0:
+            if previous_root >= 0:
+                flat.next_sibling[previous_root] = index
+            previous_root = index
+        else:
+            if last_child[parent] < 0:
+                flat.first_child[parent] = index
+            else:
+                flat.next_sibling[last_child[parent]] = index
+            last_child[parent] = index
+        children = []
+        for name in _node_fields(cls):
+            value = getattr(node, name)
+            if value is None:
+                continue
+            if isinstance(value, Node):
+                children.append((value, index, string_id(name)))
+            elif isinstance(value, list):
+                name_id = string_id(name)
+                for item in value:
+                    children.append((item, index, name_id))
+            elif isinstance(value, str):
+                flat.str_node.append(index)
+                flat.str_name.append(string_id(name))
+                flat.str_value.append(string_id(value))
+            else:
+                flat.int_node.append(index)
+                flat.int_name.append(string_id(name))
+                flat.int_value.append(int(value))
+        children.reverse()
+        stack.extend(children)
+    return flat
+
+
+@functools.cache
+def _slot_fields(cls):
+    """Attributes of a node class dump_ast() stores as fields, base class slots first.
+
+    The span (start, end) follows each node's step instead.
+    """
+    fields = []
+    for klass in reversed(cls.__mro__):
+        for name in klass.__dict__.get("__slots__", ()):
+            if name not in ("kind", "start", "end"):
+                fields.append(name)
+    return tuple(fields)
+
+
+def dump_ast(nodes):
+    """Serialize top-level nodes (as parse() returns) to bytes for load_ast().
+
+    The format is versioned (AST_FORMAT_VERSION) and records each node class's
+    fields, so data written by a parser with different node layouts is refused
+    rather than misread. Nodes shared between places in the tree, and the
+    SubstitutionTable a parse's words share, stay shared after loading.
+    Strings, nodes and int fields are stored in 28 bits (trees of up to 2**27
+    nodes, offsets within 128MiB sources); node spans in 32.
+    """
+    strings = []
+    string_ids = {}
+
+    def string_id(s):
+        index = string_ids.get(s)
+        if index is None:
+            index = len(strings)
+            string_ids[s] = index
+            strings.append(s)
+        return index
+
+    # Per class: name, kind, field count, field names; Word comes first for _OP_WORD
+    class_ids = {Word: 0}
+    word_fields = _slot_fields(Word)
+    class_table = array.array("i", [string_id("Word"), string_id(Word("").kind)])
+    class_table.append(len(word_fields))
+    class_table.extend(string_id(name) for name in word_fields)
+    words_table = -1
+    node_ids = {}
+    tables = []
+    table_ids = {}
+    program = array.array("i")
+    stack = [(False, value, None) for value in reversed(nodes)]
+    table_index = 0
+    while True:
+        if not stack:
+            # Tables go last: their nodes point back at them through Word.subs
+            if table_index == len(tables):
+                break
+            table = tables[table_index]
+            if table.param_args:
+                stack.append((True, _OP_FILL_ARGS, table_index))
+                for text, node in reversed(list(table.param_args.items())):
+                    stack.append((False, node, None))
+                    stack.append((False, table.param_arg_starts[text], None))
+                    stack.append((False, text, None))
+            stack.append((True, _OP_FILL, table_index))
+            for text, node in reversed(list(table.nodes.items())):
+                stack.append((False, node, None))
+                stack.append((False, text, None))
+            table_index += 1
+        emit, value, arg = stack.pop()
+        if emit:
+            if value == _OP_NODE:
+                node_ids[id(arg)] = len(node_ids)
+                program.append(class_ids[type(arg)] * 16 + _OP_NODE)
+                program.append(arg.start)
+                program.append(arg.end)
+            elif value == _OP_FILL:
+                program.append(len(tables[arg].nodes) * 16 + _OP_FILL)
+            elif value == _OP_FILL_ARGS:
+                program.append(len(tables[arg].param_args) * 16 + _OP_FILL_ARGS)
+            else:
+                program.append(arg * 16 + value)
+        elif value is None:
+            program.append(_OP_NONE)
+        elif value is True:
+            program.append(_OP_TRUE)
+        elif value is False:
+            program.append(_OP_FALSE)
+        elif isinstance(value, str):
+            program.append(string_id(value) * 16 + _OP_STR)
+        elif isinstance(value, int):
+            program.append(value * 16 + _OP_INT)
+        elif isinstance(value, list):
+            stack.append((True, _OP_LIST, len(value)))
+            for item in reversed(value):
+                stack.append((False, item, None))
+        elif isinstance(value, Node):
+            if id(value) in node_ids:
+                program.append(node_ids[id(value)] * 16 + _OP_REF)
+                continue
+            cls = type(value)
+            # Most nodes are literal words: one step instead of four
+            if cls is Word and not value.parts and value.subs is not None:
+                subs = value.subs
+                if id(subs) not in table_ids:
+                    table_ids[id(subs)] = len(tables)
+                    tables.append(subs)
+                if table_ids[id(subs)] != words_table:
+                    words_table = table_ids[id(subs)]
+                    program.append(words_table * 16 + _OP_WORDS_TABLE)
+                node_ids[id(value)] = len(node_ids)
+                program.append(string_id(value.value) * 16 + _OP_WORD)
+                program.append(value.start)
+                program.append(value.end)
+                continue
+            fields = _slot_fields(cls)
+            if cls not in class_ids:
+                class_ids[cls] = len(class_ids)
+                class_table.extend([string_id(cls.__name__), string_id(value.kind), len(fields)])
+                class_table.extend(string_id(name) for name in fields)
+            stack.append((True, _OP_NODE, value))
+            for name in reversed(fields):
+                stack.append((False, getattr(value, name), None))
+        elif isinstance(value, SubstitutionTable):
+            if id(value) not in table_ids:
+                table_ids[id(value)] = len(tables)
+                tables.append(value)
+            program.append(table_ids[id(value)] * 16 + _OP_TABLE)
+        else:
+            raise TypeError(f"cannot serialize {type(value).__name__} in an AST")
+    # Strings are stored joined by a character none of them contains
+    separator = 0
+    while any(chr(separator) in s for s in strings):
+        separator += 1
+    ints = array.array("i", [len(strings), separator, len(class_ids)])
+    ints.extend(class_table)
+    ints.extend([len(tables), len(nodes)])
+    ints.extend(program)
+    if sys.byteorder == "big":
+        ints.byteswap()
+    text = chr(separator).join(strings).encode("utf-8", "surrogatepass")
+    header = _AST_HEADER.pack(_AST_MAGIC, AST_FORMAT_VERSION, len(ints), len(text))
+    return header + ints.tobytes() + text
+
+
+def load_ast(data):
+    """Rebuild the top-level nodes serialized by dump_ast().
+
+    Raises ValueError for data that isn't a dump, comes from another format
+    version, or uses node classes or fields this parser doesn't have.
+    """
+    if len(data) < _AST_HEADER.size:
+        raise ValueError("not a parable AST dump")
+    magic, version, int_count, text_size = _AST_HEADER.unpack_from(data)
+    if magic != _AST_MAGIC:
+        raise ValueError("not a parable AST dump")
+    if version != AST_FORMAT_VERSION:
+        raise ValueError(f"unsupported AST format version {version}")
+    ints = array.array("i")
+    text_start = _AST_HEADER.size + int_count * ints.itemsize
+    if len(data) != text_start + text_size:
+        raise ValueError("truncated parable AST dump")
+    ints.frombytes(data[_AST_HEADER.size : text_start])
+    if sys.byteorder == "big":
+        ints.byteswap()
+    ints = ints.tolist()
+    text = bytes(data[text_start:]).decode("utf-8", "surrogatepass")
+    strings = text.split(chr(ints[1])) if ints[0] else []
+    if len(strings) != ints[0]:
+        raise ValueError("malformed parable AST dump")
+    try:
+        i = 2
+        classes = []
+        for _ in range(ints[i]):
+            name = strings[ints[i + 1]]
+            kind = strings[ints[i + 2]]
+            field_count = ints[i + 3]
+            fields = tuple(strings[index] for index in ints[i + 4 : i + 4 + field_count])
+            cls = getattr(parable, name, None)
+            if not (isinstance(cls, type) and issubclass(cls, Node)) or _slot_fields(cls) != fields:
+                raise ValueError(f"AST dump node {name} doesn't match this parser")
+            classes.append((cls, kind, fields, field_count))
+            i += 3 + field_count
+        if not classes or classes[0][0] is not Word:
+            raise ValueError("malformed parable AST dump")
+        tables = [SubstitutionTable() for _ in range(ints[i + 1])]
+        root_count = ints[i + 2]
+        # Collection passes would only walk the nodes being built, which all stay live
+        collecting = gc.isenabled()
+        gc.disable()
+        try:
+            values = _run_ast_program(ints[i + 3 :], strings, classes, tables)
+        finally:
+            if collecting:
+                gc.enable()
+    except (IndexError, StopIteration):
+        raise ValueError("malformed parable AST dump") from None
+    if len(values) != root_count:
+        raise ValueError("malformed parable AST dump")
+    return values
+
+
+def _run_ast_program(program, strings, classes, tables):
+    """Execute load_ast() steps, returning the values left on the stack."""
+    values = []
+    push = values.append
+    nodes = []
+    filled = 0
+    new = object.__new__
+    word_kind = classes[0][1]
+    words_table = None
+    steps = iter(program)
+    # Branches in order of how often each step occurs
+    for step in steps:
+        op = step & 15
+        if op == _OP_WORD:
+            node = new(Word)
+            node.kind = word_kind
+            node.start = next(steps)
+            node.end = next(steps)
+            node.value = strings[step >> 4]
+            node.parts = []
+            node.subs = words_table
+            push(node)
+            nodes.append(node)
+        elif op == _OP_LIST:
+            count = step >> 4
+            if count:
+                items = values[-count:]
+                del values[-count:]
+                push(items)
+            else:
+                push([])
+        elif op == _OP_NODE:
+            cls, kind, fields, field_count = classes[step >> 4]
+            node = new(cls)
+            node.kind = kind
+            node.start = next(steps)
+            node.end = next(steps)
+            if field_count:
+                args = values[-field_count:]
+                del values[-field_count:]
+                for name, value in zip(fields, args, strict=True):
+                    setattr(node, name, value)
+            push(node)
+            nodes.append(node)
+        elif op == _OP_STR:
+            push(strings[step >> 4])
+        elif op == _OP_TABLE:
+            push(tables[step >> 4])
+        elif op == _OP_INT:
+            push(step >> 4)
+        elif op == _OP_FALSE:
+            push(False)
+        elif op == _OP_TRUE:
+            push(True)
+        elif op == _OP_NONE:
+            push(None)
+        elif op == _OP_REF:
+            push(nodes[step >> 4])
+        elif op == _OP_WORDS_TABLE:
+            words_table = tables[step >> 4]
+        elif op == _OP_FILL:
+            count = (step >> 4) * 2
+            entries = values[len(values) - count :]
+            del values[len(values) - count :]
+            table = tables[filled]
+            for j in range(0, count, 2):
+                table.add(entries[j], entries[j + 1])
+            filled += 1
+        elif op == _OP_FILL_ARGS:
+            count = (step >> 4) * 3
+            entries = values[len(values) - count :]
+            del values[len(values) - count :]
+            table = tables[filled - 1]
+            for j in range(0, count, 3):
+                table.add_param_arg(entries[j], entries[j + 1], entries[j + 2])
+        else:
+            raise ValueError(f"bad opcode {op} in AST dump")
+    return values
+
+
+def _json_type(annotation):
+    """Name of a field's JSON type for json_schema(), from its annotation."""
+    if annotation is type(None):
+        return "null"
+    if typing.get_origin(annotation) is list:
+        return "list[" + _json_type(typing.get_args(annotation)[0]) + "]"
+    args = typing.get_args(annotation)
+    if args:
+        return " | ".join(_json_type(arg) for arg in args)
+    return {str: "string", int: "integer", bool: "boolean"}.get(annotation, annotation.__name__)
+
+
+def json_schema():
+    """Describe the JSON that to_dict() and write_json() produce.
+
+    Every node is an object with "type" (its class name), "kind" (Node.kind),
+    "start" and "end" (its source span as offsets into the parsed input, null
+    where the parser recorded none) and then its fields in the order listed
+    here. Child nodes are nested objects. write_json() wraps the top-level
+    nodes as {"version": JSON_FORMAT_VERSION, "nodes": [...]}.
+    """
+    types = {}
+    for cls in NODE_CLASSES:
+        hints = typing.get_type_hints(cls)
+        types[cls.__name__] = {name: _json_type(hints[name]) for name in _node_fields(cls)}
+    return {"version": JSON_FORMAT_VERSION, "types": types}
+
+
+def to_dict(node):
+    """Convert a node and its children to dicts, lists and scalars for json.dumps().
+
+    The layout is described by json_schema(). The conversion is iterative; any
+    depth the parser accepts can be converted.
+    """
+    root = {}
+    stack = [(node, root)]
+    while stack:
+        node, out = stack.pop()
+        cls = node.__class__
+        out["type"] = cls.__name__
+        out["kind"] = node.kind
+        out["start"] = node.start if node.start >= 0 else None
+        out["end"] = node.end if node.end >= 0 else None
+        for name in _node_fields(cls):
+            value = getattr(node, name)
+            if value.__class__ is list:
+                items = []
+                for item in value:
+                    child = {}
+                    items.append(child)
+                    stack.append((item, child))
+                out[name] = items
+            elif isinstance(value, Node):
+                child = {}
+                out[name] = child
+                stack.append((value, child))
+            else:
+                out[name] = value
+    return root
+
+
+# Per node class, filled in by _json_keys
+_JSON_KEYS = {}
+
+
+def _json_keys(cls):
+    """Encoded '{"type":...,"kind":' opener and ',"field":' separators of a node class.
+
+    The third item is whether the class has no fields that can hold nodes.
+    """
+    keys = _JSON_KEYS.get(cls)
+    if keys is None:
+        opener = '{"type":' + encode_basestring_ascii(cls.__name__) + ',"kind":'
+        separators = tuple(
+            ("," + encode_basestring_ascii(name) + ":", name) for name in _node_fields(cls)
+        )
+        keys = _JSON_KEYS[cls] = (opener, separators, not _child_fields(cls))
+    return keys
+
+
+def _json_scalars(node, opener, separators):
+    """JSON text of a node whose fields hold no nodes (empty lists at most)."""
+    start = node.start
+    end = node.end
+    text = (
+        opener
+        + encode_basestring_ascii(node.kind)
+        + (',"start":null' if start < 0 else ',"start":' + str(start))
+        + (',"end":null' if end < 0 else ',"end":' + str(end))
+    )
+    for separator, name in separators:
+        value = getattr(node, name)
+        if value.__class__ is str:
+            text += separator + encode_basestring_ascii(value)
+        elif value is None:
+            text += separator + "null"
+        elif value is True:
+            text += separator + "true"
+        elif value is False:
+            text += separator + "false"
+        elif value.__class__ is list:
+            text += separator + "[]"
+        else:
+            text += separator + int.__repr__(value)
+    return text + "}"
+
+
+def _write_json_node(node, write):
+    """Write one node as JSON text, identical to json.dumps(to_dict(node)) without spaces.
+
+    Nodes without children are encoded in place; the others go on a stack with
+    the text that follows them, so any depth the parser accepts can be written.
+    """
+    out = []
+    append = out.append
+    stack = [node]
+    pop = stack.pop
+    push = stack.extend
+    keys_of = _JSON_KEYS.get
+    encode = encode_basestring_ascii
+    word_opener = _json_keys(Word)[0]
+    while stack:
+        item = pop()
+        if item.__class__ is str:
+            append(item)
+            continue
+        opener, separators, leaf = keys_of(item.__class__) or _json_keys(item.__class__)
+        if leaf or (item.__class__ is Word and not item.parts):
+            append(_json_scalars(item, opener, separators))
+            continue
+        # Text up to the next child that has children of its own is gathered here
+        pending = []
+        start = item.start
+        end = item.end
+        text = (
+            opener
+            + encode(item.kind)
+            + (',"start":null' if start < 0 else ',"start":' + str(start))
+            + (',"end":null' if end < 0 else ',"end":' + str(end))
+        )
+        for separator, name in separators:
+            value = getattr(item, name)
+            text += separator
+            if value.__class__ is list:
+                if not value:
+                    text += "[]"
+                    continue
+                text += "["
+                for child in value:
+                    cls = child.__class__
+                    if cls is Word and not child.parts:
+                        # Literal words are most of the nodes
+                        start = child.start
+                        end = child.end
+                        text += (
+                            word_opener
+                            + encode(child.kind)
+                            + (',"start":null' if start < 0 else ',"start":' + str(start))
+                            + (',"end":null' if end < 0 else ',"end":' + str(end))
+                            + ',"value":'
+                            + encode(child.value)
+                            + ',"parts":[]},'
+                        )
+                        continue
+                    child_opener, child_separators, child_leaf = keys_of(cls) or _json_keys(cls)
+                    if child_leaf:
+                        text += _json_scalars(child, child_opener, child_separators) + ","
+                    else:
+                        pending.append(text)
+                        pending.append(child)
+                        text = ","
+                text = text[:-1] + "]"
+            elif value.__class__ is str:
+                text += encode(value)
+            elif value is None:
+                text += "null"
+            elif value is True:
+                text += "true"
+            elif value is False:
+                text += "false"
+            elif isinstance(value, Node):
+                pending.append(text)
+                pending.append(value)
+                text = ""
+            else:
+                text += int.__repr__(value)
+        pending.append(text + "}")
+        pending.reverse()
+        push(pending)
+    write("".join(out))
+
+
+def write_json(nodes, stream, ndjson=False):
+    """Stream top-level nodes (as parse() returns) to stream as JSON.
+
+    Writes {"version": JSON_FORMAT_VERSION, "nodes": [...]} with the node
+    objects described by json_schema(), or with ndjson=True one node object per
+    line. The output matches json.dumps() of to_dict() with compact separators,
+    but each top-level node goes to stream as it is encoded and no intermediate
+    dicts are built.
+    """
+    write = stream.write
+    if ndjson:
+        for node in nodes:
+            _write_json_node(node, write)
+            write("\n")
+        return
+    write('{"version":' + str(JSON_FORMAT_VERSION) + ',"nodes":[')
+    first = True
+    for node in nodes:
+        if not first:
+            write(",")
+        first = False
+        _write_json_node(node, write)
+    write("]}")
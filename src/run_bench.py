@@ -0,0 +1,746 @@
+"""Benchmark runner for the Python parser."""
+
+import io
+import json
+import os
+import pickle
+import platform
+import struct
+import sys
+import time
+import tracemalloc
+
+from run_tests import find_test_files, parse_test_file
+
+CORPORA = [
+    ("parable", "parable"),
+    ("gnu-bash", os.path.join("corpus", "gnu-bash")),
+    ("oils", os.path.join("corpus", "oils")),
+    ("tree-sitter-bash", os.path.join("corpus", "tree-sitter-bash")),
+]
+
+# Metrics compared against a baseline: (phase, key, higher_is_better)
+COMPARED_METRICS = [
+    ("parse", "bytes_per_sec", True),
+    ("parse", "nodes_per_sec", True),
+    ("parse", "p99_us", False),
+    ("sexp", "bytes_per_sec", True),
+    ("sexp", "p99_us", False),
+    ("memory", "peak_bytes", False),
+    ("memory", "bytes_per_node", False),
+]
+
+# Synthetic long command lists: (name, separator)
+SCALING_SHAPES = [
+    ("semi", "; "),
+    ("newline", "\n"),
+    ("and-or", " && "),
+    ("background", " & "),
+    ("pipe", " | "),
+]
+SCALING_SIZES = [2500, 5000, 10000, 20000]
+
+
+def node_fields(cls):
+    """Attribute names of a node class, from the __slots__ along its MRO."""
+    fields = []
+    for klass in cls.__mro__:
+        fields.extend(klass.__dict__.get("__slots__", ()))
+    return fields
+
+
+def iter_nodes(nodes):
+    """Yield every AST node reachable from a list of top-level nodes."""
+    from parable import Node
+
+    fields_by_class = {}
+    stack = list(nodes)
+    while stack:
+        node = stack.pop()
+        if not isinstance(node, Node):
+            continue
+        yield node
+        cls = type(node)
+        if cls not in fields_by_class:
+            fields_by_class[cls] = node_fields(cls)
+        for field in fields_by_class[cls]:
+            value = getattr(node, field)
+            if isinstance(value, Node):
+                stack.append(value)
+            elif isinstance(value, list):
+                for item in value:
+                    if isinstance(item, Node):
+                        stack.append(item)
+
+
+def count_nodes(nodes):
+    """Count AST nodes reachable from a list of top-level nodes."""
+    count = 0
+    for _node in iter_nodes(nodes):
+        count = count + 1
+    return count
+
+
+def load_inputs(directory):
+    """Load parseable inputs from .tests files. Returns list of (source, extglob) tuples."""
+    inputs = []
+    for filepath in find_test_files(directory):
+        for _name, test_input, test_expected, _line in parse_test_file(filepath):
+            expected = " ".join(test_expected.split())
+            if expected == "<error>" or expected == "<infinite>":
+                continue
+            extglob = False
+            if test_input.startswith("# @extglob\n"):
+                extglob = True
+                test_input = test_input[len("# @extglob\n") :]
+            inputs.append((test_input, extglob))
+    return inputs
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0
+    rank = int(round(pct / 100.0 * (len(sorted_values) - 1)))
+    return sorted_values[rank]
+
+
+def phase_summary(latencies_ns, total_bytes, total_nodes):
+    """Summarize per-input latencies (ns) for one phase."""
+    total_ns = sum(latencies_ns)
+    seconds = total_ns / 1e9
+    ordered = sorted(latencies_ns)
+    return {
+        "seconds": seconds,
+        "bytes_per_sec": total_bytes / seconds if seconds > 0 else 0.0,
+        "nodes_per_sec": total_nodes / seconds if seconds > 0 else 0.0,
+        "p50_us": percentile(ordered, 50) / 1000.0,
+        "p99_us": percentile(ordered, 99) / 1000.0,
+    }
+
+
+def bench_corpus(inputs, runs):
+    """Time parse and to_sexp separately over inputs. Returns a result dict."""
+    from parable import MatchedPairError, ParseError, Parser, parse
+
+    usable = []
+    errors = 0
+    # Substitution bodies to_sexp had to parse again (no AST retained by the parse)
+    reparses = 0
+    for source, extglob in inputs:
+        parser = Parser(source, False, extglob)
+        try:
+            nodes = parser.parse()
+            for node in nodes:
+                node.to_sexp()
+        except (ParseError, MatchedPairError, RecursionError):
+            errors = errors + 1
+            continue
+        reparses = reparses + parser.subs.reparses
+        usable.append((source, extglob, count_nodes(nodes)))
+
+    parse_ns = [0] * len(usable)
+    sexp_ns = [0] * len(usable)
+    for run in range(runs):
+        for idx, (source, extglob, _count) in enumerate(usable):
+            start = time.perf_counter_ns()
+            nodes = parse(source, extglob=extglob)
+            mid = time.perf_counter_ns()
+            for node in nodes:
+                node.to_sexp()
+            end = time.perf_counter_ns()
+            # Keep the fastest run per input to damp scheduler noise
+            if run == 0 or mid - start < parse_ns[idx]:
+                parse_ns[idx] = mid - start
+            if run == 0 or end - mid < sexp_ns[idx]:
+                sexp_ns[idx] = end - mid
+
+    total_bytes = 0
+    total_nodes = 0
+    for source, _extglob, count in usable:
+        total_bytes = total_bytes + len(source.encode("utf-8"))
+        total_nodes = total_nodes + count
+
+    # Peak memory is measured in a separate pass; tracemalloc distorts timings
+    tracemalloc.start()
+    peak = 0
+    for source, extglob, _count in usable:
+        tracemalloc.reset_peak()
+        nodes = parse(source, extglob=extglob)
+        for node in nodes:
+            node.to_sexp()
+        peak = max(peak, tracemalloc.get_traced_memory()[1])
+        del nodes
+    # Retained size: every AST held at once, as when indexing a whole repository
+    retained_start = tracemalloc.get_traced_memory()[0]
+    kept = [parse(source, extglob=extglob) for source, extglob, _count in usable]
+    retained = tracemalloc.get_traced_memory()[0] - retained_start
+    tracemalloc.stop()
+    span_bytes = span_size(kept)
+    del kept
+
+    return {
+        "inputs": len(usable),
+        "skipped_errors": errors,
+        "bytes": total_bytes,
+        "nodes": total_nodes,
+        "parse": phase_summary(parse_ns, total_bytes, total_nodes),
+        "sexp": phase_summary(sexp_ns, total_bytes, total_nodes),
+        "memory": {
+            "peak_bytes": peak,
+            "retained_bytes": retained,
+            "bytes_per_node": retained / total_nodes if total_nodes > 0 else 0.0,
+            "span_bytes_per_node": span_bytes / total_nodes if total_nodes > 0 else 0.0,
+        },
+        "reparses": reparses,
+    }
+
+
+def span_size(trees):
+    """Bytes the retained trees spend on node spans.
+
+    Counts the start and end slots of every node, and each offset int outside
+    the small-int cache once per object (the parser shares some between nodes).
+    """
+    pointer = struct.calcsize("P")
+    total = 0
+    seen = set()
+    for nodes in trees:
+        for node in iter_nodes(nodes):
+            total = total + 2 * pointer
+            for offset in (node.start, node.end):
+                if (offset < -5 or offset > 256) and id(offset) not in seen:
+                    seen.add(id(offset))
+                    total = total + sys.getsizeof(offset)
+    return total
+
+
+def bench_words(inputs, runs):
+    """Time Word.to_sexp alone over every word in the parsed inputs."""
+    from parable import MatchedPairError, ParseError, Word, parse
+
+    words = []
+    for source, extglob in inputs:
+        try:
+            nodes = parse(source, extglob=extglob)
+        except (ParseError, MatchedPairError, RecursionError):
+            continue
+        for node in iter_nodes(nodes):
+            if isinstance(node, Word):
+                words.append(node)
+    plain = 0
+    for word in words:
+        if not word.parts and word.to_sexp() == '(word "' + word.value + '")':
+            plain = plain + 1
+    best = 0
+    for run in range(runs):
+        start = time.perf_counter_ns()
+        for word in words:
+            word.to_sexp()
+        elapsed = time.perf_counter_ns() - start
+        if run == 0 or elapsed < best:
+            best = elapsed
+    seconds = best / 1e9
+    return {
+        "words": len(words),
+        "plain_words": plain,
+        "seconds": seconds,
+        "words_per_sec": len(words) / seconds if seconds > 0 else 0.0,
+    }
+
+
+def recursive_walk(node, out):
+    """Append node and every node below it to out, recursing with isinstance checks.
+
+    The hand-written traversal parable_extras.walk replaces, kept as its baseline.
+    """
+    from parable import Node
+
+    out.append(node)
+    for klass in type(node).__mro__:
+        for field in klass.__dict__.get("__slots__", ()):
+            value = getattr(node, field)
+            if isinstance(value, Node):
+                recursive_walk(value, out)
+            elif isinstance(value, list):
+                for item in value:
+                    if isinstance(item, Node):
+                        recursive_walk(item, out)
+
+
+def bench_walk(inputs, runs):
+    """Time parable_extras.walk and NodeVisitor against recursive_walk."""
+    from parable import MatchedPairError, ParseError, parse
+    from parable_extras import NodeVisitor, walk
+
+    trees = []
+    for source, extglob in inputs:
+        try:
+            trees.append(parse(source, extglob=extglob))
+        except (ParseError, MatchedPairError, RecursionError):
+            continue
+    visitor = NodeVisitor()
+    seconds = {"recursive": 0, "walk": 0, "visitor": 0}
+    nodes = 0
+    for run in range(runs):
+        for method in seconds:
+            start = time.perf_counter_ns()
+            if method == "recursive":
+                out = []
+                for tree in trees:
+                    for node in tree:
+                        recursive_walk(node, out)
+                nodes = len(out)
+            elif method == "walk":
+                for tree in trees:
+                    for _node in walk(tree):
+                        pass
+            else:
+                for tree in trees:
+                    visitor.visit(tree)
+            elapsed = time.perf_counter_ns() - start
+            if run == 0 or elapsed < seconds[method]:
+                seconds[method] = elapsed
+    result = {"trees": len(trees), "nodes": nodes}
+    for method, elapsed in seconds.items():
+        result[method + "_seconds"] = elapsed / 1e9
+    result["walk_speedup"] = seconds["recursive"] / seconds["walk"] if seconds["walk"] > 0 else 0.0
+    return result
+
+
+def print_walk(walks):
+    for name, r in walks.items():
+        print(
+            f"walk {name}: {r['trees']} trees, {r['nodes']} nodes, "
+            f"recursive {r['recursive_seconds'] * 1000:.1f}ms, "
+            f"walk {r['walk_seconds'] * 1000:.1f}ms ({r['walk_speedup']:.1f}x), "
+            f"NodeVisitor {r['visitor_seconds'] * 1000:.1f}ms"
+        )
+
+
+def bench_extract(inputs, runs):
+    """Time extract_commands against parse() followed by to_sexp() or walk()."""
+    from parable import Command, MatchedPairError, ParseError, parse
+    from parable_extras import extract_commands, walk
+
+    usable = []
+    for source, extglob in inputs:
+        try:
+            parse(source, extglob=extglob)
+        except (ParseError, MatchedPairError, RecursionError):
+            continue
+        usable.append((source, extglob))
+    seconds = {"parse_sexp": 0, "parse_walk": 0, "extract": 0}
+    commands = 0
+    for run in range(runs):
+        for method in seconds:
+            start = time.perf_counter_ns()
+            for source, extglob in usable:
+                if method == "extract":
+                    commands += len(extract_commands(source, extglob))
+                    continue
+                nodes = parse(source, extglob=extglob)
+                if method == "parse_sexp":
+                    for node in nodes:
+                        node.to_sexp()
+                else:
+                    [node for node in walk(nodes) if node.__class__ is Command]
+            elapsed = time.perf_counter_ns() - start
+            if run == 0 or elapsed < seconds[method]:
+                seconds[method] = elapsed
+    result = {"inputs": len(usable), "commands": commands // runs}
+    for method, elapsed in seconds.items():
+        result[method + "_seconds"] = elapsed / 1e9
+    return result
+
+
+def print_extract(extract):
+    for name, r in extract.items():
+        print(
+            f"extract {name}: {r['inputs']} inputs, {r['commands']} commands, "
+            f"extract_commands {r['extract_seconds'] * 1000:.1f}ms, "
+            f"parse+walk {r['parse_walk_seconds'] * 1000:.1f}ms, "
+            f"parse+to_sexp {r['parse_sexp_seconds'] * 1000:.1f}ms"
+        )
+
+
+def bench_serialize(inputs, runs):
+    """Time dump_ast/load_ast against parsing the same inputs again."""
+    from parable import MatchedPairError, ParseError, parse
+    from parable_extras import dump_ast, load_ast
+
+    usable = []
+    for source, extglob in inputs:
+        try:
+            parse(source, extglob=extglob)
+        except (ParseError, MatchedPairError, RecursionError):
+            continue
+        usable.append((source, extglob))
+    trees = [parse(source, extglob=extglob) for source, extglob in usable]
+    dumps = [dump_ast(nodes) for nodes in trees]
+    seconds = {"parse": 0, "dump": 0, "load": 0}
+    for run in range(runs):
+        for phase in seconds:
+            start = time.perf_counter_ns()
+            if phase == "parse":
+                for source, extglob in usable:
+                    parse(source, extglob=extglob)
+            elif phase == "dump":
+                for nodes in trees:
+                    dump_ast(nodes)
+            else:
+                for data in dumps:
+                    load_ast(data)
+            elapsed = time.perf_counter_ns() - start
+            if run == 0 or elapsed < seconds[phase]:
+                seconds[phase] = elapsed
+    pickled = sum(len(pickle.dumps(nodes, pickle.HIGHEST_PROTOCOL)) for nodes in trees)
+    return {
+        "trees": len(trees),
+        "bytes": sum(len(data) for data in dumps),
+        "pickle_bytes": pickled,
+        "parse_seconds": seconds["parse"] / 1e9,
+        "dump_seconds": seconds["dump"] / 1e9,
+        "load_seconds": seconds["load"] / 1e9,
+        "load_speedup": seconds["parse"] / seconds["load"] if seconds["load"] > 0 else 0.0,
+    }
+
+
+def print_serialize(serialize):
+    for name, r in serialize.items():
+        print(
+            f"serialize {name}: {r['trees']} trees, {r['bytes']} bytes "
+            f"({r['pickle_bytes']} pickled), dump {r['dump_seconds'] * 1000:.1f}ms, "
+            f"load {r['load_seconds'] * 1000:.1f}ms ({r['load_speedup']:.1f}x faster than parse)"
+        )
+
+
+def print_words(words):
+    for name, r in words.items():
+        print(
+            f"words {name}: {r['words']} words ({r['plain_words']} plain), "
+            f"{format_rate(r['words_per_sec'], 'words')}"
+        )
+
+
+def scaling_source(separator, count):
+    """A function whose body is count simple commands joined by separator."""
+    commands = [f"cmd{i} --flag value{i}" for i in range(count)]
+    return "f() {\n" + separator.join(commands) + "\n}\n"
+
+
+def bench_scaling(runs):
+    """Time to_sexp over growing command lists in one function body.
+
+    Serialization is linear when the per-command cost stays flat as the list grows;
+    growth is the per-command cost at the largest size relative to the smallest.
+    """
+    from parable import parse
+
+    results = {}
+    for name, separator in SCALING_SHAPES:
+        points = []
+        for count in SCALING_SIZES:
+            nodes = parse(scaling_source(separator, count))
+            best = 0
+            for run in range(runs):
+                start = time.perf_counter_ns()
+                for node in nodes:
+                    node.to_sexp()
+                elapsed = time.perf_counter_ns() - start
+                if run == 0 or elapsed < best:
+                    best = elapsed
+            points.append({"commands": count, "sexp_us_per_command": best / 1000.0 / count})
+        first = points[0]["sexp_us_per_command"]
+        last = points[len(points) - 1]["sexp_us_per_command"]
+        results[name] = {"points": points, "growth": last / first if first > 0 else 0.0}
+    return results
+
+
+def print_scaling(scaling):
+    sizes = " ".join(f"{n:>8}" for n in SCALING_SIZES)
+    print(f"scaling: to_sexp us/command at {sizes}")
+    for name, r in scaling.items():
+        cells = " ".join(f"{p['sexp_us_per_command']:>8.2f}" for p in r["points"])
+        print(f"  {name:<11}{cells}  growth {r['growth']:.2f}x")
+
+
+def compare(results, baseline, tolerance):
+    """Compare results against a baseline. Returns list of regression messages."""
+    regressions = []
+    for name, current in results["corpora"].items():
+        base = baseline.get("corpora", {}).get(name)
+        if base is None:
+            continue
+        for phase, key, higher_is_better in COMPARED_METRICS:
+            old = base.get(phase, {}).get(key)
+            new = current.get(phase, {}).get(key)
+            if not old or new is None:
+                continue
+            if higher_is_better:
+                change = (old - new) / old
+            else:
+                change = (new - old) / old
+            if change > tolerance:
+                regressions.append(
+                    f"{name} {phase}.{key}: {old:.1f} -> {new:.1f} ({change * 100:+.1f}% worse)"
+                )
+        # Reparses are a count, not a timing: any increase is a regression
+        if "reparses" in base and current["reparses"] > base["reparses"]:
+            regressions.append(f"{name} reparses: {base['reparses']} -> {current['reparses']}")
+    for name, current in results.get("words", {}).items():
+        base = baseline.get("words", {}).get(name)
+        if base is None or not base.get("words_per_sec"):
+            continue
+        change = (base["words_per_sec"] - current["words_per_sec"]) / base["words_per_sec"]
+        if change > tolerance:
+            regressions.append(
+                f"words {name}: {base['words_per_sec']:.0f} -> "
+                f"{current['words_per_sec']:.0f} words/s ({change * 100:+.1f}% worse)"
+            )
+    for name, current in results.get("serialize", {}).items():
+        base = baseline.get("serialize", {}).get(name)
+        if base is None or not base.get("load_speedup"):
+            continue
+        change = (base["load_speedup"] - current["load_speedup"]) / base["load_speedup"]
+        if change > tolerance:
+            regressions.append(
+                f"serialize {name} load speedup: {base['load_speedup']:.1f}x -> "
+                f"{current['load_speedup']:.1f}x"
+            )
+    for name, current in results.get("scaling", {}).items():
+        base = baseline.get("scaling", {}).get(name)
+        if base is None or not base.get("growth"):
+            continue
+        change = (current["growth"] - base["growth"]) / base["growth"]
+        if change > tolerance:
+            regressions.append(
+                f"scaling {name} growth: {base['growth']:.2f}x -> {current['growth']:.2f}x"
+            )
+    return regressions
+
+
+def format_rate(value, unit):
+    if value >= 1e6:
+        return f"{value / 1e6:.2f}M {unit}/s"
+    if value >= 1e3:
+        return f"{value / 1e3:.1f}k {unit}/s"
+    return f"{value:.0f} {unit}/s"
+
+
+def print_report(results):
+    for name, r in results["corpora"].items():
+        print(f"{name}: {r['inputs']} inputs, {r['bytes']} bytes, {r['nodes']} nodes")
+        for phase in ("parse", "sexp"):
+            p = r[phase]
+            print(
+                f"  {phase:<6}{format_rate(p['bytes_per_sec'], 'B'):>14}"
+                f"{format_rate(p['nodes_per_sec'], 'nodes'):>18}"
+                f"  p50 {p['p50_us']:.1f}us  p99 {p['p99_us']:.1f}us"
+            )
+        m = r["memory"]
+        print(
+            f"  peak  {m['peak_bytes'] / 1024:.1f} KiB  retained {m['retained_bytes'] / 1024:.1f} KiB"
+            f"  ({m['bytes_per_node']:.0f} B/node, spans {m['span_bytes_per_node']:.0f})"
+        )
+        print(f"  reparses during to_sexp: {r['reparses']}")
+
+
+def bench_json(inputs, runs):
+    """Time write_json against json.dumps(to_dict()) on the same parsed trees."""
+    from parable import MatchedPairError, ParseError, parse
+    from parable_extras import JSON_FORMAT_VERSION, to_dict, write_json
+
+    trees = []
+    for source, extglob in inputs:
+        try:
+            trees.append(parse(source, extglob=extglob))
+        except (ParseError, MatchedPairError, RecursionError):
+            continue
+    seconds = {"write_json": 0, "dumps": 0}
+    size = 0
+    for run in range(runs):
+        for method in seconds:
+            start = time.perf_counter_ns()
+            for nodes in trees:
+                if method == "write_json":
+                    out = io.StringIO()
+                    write_json(nodes, out)
+                    size += len(out.getvalue())
+                else:
+                    document = {
+                        "version": JSON_FORMAT_VERSION,
+                        "nodes": [to_dict(n) for n in nodes],
+                    }
+                    json.dumps(document, separators=(",", ":"))
+            elapsed = time.perf_counter_ns() - start
+            if run == 0 or elapsed < seconds[method]:
+                seconds[method] = elapsed
+    return {
+        "trees": len(trees),
+        "bytes": size // runs,
+        "write_json_seconds": seconds["write_json"] / 1e9,
+        "dumps_seconds": seconds["dumps"] / 1e9,
+        "speedup": seconds["dumps"] / seconds["write_json"] if seconds["write_json"] > 0 else 0.0,
+    }
+
+
+def print_json(results):
+    for name, r in results.items():
+        print(
+            f"json {name}: {r['trees']} trees, {r['bytes']} bytes, "
+            f"write_json {r['write_json_seconds'] * 1000:.1f}ms, "
+            f"json.dumps(to_dict()) {r['dumps_seconds'] * 1000:.1f}ms "
+            f"({r['speedup']:.2f}x)"
+        )
+
+
+def print_usage():
+    print("Usage: parable-bench [options] <test_dir>")
+    print("Options:")
+    print("  -n, --runs N          Timed runs per input, fastest is kept (default=3)")
+    print("  -c, --corpus NAME     Only run corpus NAME (repeatable)")
+    print("  -o, --output FILE     Write results as JSON to FILE")
+    print("  --baseline FILE       Compare against baseline JSON, exit 1 on regression")
+    print("  --tolerance PCT       Allowed regression in percent (default=25)")
+    print("  --scaling             Also time to_sexp on synthetic long command lists")
+    print("  --words               Also time Word.to_sexp alone over each corpus's words")
+    print("  --serialize           Also time dump_ast/load_ast against parsing each corpus")
+    print("  --walk                Also time walk/NodeVisitor against a recursive tree walk")
+    print("  --extract             Also time extract_commands against parse+walk/to_sexp")
+    print("  --json                Also time write_json against json.dumps(to_dict())")
+    print("  -h, --help            Show this help message")
+
+
+def main():
+    runs = 3
+    only = []
+    output = None
+    baseline_path = None
+    tolerance = 25.0
+    scaling = False
+    words = False
+    serialize = False
+    walks = False
+    extract = False
+    json_output = False
+    test_dir = None
+
+    i = 1
+    while i < len(sys.argv):
+        arg = sys.argv[i]
+        if arg == "-h" or arg == "--help":
+            print_usage()
+            sys.exit(0)
+        elif arg == "-n" or arg == "--runs":
+            i = i + 1
+            if i < len(sys.argv):
+                runs = max(1, int(sys.argv[i]))
+        elif arg == "-c" or arg == "--corpus":
+            i = i + 1
+            if i < len(sys.argv):
+                only.append(sys.argv[i])
+        elif arg == "-o" or arg == "--output":
+            i = i + 1
+            if i < len(sys.argv):
+                output = sys.argv[i]
+        elif arg == "--baseline":
+            i = i + 1
+            if i < len(sys.argv):
+                baseline_path = sys.argv[i]
+        elif arg == "--tolerance":
+            i = i + 1
+            if i < len(sys.argv):
+                tolerance = float(sys.argv[i])
+        elif arg == "--scaling":
+            scaling = True
+        elif arg == "--words":
+            words = True
+        elif arg == "--serialize":
+            serialize = True
+        elif arg == "--walk":
+            walks = True
+        elif arg == "--extract":
+            extract = True
+        elif arg == "--json":
+            json_output = True
+        elif not arg.startswith("-"):
+            test_dir = arg
+        i = i + 1
+
+    if test_dir is None and not scaling:
+        print("Error: test_dir is required", file=sys.stderr)
+        print_usage()
+        sys.exit(1)
+
+    if test_dir is not None and not os.path.isdir(test_dir):
+        print(f"Error: {test_dir} is not a directory", file=sys.stderr)
+        sys.exit(1)
+
+    results = {
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "runs": runs,
+        "corpora": {},
+    }
+    start_time = time.time()
+    for name, rel in CORPORA:
+        if test_dir is None or (only and name not in only):
+            continue
+        directory = os.path.join(test_dir, rel)
+        if not os.path.isdir(directory):
+            continue
+        inputs = load_inputs(directory)
+        results["corpora"][name] = bench_corpus(inputs, runs)
+        if words:
+            results.setdefault("words", {})[name] = bench_words(inputs, runs)
+        if serialize:
+            results.setdefault("serialize", {})[name] = bench_serialize(inputs, runs)
+        if walks:
+            results.setdefault("walk", {})[name] = bench_walk(inputs, runs)
+        if extract:
+            results.setdefault("extract", {})[name] = bench_extract(inputs, runs)
+        if json_output:
+            results.setdefault("json", {})[name] = bench_json(inputs, runs)
+    if scaling:
+        results["scaling"] = bench_scaling(runs)
+    elapsed = time.time() - start_time
+
+    print_report(results)
+    if words:
+        print_words(results.get("words", {}))
+    if serialize:
+        print_serialize(results.get("serialize", {}))
+    if walks:
+        print_walk(results.get("walk", {}))
+    if extract:
+        print_extract(results.get("extract", {}))
+    if json_output:
+        print_json(results.get("json", {}))
+    if scaling:
+        print_scaling(results["scaling"])
+
+    if output is not None:
+        with open(output, "w") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+            f.write("\n")
+
+    if baseline_path is not None:
+        with open(baseline_path) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, tolerance / 100.0)
+        if regressions:
+            print("=" * 60)
+            print(f"REGRESSIONS (tolerance {tolerance:.0f}%)")
+            print("=" * 60)
+            for msg in regressions:
+                print(f"  {msg}")
+            print(f"python: {len(regressions)} regressions in {elapsed:.2f}s")
+            sys.exit(1)
+
+    print(f"python: benchmark finished in {elapsed:.2f}s")
+    sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
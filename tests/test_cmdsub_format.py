@@ -0,0 +1,34 @@
+#!/usr/bin/env python3
+"""Tests for command-substitution formatting keeping no state on the tree."""
+
+import sys
+
+sys.path.insert(0, "src")
+
+from parable import Word, parse
+
+
+def _inner_command(node):
+    """Command inside the first $(...) of a simple command's second word."""
+    return node.words[1].parts[0].command
+
+
+def test_repeat_serialization_is_identical():
+    """Serializing nested substitutions twice gives the same output."""
+    node = parse("echo $(echo a $(echo b $(echo c)))")[0]
+    first = node.to_sexp()
+    assert node.to_sexp() == first
+
+
+def test_mutation_shows_in_output():
+    """A mutated node is formatted from its current fields on the next pass."""
+    node = parse("echo $(echo a)")[0]
+    assert node.to_sexp() == '(command (word "echo") (word "$(echo a)"))'
+    _inner_command(node).words[1] = Word("b")
+    assert node.to_sexp() == '(command (word "echo") (word "$(echo b)"))'
+
+
+if __name__ == "__main__":
+    test_repeat_serialization_is_identical()
+    test_mutation_shows_in_output()
+    print("All tests passed")
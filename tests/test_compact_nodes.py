@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+"""Tests for the __slots__ layout of AST nodes and lexer state."""
+
+import pickle
+import sys
+
+sys.path.insert(0, "src")
+
+import parable
+from parable import Node, ParseContext, QuoteState, Token, parse
+from run_bench import count_nodes
+
+SOURCE = (
+    "f() { cat <<EOF >out 2>&1; }\nbody $x\nEOF\n"
+    "if [[ -n ${a:-b} && $x == y ]]; then echo $(( i++ ? 1 : 2 )) $'c' <(ls); fi\n"
+)
+
+
+def test_instances_have_no_dict():
+    """Nodes and per-token objects keep their fields in slots only."""
+    classes = [cls for cls in vars(parable).values() if isinstance(cls, type)]
+    for cls in classes:
+        if issubclass(cls, Node) or cls in (Token, QuoteState, ParseContext):
+            assert "__dict__" not in dir(cls), cls.__name__
+    assert not hasattr(Token(0, "x", 0), "__dict__")
+
+
+def test_slotted_nodes_round_trip():
+    """Slotted trees still pickle (ParseCache, parse_many) and walk fully."""
+    nodes = parse(SOURCE)
+    copied = pickle.loads(pickle.dumps(nodes))
+    assert [n.to_sexp() for n in copied] == [n.to_sexp() for n in nodes]
+    assert count_nodes(copied) == count_nodes(nodes) > 20
+
+
+if __name__ == "__main__":
+    test_instances_have_no_dict()
+    test_slotted_nodes_round_trip()
+    print("All tests passed")
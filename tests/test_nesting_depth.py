@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""Tests for bounded nesting depth and linear-time nested substitutions."""
+
+import sys
+
+sys.path.insert(0, "src")
+
+from parable import ParseError, Parser, parse
+
+DEEP = 2000
+
+
+def _nest(n, open_, close, inner):
+    return open_ * n + inner + close * n
+
+
+HOSTILE = [
+    _nest(DEEP, "( ", " )", "x"),
+    _nest(DEEP, "{ ", "; }", "x"),
+    _nest(DEEP, "if x; then ", "; fi", "y"),
+    "if x; then y; " + "elif x; then y; " * 1000 + "fi",
+    "echo " + _nest(DEEP, "$(", ")", "x"),
+    "cat " + _nest(DEEP, "<(", ")", "x"),
+    "echo " + _nest(DEEP, "$((", "))", "1"),
+    "echo $((" + _nest(DEEP, "(", ")", "1") + "))",
+    "echo $((" + "1?" * DEEP + "1" + ":1" * DEEP + "))",
+    "echo " + _nest(DEEP, "${x:-", "}", "y"),
+    "echo " + _nest(DEEP, "$[", "]", "1"),
+    "[[ " + _nest(DEEP, "( ", " )", "-n x") + " ]]",
+    "! " * DEEP + "x",
+    "echo " + _nest(DEEP, "$(cat <<E\nx\nE\n", ")", ""),
+]
+
+
+def test_deep_input_raises_parse_error():
+    """Input nested past max_depth fails cleanly instead of recursing on."""
+    for source in HOSTILE:
+        try:
+            parse(source, max_depth=40)
+        except ParseError as e:
+            assert e.message == "Maximum nesting depth exceeded", source[:20]
+        else:
+            raise AssertionError("expected ParseError: " + source[:20])
+
+
+def test_shallow_input_unaffected():
+    """Within the limit the result is the same as without one."""
+    for source in ["( ( x ) )", "echo $(a $(b)) $((1 + (2)))", "[[ ! ( -n x ) ]]"]:
+        assert [n.to_sexp() for n in parse(source, max_depth=8)] == [
+            n.to_sexp() for n in parse(source)
+        ]
+
+
+def test_unary_prefixes_are_iterative():
+    """A long run of arithmetic prefix operators doesn't recurse."""
+    parse("echo $((" + "- " * DEEP + "1))")
+
+
+def test_nested_command_substitutions_parsed_once():
+    """Each level is parsed once, not once per way of peeking its word."""
+    calls = []
+    original = Parser._parse_command_substitution
+
+    def parse_command_substitution(parser):
+        calls.append(parser.pos)
+        return original(parser)
+
+    Parser._parse_command_substitution = parse_command_substitution
+    try:
+        parse("echo " + _nest(12, "$(", ")", "x"))
+    finally:
+        Parser._parse_command_substitution = original
+    assert len(calls) == 12
+
+
+if __name__ == "__main__":
+    test_deep_input_raises_parse_error()
+    test_shallow_input_unaffected()
+    test_unary_prefixes_are_iterative()
+    test_nested_command_substitutions_parsed_once()
+    print("All tests passed")
@@ -0,0 +1,502 @@
+#!/usr/bin/env python3
+"""Tests for the Python-only helpers in parable_extras."""
+
+import io
+import json
+import os
+import pickle
+import sys
+import tempfile
+import zlib
+
+sys.path.insert(0, "src")
+
+import parable_extras
+from parable import MatchedPairError, ParseError, parse
+from parable_extras import (
+    NodeIndex,
+    NodeVisitor,
+    ParseCache,
+    ParseFailure,
+    dump_ast,
+    dump_files,
+    extract_commands,
+    flatten,
+    format_stats,
+    iter_child_nodes,
+    iter_parse,
+    json_schema,
+    load_ast,
+    parse_many,
+    to_dict,
+    walk,
+    write_json,
+)
+from parable_extras import parse as parse_extras
+from run_bench import count_nodes, load_inputs
+
+STREAM_SOURCE = """# leading comment
+echo one
+cat <<EOF
+body $x
+EOF
+if true; then
+  echo two
+fi
+a &&
+  b
+echo three \\
+  four
+"""
+
+
+def _sexps(nodes):
+    return [node.to_sexp() for node in nodes]
+
+
+def test_iter_parse_matches_parse():
+    """Streaming yields the same nodes as parse(), whatever the window size."""
+    expected = _sexps(parse(STREAM_SOURCE))
+    for chunk_size in (0, 16, 65536):
+        streamed = iter_parse(io.StringIO(STREAM_SOURCE), chunk_size=chunk_size)
+        assert _sexps(streamed) == expected, chunk_size
+    assert _sexps(iter_parse(STREAM_SOURCE)) == expected
+    assert _sexps(iter_parse("  \n")) == _sexps(parse("  \n"))
+
+
+def test_iter_parse_yields_before_end_of_input():
+    """A statement is yielded as soon as the next one starts."""
+    lines = iter(["echo one\n", "echo two\n", "echo three\n"])
+    nodes = iter_parse(lines, chunk_size=0)
+    assert next(nodes).to_sexp() == '(command (word "echo") (word "one"))'
+    assert next(lines) == "echo three\n"
+
+
+def test_iter_parse_error_position():
+    """Errors report positions in the whole input, not the current window."""
+    source = "echo a\necho b\nfi\n"
+    try:
+        list(iter_parse(source, chunk_size=0))
+    except ParseError as e:
+        assert e.pos == 14
+    else:
+        raise AssertionError("expected ParseError")
+
+
+MANY_SOURCES = ["echo a", "if true; then", "cat <<EOF\nx\nEOF\n", "", "echo $((1 +", "a | b"]
+
+
+def _many_sexps(pairs):
+    return {
+        index: result if isinstance(result, ParseFailure) else _sexps(result)
+        for index, result in pairs
+    }
+
+
+def test_parse_many_matches_parse():
+    """Each source gets parse()'s nodes, or a failure record, at its index."""
+    expected = {}
+    for index, source in enumerate(MANY_SOURCES):
+        try:
+            expected[index] = _sexps(parse(source))
+        except (ParseError, MatchedPairError) as e:
+            expected[index] = ParseFailure(type(e).__name__, e.message, e.pos, e.line)
+    inline = list(parse_many(MANY_SOURCES, workers=1, chunksize=4))
+    assert [index for index, _ in inline] == list(range(len(MANY_SOURCES)))
+    assert _many_sexps(inline) == expected
+    pooled = list(parse_many(iter(MANY_SOURCES), workers=2, chunksize=1))
+    assert [index for index, _ in pooled] == list(range(len(MANY_SOURCES)))
+    assert _many_sexps(pooled) == expected
+    unordered = parse_many(MANY_SOURCES, workers=2, chunksize=2, ordered=False)
+    assert _many_sexps(unordered) == expected
+
+
+def test_parse_many_survives_deep_input():
+    """Too-deep input fails on its own; max_depth turns it into a ParseError."""
+    sources = ["echo a", "(" * 3000 + "x" + ")" * 3000, "echo b"]
+    for workers in (1, 2):
+        results = dict(parse_many(sources, workers=workers))
+        assert results[1].kind == "RecursionError"
+        assert isinstance(results[1].to_exception(), RecursionError)
+        assert _sexps(results[2]) == _sexps(parse("echo b"))
+    results = dict(parse_many(sources, workers=1, max_depth=40))
+    assert results[1].kind == "ParseError"
+    assert results[1].message == "Maximum nesting depth exceeded"
+
+
+def test_parse_failure_rebuilds_exception():
+    """A failure record turns back into the error the parser raised."""
+    [(_, failure)] = parse_many(["fi"], workers=1)
+    error = failure.to_exception()
+    assert isinstance(error, ParseError)
+    try:
+        parse("fi")
+    except ParseError as e:
+        assert str(error) == str(e)
+
+
+def test_dump_files_records():
+    """One record per path in order, with parse errors and unreadable files reported."""
+    with tempfile.TemporaryDirectory() as directory:
+        paths = []
+        for name, text in [("a.sh", "echo a | wc"), ("b.sh", "if x; then\n"), ("c.sh", "")]:
+            paths.append(os.path.join(directory, name))
+            with open(paths[-1], "w") as f:
+                f.write(text)
+        paths.append(os.path.join(directory, "missing.sh"))
+        records = [json.loads(line) for line in dump_files(paths, workers=1, chunksize=3, ast=True)]
+        pooled = [json.loads(line) for line in dump_files(iter(paths), workers=2, chunksize=1)]
+    for record in records + pooled:
+        record.pop("seconds")
+    assert pooled == [{k: v for k, v in r.items() if k != "ast"} for r in records]
+    assert [r["path"] for r in records] == paths
+    assert [(r["bytes"], r["nodes"]) for r in records] == [(11, 6), (11, 0), (0, 1), (0, 0)]
+    assert records[0]["error"] is None
+    assert records[0]["ast"]["nodes"][0]["type"] == "Pipeline"
+    assert (records[1]["error"]["kind"], records[1]["error"]["line"]) == ("ParseError", 2)
+    assert records[1]["ast"] is None and records[2]["ast"]["nodes"][0]["type"] == "Empty"
+    assert records[3]["error"]["kind"] == "OSError"
+
+
+def test_dump_files_records_any_exception():
+    """An unexpected exception, or too-deep input, is recorded and the run goes on."""
+    original = parable_extras.Parser
+
+    class FailingParser(original):
+        def parse(self):
+            if self.source == "boom":
+                raise ValueError("parser bug")
+            return super().parse()
+
+    with tempfile.TemporaryDirectory() as directory:
+        paths = []
+        deep = "(" * 3000 + "x" + ")" * 3000
+        for name, text in [("a.sh", "boom"), ("b.sh", deep), ("c.sh", "echo c")]:
+            paths.append(os.path.join(directory, name))
+            with open(paths[-1], "w") as f:
+                f.write(text)
+        parable_extras.Parser = FailingParser
+        try:
+            records = [json.loads(line) for line in dump_files(paths, workers=1)]
+        finally:
+            parable_extras.Parser = original
+        bounded = [json.loads(line) for line in dump_files(paths[1:2], workers=1, max_depth=40)]
+    assert records[0]["error"]["kind"] == "ValueError"
+    assert records[0]["error"]["message"] == "parser bug"
+    assert records[1]["error"]["kind"] == "RecursionError"
+    assert records[2]["error"] is None and records[2]["nodes"] == 3
+    assert bounded[0]["error"]["message"] == "Maximum nesting depth exceeded"
+
+
+def test_parse_cache_counts_and_evicts():
+    """Repeated sources are hits; the least recently used entry is evicted."""
+    cache = ParseCache(maxsize=2)
+    first = cache.parse("echo a")
+    assert cache.parse("echo a") is first
+    cache.parse("echo a", extglob=True)
+    cache.parse("echo b")
+    assert (cache.hits, cache.misses, cache.evictions, len(cache)) == (1, 3, 1, 2)
+    assert _sexps(cache.parse("echo a")) == _sexps(parse("echo a"))
+    assert cache.misses == 4
+    for _ in range(2):
+        try:
+            cache.parse("fi")
+        except ParseError as e:
+            assert str(e) == "Parse error: Unexpected reserved word 'fi'"
+        else:
+            raise AssertionError("expected ParseError")
+    assert cache.misses == 5
+
+
+def test_parse_cache_directory_store():
+    """A second cache on the same directory is served from disk."""
+    with tempfile.TemporaryDirectory() as directory:
+        ParseCache(directory=directory).parse(STREAM_SOURCE)
+        cache = ParseCache(directory=directory)
+        assert _sexps(cache.parse(STREAM_SOURCE)) == _sexps(parse(STREAM_SOURCE))
+        assert (cache.disk_hits, cache.misses) == (1, 0)
+
+
+def test_parse_cache_stores_errors_as_json():
+    """Errors are stored as JSON records; anything else in an entry is parsed again."""
+    with tempfile.TemporaryDirectory() as directory:
+        first = ParseCache(directory=directory)
+        try:
+            first.parse("fi")
+        except ParseError:
+            pass
+        key = next(k for k in first._entries)
+        with open(first._path(key), "rb") as f:
+            record = json.loads(zlib.decompress(f.read()))
+        assert record == {
+            "kind": "ParseError",
+            "message": "Unexpected reserved word 'fi'",
+            "pos": 0,
+            "line": 0,
+        }
+        cache = ParseCache(directory=directory)
+        for _ in range(2):
+            try:
+                cache.parse("fi")
+            except ParseError as e:
+                assert str(e) == "Parse error: Unexpected reserved word 'fi'"
+            else:
+                raise AssertionError("expected ParseError")
+        assert (cache.disk_hits, cache.misses) == (1, 0)
+        # A pickle planted in the store is never loaded
+        with open(first._path(key), "wb") as f:
+            f.write(zlib.compress(pickle.dumps(ParseFailure("ParseError", "planted"))))
+        cache = ParseCache(directory=directory)
+        try:
+            cache.parse("fi")
+        except ParseError as e:
+            assert e.message == "Unexpected reserved word 'fi'"
+        assert (cache.disk_hits, cache.misses) == (0, 1)
+
+
+def test_parse_stats():
+    """stats=True reports counters from the parse and nested parsers."""
+    source = "echo $(a $(b))\ncat <<EOF\nx\nEOF\nfor ((i = $(n); ; )); do :; done\n"
+    assert _sexps(parse_extras(source)) == _sexps(parse(source))
+    nodes, stats = parse_extras(source, stats=True)
+    assert _sexps(nodes) == _sexps(parse(source))
+    assert stats.tokens_consumed > 0
+    assert stats.tokens_lexed >= stats.tokens_consumed - stats.token_cache_hits
+    assert stats.state_saves == stats.state_restores > 0
+    assert stats.sub_parsers == 1
+    assert stats.heredocs_gathered == 1
+    assert stats.max_depth == 4  # List, for ((...)) expression, assignment, $(n)
+    assert stats.lex_seconds > 0 and stats.parse_seconds > 0 and stats.sexp_seconds > 0
+    assert "max depth:         4" in format_stats(stats)
+
+
+def test_flatten_links_and_strings():
+    """flatten() numbers nodes in preorder and links them like the object graph."""
+    nodes = parse("echo $(a) >x; cat <<E\nhi\nE\n")
+    flat = flatten(nodes)
+    kinds = [flat.kinds[k] for k in flat.kind]
+    assert kinds == [
+        "List",
+        "Command",
+        "Word",
+        "Word",
+        "CommandSubstitution",
+        "Command",
+        "Word",
+        "Redirect",
+        "Word",
+        "Operator",
+        "Command",
+        "Word",
+        "HereDoc",
+    ]
+    assert list(flat.parent) == [-1, 0, 1, 1, 3, 4, 5, 1, 7, 0, 0, 10, 10]
+    assert list(flat.first_child) == [1, 2, -1, 4, 5, 6, -1, 8, -1, -1, 11, -1, -1]
+    assert list(flat.next_sibling) == [-1, 9, 3, 7, -1, -1, -1, -1, -1, 10, -1, 12, -1]
+    assert [flat.strings[f] for f in flat.field[1:4]] == ["parts", "words", "words"]
+    strings = {
+        (node, flat.strings[name]): flat.strings[value]
+        for node, name, value in zip(flat.str_node, flat.str_name, flat.str_value, strict=True)
+    }
+    assert strings[(3, "value")] == "$(a)"
+    assert strings[(12, "content")] == "hi\n"
+    ints = {
+        (node, flat.strings[name]): value
+        for node, name, value in zip(flat.int_node, flat.int_name, flat.int_value, strict=True)
+    }
+    assert ints[(7, "fd")] == -1 and ints[(12, "quoted")] == 0
+    assert flatten(parse("a\nb")).next_sibling[0] == 2
+
+
+def test_dump_ast_round_trip():
+    """Loaded trees serialize exactly like the parsed ones, across the corpora."""
+    checked = 0
+    for directory in ("tests/parable", "tests/corpus"):
+        for source, extglob in load_inputs(directory):
+            try:
+                nodes = parse(source, extglob=extglob)
+            except (ParseError, MatchedPairError):
+                continue
+            loaded = load_ast(dump_ast(nodes))
+            assert _sexps(loaded) == _sexps(nodes), source
+            checked += 1
+    assert checked > 4000
+    # ${x<(cmd)} arguments are formatted from the substitution table, which must survive
+    nodes = parse('echo ${x<(ls  -l)} "${y>( a|b )}"')
+    assert _sexps(load_ast(dump_ast(nodes))) == _sexps(nodes)
+
+
+def test_dump_ast_keeps_sharing_and_rejects_bad_data():
+    """Words share one substitution table after loading; bad dumps raise ValueError."""
+    data = dump_ast(parse("echo $(( $(a) + 1 )) x\ncat <<E\n$(b)\nE\n"))
+    first, second = load_ast(data)
+    words = first.words + second.words
+    assert len({id(word.subs) for word in words}) == 1
+    assert words[0].subs.get("a") is not None
+    assert _sexps(load_ast(dump_ast([]))) == []
+    for bad in (b"", b"PRBL", data[:-1], b"XXXX" + data[4:], data[:4] + b"\x09" + data[5:]):
+        try:
+            load_ast(bad)
+        except ValueError:
+            pass
+        else:
+            raise AssertionError("expected ValueError")
+
+
+def test_walk_preorder():
+    """walk() yields every node once, parents first, like flatten()."""
+    nodes = parse("echo $(a) >x; cat <<E\nhi\nE\n")
+    flat = flatten(nodes)
+    assert [type(node).__name__ for node in walk(nodes)] == [flat.kinds[k] for k in flat.kind]
+    command = nodes[0].parts[0]
+    assert list(iter_child_nodes(command)) == command.words + command.redirects
+    assert next(walk(command)) is command
+    deep = parse("echo $((" + "- " * 5000 + "1))")  # Built without recursion
+    assert sum(1 for _ in walk(deep)) == count_nodes(deep) > 5000
+
+
+def test_node_visitor_dispatch():
+    """visit_<ClassName> handles its class; returning False skips the children."""
+
+    class Names(NodeVisitor):
+        def __init__(self):
+            self.names = []
+            self.other = 0
+
+        def visit_Command(self, node):
+            self.names.append(node.words[0].value)
+
+        def visit_ProcessSubstitution(self, node):
+            return False
+
+        def generic_visit(self, node):
+            self.other += 1
+
+    visitor = Names()
+    visitor.visit(parse("a $(b) <(c) | d\nif e; then f; fi"))
+    assert visitor.names == ["a", "b", "d", "e", "f"]
+    assert visitor.other > 0
+
+
+def test_node_index():
+    """The index lists each kind's nodes in walk order and links them to parents."""
+    source = "f() { cat <<E >x; }\nhi\nE\necho $(ls <(a)) | wc\n"
+    nodes, index = parse_extras(source, index=True)
+    assert len(index) == sum(1 for _ in walk(nodes))
+    for kind in index.kinds():
+        assert index[kind] == [node for node in walk(nodes) if node.kind == kind]
+    assert [len(index[k]) for k in ("function", "heredoc", "cmdsub", "procsub")] == [1, 1, 1, 1]
+    assert index["coproc"] == [] and "coproc" not in index
+    for node in walk(nodes):
+        for child in iter_child_nodes(node):
+            assert index.parent(child) is node
+    assert [index.parent(node) for node in nodes] == [None, None]
+    [procsub] = index["procsub"]
+    kinds = [node.kind for node in index.ancestors(procsub)]
+    assert kinds == ["word", "command", "cmdsub", "word", "command", "pipeline"]
+    _, stats, with_stats = parse_extras(source, stats=True, index=True)
+    assert stats.tokens_consumed > 0 and with_stats.kinds() == index.kinds()
+    assert NodeIndex(parse("echo a"))["word"][1].value == "a"
+
+
+def test_extract_commands():
+    """Commands come out from every nesting, with argv, literals and spans."""
+    source = (
+        "X=1 grep -e 'a b' \"$f\" <in 2>&1\n"
+        'f() { coproc tee $(id -u) <(ls "-l"); }\n'
+        "echo `date` ${v:-$(whoami)} >out\n"
+    )
+    found = extract_commands(source)
+    assert [c.name for c in found] == ["grep", "tee", "id", "ls", "echo", "date", "whoami"]
+    grep = found[0]
+    assert grep.assignments == ["X=1"]
+    assert grep.argv == ["grep", "-e", "'a b'", '"$f"']
+    assert grep.literal == ["grep", "-e", "a b", None]
+    assert [(r.op, r.target.value) for r in grep.redirects] == [("<", "in"), ("2>", "&1")]
+    assert source[grep.start : grep.end] == "X=1 grep -e 'a b' \"$f\" <in 2>&1"
+    assert found[3].literal == ["ls", "-l"]
+    assert source[found[2].start : found[2].end] == "id -u"
+    assert found[5].start == -1  # Parsed from the backtick body's copy
+    assert [c.name for c in extract_commands(">x; a=b")] == [None, None]
+    found = extract_commands("echo ${x<(id -u)} ${y>(tee log)}")
+    assert [(c.name, c.start, c.end) for c in found] == [
+        ("echo", 0, 32),
+        ("id", 10, 15),
+        ("tee", 23, 30),
+    ]
+
+
+def test_extract_commands_repeated_param_args():
+    """The same ${...} text in two places gives a record with its own span for each."""
+    source = "f() { echo ${x:-$(id)}; }; g() { echo ${x:-$(id)}; }"
+    found = [(c.name, source[c.start : c.end], c.start) for c in extract_commands(source)]
+    assert found[2:] == [("id", "id", 18), ("id", "id", 45)]
+    source = "echo ${x:-$(rm a)}; echo ${y:-$(rm a)} ${z<(rm a)} ${z<(rm a)}"
+    found = [c for c in extract_commands(source) if c.name == "rm"]
+    assert [c.start for c in found] == [12, 32, 44, 56]
+    assert all(source[c.start : c.end] == "rm a" for c in found)
+
+
+def test_write_json_matches_to_dict():
+    """The streaming encoder writes exactly json.dumps() of to_dict(), in both layouts."""
+    checked = 0
+    for source, extglob in load_inputs("tests/parable"):
+        try:
+            nodes = parse(source, extglob=extglob)
+        except (ParseError, MatchedPairError):
+            continue
+        dicts = [to_dict(node) for node in nodes]
+        out = io.StringIO()
+        write_json(nodes, out)
+        document = {"version": json_schema()["version"], "nodes": dicts}
+        assert out.getvalue() == json.dumps(document, separators=(",", ":")), source
+        out = io.StringIO()
+        write_json(nodes, out, ndjson=True)
+        assert [json.loads(line) for line in out.getvalue().splitlines()] == dicts
+        checked += 1
+    assert checked > 1000
+
+
+def test_json_layout_and_schema():
+    """Nodes carry type, kind, span and the fields json_schema() lists; depth is unbounded."""
+    source = "cat <&3 $'x\\ty' >&2"
+    command = to_dict(parse(source)[0])
+    assert list(command) == ["type", "kind", "start", "end", "words", "redirects"]
+    assert command["words"][1]["parts"][0]["type"] == "AnsiCQuote"
+    redirect = command["redirects"][0]
+    assert (redirect["kind"], redirect["fd"], redirect["target"]["value"]) == ("redirect", -1, "&3")
+    assert source[redirect["start"] : redirect["end"]] == "<&3"
+    schema = json_schema()["types"]
+    assert schema["Redirect"] == {"op": "string", "target": "Word", "fd": "integer"}
+    assert schema["If"]["else_body"] == "Node | null"
+    deep = parse("echo $((" + "- " * 5000 + "1))")
+    out = io.StringIO()
+    write_json(deep, out, ndjson=True)
+    assert out.getvalue().count('"ArithUnaryOp"') == 5000
+    assert to_dict(deep[0])["words"][1]["parts"][0]["start"] == 5
+
+
+if __name__ == "__main__":
+    test_iter_parse_matches_parse()
+    test_iter_parse_yields_before_end_of_input()
+    test_iter_parse_error_position()
+    test_parse_many_matches_parse()
+    test_parse_many_survives_deep_input()
+    test_parse_failure_rebuilds_exception()
+    test_dump_files_records()
+    test_dump_files_records_any_exception()
+    test_parse_cache_counts_and_evicts()
+    test_parse_cache_directory_store()
+    test_parse_cache_stores_errors_as_json()
+    test_parse_stats()
+    test_flatten_links_and_strings()
+    test_dump_ast_round_trip()
+    test_dump_ast_keeps_sharing_and_rejects_bad_data()
+    test_walk_preorder()
+    test_node_visitor_dispatch()
+    test_node_index()
+    test_extract_commands()
+    test_extract_commands_repeated_param_args()
+    test_write_json_matches_to_dict()
+    test_json_layout_and_schema()
+    print("All tests passed")
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""Tests for source spans on AST nodes and line numbers on parse errors."""
+
+import sys
+
+sys.path.insert(0, "src")
+
+from parable import LineIndex, Node, ParseError, Parser, ParseStats, parse
+from parable_extras import dump_ast, flatten, iter_parse, load_ast
+
+SOURCE = (
+    "f() { cat <<EOF >out 2>&1; }\nbody $x\nEOF\n"
+    "if [[ -n ${a:-b} && $x == y ]]; then\n  echo $(( i++ ? 1 : 2 )) <(ls)\nfi\n"
+    "case $1 in a) x;; esac | wc -l\n"
+)
+
+
+def _spans(node, out, source=SOURCE):
+    """Collect (kind, text) for every spanned node, in preorder."""
+    if isinstance(node, list):
+        for item in node:
+            _spans(item, out, source)
+        return out
+    if not isinstance(node, Node):
+        return out
+    if node.start >= 0:
+        out.append((node.kind, source[node.start : node.end]))
+    for cls in type(node).__mro__:
+        for name in cls.__dict__.get("__slots__", ()):
+            if name not in ("kind", "start", "end", "subs"):
+                _spans(getattr(node, name, None), out, source)
+    return out
+
+
+def test_nodes_span_their_source():
+    """Each node's start:end slice is the text it was parsed from."""
+    spans = _spans(parse(SOURCE), [])
+    assert ("function", "f() { cat <<EOF >out 2>&1; }") in spans
+    assert ("redirect", ">out") in spans
+    assert ("redirect", "2>&1") in spans
+    assert ("heredoc", "<<EOF") in spans
+    assert ("cond-and", "-n ${a:-b} && $x == y") in spans
+    assert ("param", "${a:-b}") in spans
+    assert ("ternary", "i++ ? 1 : 2") in spans
+    assert ("post-incr", "i++") in spans
+    assert ("procsub", "<(ls)") in spans
+    assert ("pipeline", "case $1 in a) x;; esac | wc -l") in spans
+    assert spans[0][0] == "function"
+    if_text = "if [[ -n ${a:-b} && $x == y ]]; then\n  echo $(( i++ ? 1 : 2 )) <(ls)\nfi"
+    assert ("if", if_text) in spans
+
+
+def test_line_index():
+    """Lines and columns are 1-based; a newline belongs to the line it ends."""
+    index = LineIndex("ab\n\ncd\n")
+    assert [index.line(offset) for offset in range(7)] == [1, 1, 1, 2, 3, 3, 3]
+    assert index.line_col(5) == (3, 2)
+    assert LineIndex("").line_col(0) == (1, 1)
+
+
+def test_parse_error_has_line():
+    """Errors raised with a position report its line too."""
+    try:
+        parse("echo a\necho b\nfi\n")
+    except ParseError as e:
+        assert (e.pos, e.line) == (14, 3)
+        assert str(e) == "Parse error at line 3, position 14: Unexpected reserved word 'fi'"
+    else:
+        raise AssertionError("expected ParseError")
+
+
+def test_spans_survive_streaming_and_exports():
+    """iter_parse spans are absolute; flatten and dump_ast carry them along."""
+    source = "echo one\n" * 3 + "x=$(date) y\n"
+    nodes = parse(source)
+    streamed = list(iter_parse(source, chunk_size=0))
+    assert [(n.start, n.end) for n in streamed] == [(n.start, n.end) for n in nodes]
+    assert source[streamed[3].start : streamed[3].end] == "x=$(date) y"
+    flat = flatten(nodes)
+    assert (flat.start[0], flat.end[0]) == (nodes[0].start, nodes[0].end)
+    assert _spans(load_ast(dump_ast(nodes)), []) == _spans(nodes, [])
+    try:
+        list(iter_parse("echo a\necho b\nfi\n", chunk_size=0))
+    except ParseError as e:
+        assert (e.pos, e.line) == (14, 3)
+    else:
+        raise AssertionError("expected ParseError")
+
+
+def test_simple_params_read_by_lexer():
+    """$name expansions read without the Parser round trip come out the same."""
+    source = 'echo $x "$1$@-$foo_bar" $? ${y} a$#b $$ $(( $z ))\n[[ $a == "$b" ]]\n'
+    slow = Parser(source)
+    slow.stats = ParseStats()  # Stats make the lexer hand every $ to the Parser
+    expected = slow.parse()
+    nodes = parse(source)
+    assert [n.to_sexp() for n in nodes] == [n.to_sexp() for n in expected]
+    spans = _spans(nodes, [], source)
+    assert spans == _spans(expected, [], source)
+    assert ("param", "$foo_bar") in spans and ("param", "$#") in spans
+
+
+if __name__ == "__main__":
+    test_nodes_span_their_source()
+    test_line_index()
+    test_parse_error_has_line()
+    test_spans_survive_streaming_and_exports()
+    test_simple_params_read_by_lexer()
+    print("All tests passed")
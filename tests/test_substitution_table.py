@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""Tests for reusing substitution ASTs retained by the parse during serialization."""
+
+import sys
+
+sys.path.insert(0, "src")
+
+import parable
+from parable import Parser, Word
+
+
+def test_serialization_reuses_retained_asts():
+    """Substitutions without a node in Word.parts are not parsed again by to_sexp."""
+    sources = [
+        "echo $(($(echo 5) + 1))",
+        "((result = $(get_val)))",
+        "for (( $(a|b); ; )); do :; done",
+        "for $(echo i) in a b; do echo $i; done",
+        "echo ${x:-$(ls -d /bin)}",
+        "echo ${ foo; }",
+    ]
+    for source in sources:
+        parser = Parser(source)
+        for node in parser.parse():
+            node.to_sexp()
+        assert parser.subs.reparses == 0, source
+
+
+def test_for_arith_keeps_parsed_expressions():
+    """for ((;;)) expressions are parsed once into the tree, not thrown away."""
+    node = Parser("for (( i = $(n); ; i++ )); do :; done").parse()[0]
+    assert node.init_expr.kind == "assign"
+    assert node.init_expr.value.kind == "cmdsub"
+    assert node.cond_expr is None
+    assert node.incr_expr.kind == "post-incr"
+
+
+def test_standalone_word_still_formats():
+    """A Word built without a table falls back to parsing the substitution."""
+    word = Word("x${y:-$(echo   2)}")
+    assert word.to_sexp() == '(word "x${y:-$(echo 2)}")'
+
+
+def test_parse_leaves_formatting_to_to_sexp():
+    """${x<(cmd)} arguments stay as written until serialization formats them."""
+    calls = []
+    original = parable._format_cmdsub_node
+
+    def format_cmdsub_node(*args):
+        calls.append(args)
+        return original(*args)
+
+    parable._format_cmdsub_node = format_cmdsub_node
+    try:
+        parser = Parser('echo ${x<(ls  -l)} "${y>( a|b )}"')
+        node = parser.parse()[0]
+        assert calls == []
+        assert node.words[1].value == "${x<(ls  -l)}"
+        assert node.to_sexp() == (
+            '(command (word "echo") (word "${x<(ls -l)}") (word "\\"${y>(a | b)}\\""))'
+        )
+    finally:
+        parable._format_cmdsub_node = original
+    assert parser.subs.reparses == 0
+
+
+def test_array_literal_keeps_param_arg_text():
+    """An array literal word prints ${x<(cmd)} arguments as written."""
+    for source, expected in [
+        ("x=( ${x<(a  b)} )", '(command (word "x=(${x<(a  b)})"))'),
+        ('declare -a x=( "${x<(a  b)}" )', '(word "x=(\\"${x<(a  b)}\\")"))'),
+        ("echo $(x=( ${x<(a  b)} )) ${x<(a  b)}", '(word "${x<(a b)}"))'),
+    ]:
+        assert Parser(source).parse()[0].to_sexp().endswith(expected), source
+
+
+if __name__ == "__main__":
+    test_serialization_reuses_retained_asts()
+    test_for_arith_keeps_parsed_expressions()
+    test_standalone_word_still_formats()
+    test_parse_leaves_formatting_to_to_sexp()
+    test_array_literal_keeps_param_arg_text()
+    print("All tests passed")
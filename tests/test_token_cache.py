@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""Tests for the parser's multi-entry peeked-token cache."""
+
+import sys
+
+sys.path.insert(0, "src")
+
+from parable import Lexer, Parser, ParseStats
+
+
+def _count_word_reads(source):
+    """Parse source, returning (sexps, word reads per lexer state, parser)."""
+    reads = {}
+    original = Lexer._read_word
+
+    def read_word(lexer):
+        key = (
+            lexer.pos,
+            lexer._word_context,
+            lexer._at_command_start,
+            lexer._in_array_literal,
+            lexer._in_assign_builtin,
+            lexer._parser_state,
+            lexer._eof_token,
+        )
+        reads[key] = reads.get(key, 0) + 1
+        return original(lexer)
+
+    Lexer._read_word = read_word
+    try:
+        parser = Parser(source)
+        parser.stats = ParseStats()
+        sexps = [node.to_sexp() for node in parser.parse()]
+    finally:
+        Lexer._read_word = original
+    return sexps, reads, parser
+
+
+def test_words_lexed_once_per_context():
+    """Peeks in alternating contexts reuse tokens instead of lexing again."""
+    for source in ["echo $(a $(b)) c", "[[ $(a) == b ]]", "case $(a) in x) y;; esac"]:
+        _, reads, parser = _count_word_reads(source)
+        assert max(reads.values()) == 1, source
+        assert parser.stats.token_cache_hits > 0
+
+
+def test_context_reset_by_nested_words():
+    """A token is reused in the state its nested words (array elements) leave."""
+    sexps, _, _ = _count_word_reads("x=(1 2)\necho y")
+    assert sexps == ['(command (word "x=(1 2)"))', '(command (word "echo") (word "y"))']
+
+
+if __name__ == "__main__":
+    test_words_lexed_once_per_context()
+    test_context_reset_by_nested_words()
+    print("All tests passed")
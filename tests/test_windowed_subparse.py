@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""Tests for parsing nested arithmetic and substitutions in place."""
+
+import sys
+
+sys.path.insert(0, "src")
+
+from parable import Parser, ParseStats, parse
+
+
+def _nested_arith(levels):
+    source = "1"
+    for _ in range(levels):
+        source = "$(( $(echo " + source + ") + 1 ))"
+    return "echo " + source
+
+
+def test_nested_arithmetic_scanned_once():
+    """Only the outermost $((...)) scans for its end; nested ones reuse it."""
+    source = _nested_arith(20)
+    calls = []
+    original = Parser._scan_arith_expansion
+
+    def scan(parser, start):
+        calls.append(start)
+        return original(parser, start)
+
+    Parser._scan_arith_expansion = scan
+    try:
+        nodes = parse(source)
+    finally:
+        Parser._scan_arith_expansion = original
+    assert nodes[0].words[1].value == source[5:]
+    assert calls == [5]
+
+
+def test_sub_parsers_read_shared_buffer():
+    """Substitutions inside arithmetic are parsed from the parent's source."""
+    parser = Parser(_nested_arith(3))
+    parser.stats = ParseStats()
+    parser.parse()
+    assert parser.stats.sub_parsers == 3
+    assert parser.subs.get("echo 1") is not None
+
+
+def test_command_parens_disagree_with_scan():
+    """A case pattern's ) inside $( makes the enclosing $(( fall back."""
+    source = "echo $(( $(case x in a) echo 1;; esac) + 1 ))"
+    assert parse(source)[0].to_sexp() == '(command (word "echo") (word "' + source[5:] + '"))'
+    source = 'echo $(( $(echo ")") + 1 ))'
+    assert (
+        parse(source)[0].to_sexp() == '(command (word "echo") (word "$(( $(echo \\")\\") + 1 ))"))'
+    )
+
+
+if __name__ == "__main__":
+    test_nested_arithmetic_scanned_once()
+    test_sub_parsers_read_shared_buffer()
+    test_command_parens_disagree_with_scan()
+    print("All tests passed")
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""Tests for streaming S-expression output via write_sexp."""
+
+import io
+import sys
+
+sys.path.insert(0, "src")
+
+from parable import SexpWriter, parse, write_sexp
+
+
+def _streamed(source):
+    out = io.StringIO()
+    for node in parse(source):
+        write_sexp(node, out)
+        out.write("\n")
+    return out.getvalue()
+
+
+def _joined(source):
+    return "".join(node.to_sexp() + "\n" for node in parse(source))
+
+
+def test_write_sexp_matches_to_sexp():
+    """Streamed output is byte-identical to to_sexp()."""
+    sources = [
+        "echo hello",
+        "a | b |& c && d || e; f & g",
+        "if a; then b; elif c; then d; else e; fi > out",
+        "for i in 1 2; do echo $i; done; for ((i=0; i<3; i++)); do :; done",
+        "select x in a b; do break; done 2>&1",
+        "case $x in a|b) echo ab;; *) ;; esac",
+        "f() { (cd /tmp && ls) | wc -l; } >log",
+        "[[ -f a && ( $b == c || ! -z d ) ]]; (( x++ )) <in",
+        "time -p ! coproc NAME { sleep 1; }",
+        "arr=(1 2 3); cat <<EOF\nbody $x\nEOF\n",
+    ]
+    for source in sources:
+        assert _streamed(source) == _joined(source), source
+
+
+def test_sexp_writer_buffers_fragments():
+    """SexpWriter is the default sink and accumulates written fragments."""
+    out = SexpWriter()
+    write_sexp(parse("a; b")[0], out)
+    assert out.getvalue() == '(semi (command (word "a")) (command (word "b")))'
+
+
+if __name__ == "__main__":
+    test_write_sexp_matches_to_sexp()
+    test_sexp_writer_buffers_fragments()
+    print("All tests passed")